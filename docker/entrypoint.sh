@@ -18,6 +18,14 @@ rezervo cron init
 
 rezervo cron refresh
 
+# Start booking daemon in the background, restarting it whenever it crashes (exits cleanly unless enabled in config)
+(
+  until rezervo booker; do
+    echo "⚠️ Booker daemon exited unexpectedly, restarting in 10 seconds..."
+    sleep 10
+  done
+) &
+
 echo "⚙️ Starting cron service..."
 cron
 
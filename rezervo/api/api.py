@@ -26,13 +26,14 @@ from rezervo.api import (
 from rezervo.api.notifications import push
 from rezervo.http_client import HttpClient
 from rezervo.schemas.config.config import read_app_config
+from rezervo.utils.playwright_utils import browser_pool
 
 api = FastAPI(
     title="rezervo",
     description="Automatic booking of group classes",
     version=version("rezervo"),
     on_startup=[HttpClient.singleton],
-    on_shutdown=[HttpClient.close_singleton],
+    on_shutdown=[HttpClient.close_singleton, browser_pool.close],
 )
 
 api.add_middleware(
@@ -12,7 +12,9 @@ from rezervo.cron import refresh_recurring_booking_cron_jobs
 from rezervo.database import crud
 from rezervo.providers.ibooking.auth import (
     WAIT_FOR_TOTP_VERIFICATION_MAX_SECONDS,
-    WAIT_FOR_TOTP_VERIFICATION_MILLISECONDS,
+    WAIT_FOR_TOTP_VERIFICATION_POLL_SECONDS,
+    totp_flow_finished,
+    totp_submitted,
 )
 from rezervo.schemas.community import UserRelationship
 from rezervo.schemas.config.app import AppConfig
@@ -34,6 +36,7 @@ from rezervo.sessions import (
     update_planned_sessions,
 )
 from rezervo.utils.config_utils import class_config_recurrent_id
+from rezervo.utils.event_utils import wait_for_event
 
 router = APIRouter()
 
@@ -135,25 +138,35 @@ async def put_chain_user_totp(
     verification_timestamp = crud.get_chain_user_auth_verified_at(
         db, db_chain_user.chain, db_chain_user.user_id
     )
-    db_chain_user.totp = totp
-    db.commit()
-    # wait for TOTP to be marked as verified (timestamp is updated)
-    wait_start = asyncio.get_event_loop().time()
-    while (
-        asyncio.get_event_loop().time()
-        < wait_start + WAIT_FOR_TOTP_VERIFICATION_MAX_SECONDS
-    ):
-        current_timestamp = crud.get_chain_user_auth_verified_at(
-            db, db_chain_user.chain, db_chain_user.user_id
-        )
-        if current_timestamp is not None and (
-            verification_timestamp is None or verification_timestamp < current_timestamp
-        ):
-            background_tasks.add_task(
-                refresh_recurring_booking_cron_jobs, db_user.id, [chain_identifier]
+    flow_key = (db_chain_user.chain, db_chain_user.user_id)
+    with totp_flow_finished.listen(flow_key) as flow_finished:
+        db_chain_user.totp = totp
+        db.commit()
+        totp_submitted.notify(flow_key)
+        # wait for TOTP to be marked as verified (timestamp is updated)
+        wait_start = asyncio.get_event_loop().time()
+        finished = False
+        while True:
+            current_timestamp = crud.get_chain_user_auth_verified_at(
+                db, db_chain_user.chain, db_chain_user.user_id
+            )
+            if current_timestamp is not None and (
+                verification_timestamp is None
+                or verification_timestamp < current_timestamp
+            ):
+                background_tasks.add_task(
+                    refresh_recurring_booking_cron_jobs, db_user.id, [chain_identifier]
+                )
+                return
+            remaining = WAIT_FOR_TOTP_VERIFICATION_MAX_SECONDS - (
+                asyncio.get_event_loop().time() - wait_start
+            )
+            # a finished flow that did not mark the TOTP as verified has failed
+            if finished or remaining <= 0:
+                break
+            finished = await wait_for_event(
+                flow_finished, min(WAIT_FOR_TOTP_VERIFICATION_POLL_SECONDS, remaining)
             )
-            return
-        await asyncio.sleep(WAIT_FOR_TOTP_VERIFICATION_MILLISECONDS / 1000)
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
 
@@ -0,0 +1,347 @@
+import asyncio
+import contextlib
+import heapq
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from apprise import NotifyType
+from pydantic import BaseModel
+
+from rezervo.booking import (
+    BookingParticipant,
+    book_class_for_participants,
+    prepare_booking_participant,
+)
+from rezervo.chains.active import ACTIVE_CHAINS
+from rezervo.chains.common import find_class
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
+from rezervo.errors import AuthenticationError, BookingError
+from rezervo.http_client import HttpClient
+from rezervo.notify.apprise import aprs
+from rezervo.schemas.config.config import read_app_config
+from rezervo.schemas.config.user import ChainIdentifier, ChainUser, Class
+from rezervo.utils.apprise_utils import aprs_ctx
+from rezervo.utils.config_utils import class_config_recurrent_id
+from rezervo.utils.logging_utils import log
+from rezervo.utils.playwright_utils import browser_pool
+
+# how long to remember dispatched jobs, to avoid booking the same opening twice
+DISPATCHED_JOBS_RETENTION = timedelta(days=1)
+# transiently failing class resolutions are retried with exponential backoff from this delay, until the next refresh
+RESOLUTION_RETRY_DELAY = timedelta(seconds=30)
+
+type BookingJobKey = tuple[ChainIdentifier, UUID, str]
+type RecurringBookingKey = tuple[ChainIdentifier, str]
+
+
+def is_transient_resolution_error(error: BookingError | AuthenticationError) -> bool:
+    # unclassified errors and failed authentication may well resolve on retry, unlike e.g. a missing class
+    return error is BookingError.ERROR or isinstance(error, AuthenticationError)
+
+
+class BookingJobParticipant(BaseModel):
+    user_id: UUID
+    username: str
+    recurrent_booking_id: str
+
+
+class BookingJob(BaseModel):
+    """
+    Booking of a single class opening, shared by all users with a recurring booking for it
+    """
+
+    chain_identifier: ChainIdentifier
+    class_id: str
+    display_name: str | None = None
+    booking_opens_at: datetime
+    fire_at: datetime
+    participants: list[BookingJobParticipant]
+
+    def participant_key(self, p: BookingJobParticipant) -> BookingJobKey:
+        return self.chain_identifier, p.user_id, p.recurrent_booking_id
+
+
+class Booker:
+    """
+    Long-lived booking scheduler, keeping all upcoming recurring bookings in a timer heap
+    and firing each booking from the same warm process (shared event loop, HTTP and DB connections).
+    Users booking the same class opening are batched into a single job, resolving the class
+    and preparing the connection once before booking for all users concurrently.
+    """
+
+    def __init__(self, refresh_interval: timedelta, preparation: timedelta):
+        self._refresh_interval = refresh_interval
+        self._preparation = preparation
+        self._heap: list[tuple[datetime, int, BookingJob]] = []
+        self._sequence = 0
+        self._dispatched: dict[BookingJobKey, datetime] = {}
+        self._running: set[asyncio.Task] = set()
+        self._resolution_retries: set[asyncio.Task] = set()
+        # latest resolved opening of each recurring booking, to tell whether an unresolved one opens soon
+        self._resolved_openings: dict[RecurringBookingKey, datetime] = {}
+        self._wakeup = asyncio.Event()
+
+    async def _resolve_job(
+        self, chain_identifier: ChainIdentifier, r: Class
+    ) -> BookingJob | BookingError | AuthenticationError | None:
+        _class = await find_class(chain_identifier, r)
+        if isinstance(_class, (BookingError, AuthenticationError)):
+            return _class
+        self._resolved_openings[(chain_identifier, class_config_recurrent_id(r))] = (
+            _class.booking_opens_at
+        )
+        if _class.is_bookable or _class.booking_opens_at < datetime.now().astimezone():
+            # booking is already open (or closed), nothing to race for
+            return None
+        return BookingJob(
+            chain_identifier=chain_identifier,
+            class_id=_class.id,
+            display_name=r.display_name,
+            booking_opens_at=_class.booking_opens_at,
+            fire_at=_class.booking_opens_at - self._preparation,
+            participants=[],
+        )
+
+    async def refresh(self) -> None:
+        log.info(":arrows_counterclockwise: Refreshing recurring bookings ...")
+        # recurring bookings of different users for the same class are resolved only once
+        recurring_bookings: dict[
+            tuple[ChainIdentifier, str],
+            tuple[Class, list[tuple[ChainUser, Class]]],
+        ] = {}
+        with SessionLocal() as db:
+            for chain in ACTIVE_CHAINS:
+                for chain_user in crud.get_chain_users(
+                    db, chain.identifier, active_only=True
+                ):
+                    for r in chain_user.recurring_bookings:
+                        recurring_bookings.setdefault(
+                            (chain.identifier, class_config_recurrent_id(r)), (r, [])
+                        )[1].append((chain_user, r))
+        for task in self._resolution_retries:
+            # superseded by resolving all recurring bookings again
+            task.cancel()
+        resolved_jobs = await asyncio.gather(
+            *[
+                self._resolve_job(chain_identifier, r)
+                for (chain_identifier, _), (r, _) in recurring_bookings.items()
+            ]
+        )
+        jobs: dict[tuple[ChainIdentifier, str, datetime], BookingJob] = {}
+        for job, ((chain_identifier, _), (r, chain_users)) in zip(
+            resolved_jobs, recurring_bookings.items(), strict=True
+        ):
+            if isinstance(job, (BookingError, AuthenticationError)):
+                self._on_resolution_failed(chain_identifier, r, chain_users, job)
+                continue
+            if job is None:
+                continue
+            # different recurring bookings may still resolve to the same class opening
+            job = jobs.setdefault(
+                (job.chain_identifier, job.class_id, job.booking_opens_at), job
+            )
+            self._add_participants(job, chain_users)
+        heap: list[tuple[datetime, int, BookingJob]] = []
+        for job in jobs.values():
+            if len(job.participants) == 0:
+                continue
+            self._sequence += 1
+            heap.append((job.fire_at, self._sequence, job))
+        heapq.heapify(heap)
+        self._heap = heap
+        now = datetime.now().astimezone()
+        self._dispatched = {
+            k: opens_at
+            for k, opens_at in self._dispatched.items()
+            if opens_at > now - DISPATCHED_JOBS_RETENTION
+        }
+        log.info(
+            f":heavy_check_mark: {len(heap)} upcoming booking{'s' if len(heap) != 1 else ''} scheduled"
+            + (f", next at {heap[0][0]}" if len(heap) > 0 else "")
+        )
+        self._wakeup.set()
+
+    def _add_participants(
+        self, job: BookingJob, chain_users: list[tuple[ChainUser, Class]]
+    ) -> None:
+        for chain_user, r in chain_users:
+            participant = BookingJobParticipant(
+                user_id=chain_user.user_id,
+                username=chain_user.username,
+                recurrent_booking_id=class_config_recurrent_id(r),
+            )
+            if not self._is_dispatched(job, participant):
+                job.participants.append(participant)
+
+    def _on_resolution_failed(
+        self,
+        chain_identifier: ChainIdentifier,
+        r: Class,
+        chain_users: list[tuple[ChainUser, Class]],
+        error: BookingError | AuthenticationError,
+    ) -> None:
+        if not is_transient_resolution_error(error):
+            log.warning(
+                f"Could not resolve class for recurring booking, skipping\n"
+                f"  (chain='{chain_identifier}' {r})"
+            )
+            return
+        log.warning(
+            f"Could not resolve class for recurring booking, retrying before the next refresh\n"
+            f"  (chain='{chain_identifier}' {r})"
+        )
+        opens_at = self._resolved_openings.get(
+            (chain_identifier, class_config_recurrent_id(r))
+        )
+        now = datetime.now().astimezone()
+        if (
+            opens_at is not None
+            and now < opens_at
+            and opens_at - self._preparation <= now + self._refresh_interval
+        ):
+            # it may open before the next refresh, with nobody booking it
+            with aprs_ctx() as error_ctx:
+                aprs.notify(
+                    notify_type=NotifyType.FAILURE,
+                    title="Failed to resolve upcoming booking",
+                    body=f"Could not resolve '{chain_identifier}' class '{r.display_name or r.activity_id}' opening at {opens_at}, "
+                    f"retrying until the next refresh: {error}",
+                    attach=[error_ctx],
+                )
+        task = asyncio.create_task(
+            self._retry_resolution(chain_identifier, r, chain_users)
+        )
+        self._resolution_retries.add(task)
+        task.add_done_callback(self._resolution_retries.discard)
+
+    async def _retry_resolution(
+        self,
+        chain_identifier: ChainIdentifier,
+        r: Class,
+        chain_users: list[tuple[ChainUser, Class]],
+    ) -> None:
+        delay = RESOLUTION_RETRY_DELAY
+        # the next refresh resolves all recurring bookings again
+        next_refresh_at = datetime.now().astimezone() + self._refresh_interval
+        while datetime.now().astimezone() + delay < next_refresh_at:
+            await asyncio.sleep(delay.total_seconds())
+            job = await self._resolve_job(chain_identifier, r)
+            if job is None:
+                return
+            if isinstance(job, BookingJob):
+                self._add_participants(job, chain_users)
+                if len(job.participants) > 0:
+                    self._sequence += 1
+                    heapq.heappush(self._heap, (job.fire_at, self._sequence, job))
+                    self._wakeup.set()
+                log.info(
+                    f"Resolved class for recurring booking after retrying, opens at {job.booking_opens_at}\n"
+                    f"  (chain='{chain_identifier}' {r})"
+                )
+                return
+            if not is_transient_resolution_error(job):
+                return
+            delay *= 2
+        log.error(
+            f"Could not resolve class for recurring booking before the next refresh\n"
+            f"  (chain='{chain_identifier}' {r})"
+        )
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.exception(f"Failed to refresh recurring bookings: {e}")
+            await asyncio.sleep(self._refresh_interval.total_seconds())
+
+    async def _run_job(self, job: BookingJob) -> None:
+        usernames = ", ".join(f"'{p.username}'" for p in job.participants)
+        log.info(
+            f":alarm_clock: Booking '{job.display_name or job.class_id}' "
+            f"for '{job.chain_identifier}' user{'s' if len(job.participants) != 1 else ''} "
+            f"{usernames} (opens at {job.booking_opens_at})"
+        )
+        try:
+            prepared = await asyncio.gather(
+                *[
+                    prepare_booking_participant(
+                        job.chain_identifier, p.user_id, p.recurrent_booking_id
+                    )
+                    for p in job.participants
+                ]
+            )
+            participants: list[BookingParticipant] = [
+                p for p in prepared if p is not None
+            ]
+            results = await book_class_for_participants(
+                job.chain_identifier, participants
+            )
+            log.info(
+                f"Booked '{job.display_name or job.class_id}' for "
+                f"{sum(results)}/{len(job.participants)} '{job.chain_identifier}' users"
+            )
+        except Exception as e:
+            log.exception(
+                f"Booking job failed for '{job.chain_identifier}' users {usernames}: {e}"
+            )
+
+    def _is_dispatched(self, job: BookingJob, p: BookingJobParticipant) -> bool:
+        return self._dispatched.get(job.participant_key(p)) == job.booking_opens_at
+
+    def _dispatch(self, job: BookingJob) -> None:
+        job.participants = [
+            p for p in job.participants if not self._is_dispatched(job, p)
+        ]
+        if len(job.participants) == 0:
+            return
+        for p in job.participants:
+            self._dispatched[job.participant_key(p)] = job.booking_opens_at
+        task = asyncio.create_task(self._run_job(job))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def run(self) -> None:
+        refresh_task = asyncio.create_task(self._refresh_periodically())
+        try:
+            while True:
+                self._wakeup.clear()
+                now = datetime.now().astimezone()
+                while len(self._heap) > 0 and self._heap[0][0] <= now:
+                    _, _, job = heapq.heappop(self._heap)
+                    self._dispatch(job)
+                timeout = (
+                    (self._heap[0][0] - now).total_seconds()
+                    if len(self._heap) > 0
+                    else None
+                )
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+        finally:
+            refresh_task.cancel()
+            for task in [*self._running, *self._resolution_retries]:
+                task.cancel()
+
+
+async def run_booker() -> None:
+    app_config = read_app_config()
+    booker = Booker(
+        refresh_interval=timedelta(minutes=app_config.booker.refresh_interval_minutes),
+        preparation=timedelta(minutes=app_config.cron.preparation_minutes),
+    )
+    try:
+        await booker.run()
+    except Exception as e:
+        log.critical(f"Booker daemon crashed: {e}")
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Booker daemon crashed",
+                body=f"Booker daemon crashed, recurring bookings are paused until it restarts: {e}",
+                attach=[error_ctx],
+            )
+        raise
+    finally:
+        await browser_pool.close()
+        await HttpClient.close_singleton()
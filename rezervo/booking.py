@@ -0,0 +1,436 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import UUID
+
+from apprise import NotifyType
+from pydantic import BaseModel
+
+from rezervo.chains.active import get_chain
+from rezervo.chains.common import (
+    authenticate,
+    book_class,
+    find_class,
+    find_class_by_id,
+)
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
+from rezervo.errors import AuthenticationError, BookingError
+from rezervo.http_client import KEEP_ALIVE_STOP_BEFORE_SECONDS, keep_connection_alive
+from rezervo.notify.apprise import aprs
+from rezervo.notify.notify import notify_auth_failure, notify_booking_failure
+from rezervo.providers.schema import AuthData
+from rezervo.schemas.config.config import ConfigValue
+from rezervo.schemas.config.user import ChainIdentifier, ChainUser, Class
+from rezervo.schemas.schedule import RezervoClass
+from rezervo.sessions import pull_sessions
+from rezervo.utils.apprise_utils import aprs_ctx
+from rezervo.utils.clock_utils import ClockCalibration, calibrate_clock, sleep_until
+from rezervo.utils.config_utils import class_config_recurrent_id
+from rezervo.utils.logging_utils import log
+from rezervo.utils.time_utils import readable_seconds
+
+# authentication must stay valid this long after booking opens, to cover any retries
+AUTH_VALIDITY_MARGIN = timedelta(minutes=5)
+
+
+class BookingParticipant(BaseModel):
+    chain_user: ChainUser
+    config: ConfigValue
+    class_config: Class
+    auth_data: Any
+
+
+def notify_participants_of_auth_failure(
+    participants: list[BookingParticipant],
+    error: AuthenticationError,
+    check_run: bool,
+) -> None:
+    for p in participants:
+        if p.config.notifications is not None:
+            notify_auth_failure(p.config.notifications, error, check_run)
+
+
+def notify_participants_of_booking_failure(
+    participants: list[BookingParticipant],
+    error: BookingError,
+    check_run: bool,
+) -> None:
+    for p in participants:
+        if p.config.notifications is not None:
+            notify_booking_failure(
+                p.config.notifications, p.class_config, error, check_run
+            )
+
+
+async def calibrate_chain_clock(
+    chain_identifier: ChainIdentifier, config: ConfigValue
+) -> ClockCalibration:
+    reference_url = get_chain(chain_identifier).clock_reference_url
+    if reference_url is None:
+        return ClockCalibration()
+    clock = await calibrate_clock(
+        reference_url, config.booking.clock_calibration_samples
+    )
+    if clock is None:
+        log.warning(
+            f"Failed to calibrate clock against '{chain_identifier}', using local clock"
+        )
+        return ClockCalibration()
+    log.debug(f"Calibrated clock against '{chain_identifier}' ({clock})")
+    return clock
+
+
+async def refresh_expiring_auth_data(
+    chain_user: ChainUser,
+    auth_data: AuthData,
+    booking_opens_at: datetime,
+    config: ConfigValue,
+) -> AuthData | AuthenticationError:
+    expires_at = get_chain(chain_user.chain).auth_data_expires_at(auth_data)
+    if expires_at is None or expires_at > booking_opens_at + AUTH_VALIDITY_MARGIN:
+        return auth_data
+    log.debug("Authentication expires around booking opening, refreshing ...")
+    get_chain(chain_user.chain).invalidate_auth_data(chain_user)
+    return await authenticate(chain_user, config.auth.max_attempts)
+
+
+async def confirm_class(
+    chain_identifier: ChainIdentifier, _class: RezervoClass
+) -> RezervoClass:
+    confirmed_class = await find_class_by_id(chain_identifier, _class.id)
+    if not isinstance(confirmed_class, RezervoClass):
+        log.warning(
+            f"Could not confirm class '{_class.id}' before booking ({confirmed_class}), proceeding anyway"
+        )
+        return _class
+    return confirmed_class
+
+
+async def prepare_booking_participant(
+    chain_identifier: ChainIdentifier,
+    user_id: UUID,
+    recurrent_booking_id: str,
+    check_run: bool = False,
+) -> BookingParticipant | None:
+    """
+    Load config and recurring booking of the given user, and authenticate the chain user
+    """
+    log.debug("Loading config...")
+    with SessionLocal() as db:
+        user_config = crud.get_user_config_by_id(db, user_id)
+        chain_user = crud.get_chain_user(db, chain_identifier, user_id)
+    if user_config is None:
+        log.error("Failed to load config, aborted.")
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title=f"Failed to load '{chain_identifier}' user config",
+                body=f"Failed to load user config when attempting to book '{chain_identifier}' class",
+                attach=[error_ctx],
+            )
+        return None
+    config = user_config.config
+    if chain_user is None:
+        log.error(f"No {chain_identifier} user for given user id, aborted booking.")
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Missing user when booking",
+                body="No user for given user id when attempting to book class",
+                attach=[error_ctx],
+            )
+        if config.notifications is not None:
+            notify_auth_failure(
+                config.notifications,
+                error=AuthenticationError.ERROR,
+                check_run=check_run,
+            )
+        return None
+    _class_config = None
+    for r in chain_user.recurring_bookings:
+        if class_config_recurrent_id(r) == recurrent_booking_id:
+            _class_config = r
+            break
+    if _class_config is None:
+        log.error(f"Recurring booking with id '{recurrent_booking_id}' not found")
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Recurring booking not found",
+                body="Recurring booking not found for given id",
+                attach=[error_ctx],
+            )
+        return None
+    if config.booking.max_attempts < 1:
+        log.error("Max booking attempts must be a positive number")
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Invalid app-level booking config",
+                body="Max booking attempts must be a positive number",
+                attach=[error_ctx],
+            )
+        if config.notifications is not None:
+            notify_booking_failure(
+                config.notifications,
+                _class_config,
+                BookingError.INVALID_CONFIG,
+                check_run,
+            )
+        return None
+    log.debug("Authenticating chain user...")
+    auth_data = await authenticate(chain_user, config.auth.max_attempts)
+    if isinstance(auth_data, AuthenticationError):
+        log.error("Abort")
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Authentication failure",
+                body="Failed to authenticate when attempting to book class",
+                attach=[error_ctx],
+            )
+        if config.notifications is not None:
+            notify_auth_failure(config.notifications, auth_data, check_run)
+        return None
+    return BookingParticipant(
+        chain_user=chain_user,
+        config=config,
+        class_config=_class_config,
+        auth_data=auth_data,
+    )
+
+
+async def refresh_participant_auth_data(
+    participant: BookingParticipant, booking_opens_at: datetime, check_run: bool
+) -> BookingParticipant | None:
+    refreshed_auth_data = await refresh_expiring_auth_data(
+        participant.chain_user,
+        participant.auth_data,
+        booking_opens_at,
+        participant.config,
+    )
+    if isinstance(refreshed_auth_data, AuthenticationError):
+        log.error(
+            f"Failed to refresh authentication for '{participant.chain_user.username}'"
+        )
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Authentication failure",
+                body="Failed to refresh authentication when attempting to book class",
+                attach=[error_ctx],
+            )
+        notify_participants_of_auth_failure(
+            [participant], refreshed_auth_data, check_run
+        )
+        return None
+    participant.auth_data = refreshed_auth_data
+    return participant
+
+
+async def book_participant(
+    chain_identifier: ChainIdentifier,
+    participant: BookingParticipant,
+    _class: RezervoClass,
+    clock: ClockCalibration | None,
+    check_run: bool,
+) -> bool:
+    booking_result = await book_class(
+        chain_identifier,
+        participant.auth_data,
+        # notifications of the booking modify the class
+        _class.model_copy(deep=True),
+        participant.config,
+        participant.chain_user.user_id,
+        clock,
+    )
+    if isinstance(booking_result, AuthenticationError):
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Authentication failure",
+                body="Failed to authenticate when attempting to book class",
+                attach=[error_ctx],
+            )
+        notify_participants_of_auth_failure([participant], booking_result, check_run)
+        return False
+    if isinstance(booking_result, BookingError):
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Booking failure",
+                body="Failed to book class",
+                attach=[error_ctx],
+            )
+        notify_participants_of_booking_failure([participant], booking_result, check_run)
+        return False
+    log.debug(f"Pulling sessions for '{participant.chain_user.username}' ...")
+    await pull_sessions(chain_identifier, participant.chain_user.user_id)
+    return True
+
+
+async def book_class_for_participants(
+    chain_identifier: ChainIdentifier,
+    participants: list[BookingParticipant],
+    check_run: bool = False,
+) -> list[bool]:
+    """
+    Resolve the class shared by all participants once, wait for booking to open,
+    and book the class for all participants concurrently
+
+    Returns whether the booking (or check run) was successful for each participant
+    """
+    if len(participants) == 0:
+        return []
+    # participants share the same class, and app-level booking config
+    _class_config = participants[0].class_config
+    booking_config = participants[0].config.booking
+    failed = [False] * len(participants)
+    log.debug("Searching for class...")
+    class_search_result = await find_class(chain_identifier, _class_config)
+    if isinstance(class_search_result, AuthenticationError):
+        log.error("Abort")
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Authentication failure",
+                body="Failed to authenticate when attempting to book class",
+                attach=[error_ctx],
+            )
+        notify_participants_of_auth_failure(
+            participants, class_search_result, check_run
+        )
+        return failed
+    if isinstance(class_search_result, BookingError):
+        log.error("Abort")
+        with aprs_ctx() as error_ctx:
+            aprs.notify(
+                notify_type=NotifyType.FAILURE,
+                title="Class retrieval failure",
+                body="Failed to retrieve class when attempting to book",
+                attach=[error_ctx],
+            )
+        notify_participants_of_booking_failure(
+            participants, class_search_result, check_run
+        )
+        return failed
+    if check_run:
+        log.info(":heavy_check_mark: Check complete, all seems fine.")
+        return [True] * len(participants)
+    _class = class_search_result
+    clock = None
+    bookable_participants: list[BookingParticipant | None] = list(participants)
+    if _class.is_bookable:
+        log.info("Booking is already open, booking now")
+    else:
+        delta_to_opening = _class.booking_opens_at - datetime.now().astimezone()
+        wait_time = delta_to_opening.total_seconds()
+        if wait_time < 0:
+            # booking is not open, and booking_opens_at is in the past, so we missed it
+            log.error("Booking is closed. Aborting.")
+            with aprs_ctx() as error_ctx:
+                aprs.notify(
+                    notify_type=NotifyType.FAILURE,
+                    title="Booking is closed",
+                    body="Booking is closed, booking_opens_at is in the past",
+                    attach=[error_ctx],
+                )
+            notify_participants_of_booking_failure(
+                participants, BookingError.ERROR, check_run
+            )
+            return failed
+        wait_time_string = readable_seconds(wait_time)
+        if wait_time > booking_config.max_waiting_minutes * 60:
+            log.error(
+                f"Booking waiting time was {wait_time_string}, "
+                f"but max is {booking_config.max_waiting_minutes} minutes. Aborting."
+            )
+            with aprs_ctx() as error_ctx:
+                aprs.notify(
+                    notify_type=NotifyType.FAILURE,
+                    title="Booking waiting time too long",
+                    body=(
+                        f"Booking waiting time was {wait_time_string}, "
+                        f"but max is {booking_config.max_waiting_minutes} minutes.\n"
+                    ),
+                    attach=[error_ctx],
+                )
+            notify_participants_of_booking_failure(
+                participants, BookingError.TOO_LONG_WAITING_TIME, False
+            )
+            return failed
+        prewarm_at = _class.booking_opens_at - timedelta(
+            seconds=booking_config.prewarm_seconds
+        )
+        log.info(
+            f"Scheduling booking at {_class.booking_opens_at} "
+            f"(about {wait_time_string} from now, pre-warming at {prewarm_at})"
+        )
+        await sleep_until(prewarm_at, 0)
+        log.debug("Pre-warming booking ...")
+        bookable_participants = await asyncio.gather(
+            *[
+                refresh_participant_auth_data(p, _class.booking_opens_at, check_run)
+                for p in participants
+            ]
+        )
+        _class = await confirm_class(chain_identifier, _class)
+        # calibration requests also open the connection to the provider
+        clock = await calibrate_chain_clock(chain_identifier, participants[0].config)
+        dispatch_at = clock.dispatch_time(
+            _class.booking_opens_at
+            + timedelta(milliseconds=booking_config.landing_margin_milliseconds)
+        )
+        log.info(f"Dispatching booking at {dispatch_at} ({clock})")
+        keep_alive_task = None
+        reference_url = get_chain(chain_identifier).clock_reference_url
+        if reference_url is not None:
+            keep_alive_task = asyncio.create_task(
+                keep_connection_alive(
+                    reference_url,
+                    # stop early to leave the idle connection for the booking request
+                    dispatch_at - timedelta(seconds=KEEP_ALIVE_STOP_BEFORE_SECONDS),
+                )
+            )
+        try:
+            await sleep_until(
+                dispatch_at, booking_config.precision_spin_milliseconds / 1000
+            )
+        finally:
+            if keep_alive_task is not None:
+                keep_alive_task.cancel()
+        log.info(f"Awoke at {datetime.now().astimezone()}")
+    log.debug(
+        f"Booking class for {len(participants)} user{'s' if len(participants) != 1 else ''} ..."
+    )
+
+    async def book(p: BookingParticipant | None) -> bool:
+        # participants failing to refresh authentication are already notified
+        if p is None:
+            return False
+        return await book_participant(chain_identifier, p, _class, clock, check_run)
+
+    return list(await asyncio.gather(*[book(p) for p in bookable_participants]))
+
+
+async def book_recurring_booking(
+    chain_identifier: ChainIdentifier,
+    user_id: UUID,
+    recurrent_booking_id: str,
+    check_run: bool = False,
+) -> bool:
+    """
+    Book the class matching the given recurring booking, waiting for booking to open if necessary
+
+    Returns whether the booking (or check run) was successful
+    """
+    participant = await prepare_booking_participant(
+        chain_identifier, user_id, recurrent_booking_id, check_run
+    )
+    if participant is None:
+        return False
+    [success] = await book_class_for_participants(
+        chain_identifier, [participant], check_run
+    )
+    return success
@@ -13,6 +13,7 @@ from rezervo.schemas.config.user import (
     Class,
 )
 from rezervo.schemas.schedule import BookingResult, RezervoClass, RezervoSchedule
+from rezervo.utils.clock_utils import ClockCalibration
 from rezervo.utils.logging_utils import log
 
 
@@ -42,9 +43,10 @@ async def book_class(
     _class: RezervoClass,
     config: ConfigValue,
     user_id: UUID,
+    clock: ClockCalibration | None = None,
 ) -> BookingResult | BookingError | AuthenticationError:
     return await get_chain(chain_identifier).try_book_class(
-        chain_identifier, auth_data, _class, config, user_id
+        chain_identifier, auth_data, _class, config, user_id, clock
     )
 
 
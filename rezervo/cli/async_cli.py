@@ -6,15 +6,24 @@ from functools import partial, wraps
 import asyncer
 from typer import Typer
 
+from rezervo.utils.playwright_utils import browser_pool
+
 
 class AsyncTyper(Typer):
     @staticmethod
     def maybe_run_async(decorator, f):
         if inspect.iscoroutinefunction(f):
 
+            async def run_and_close_browsers(*args, **kwargs):
+                try:
+                    return await f(*args, **kwargs)
+                finally:
+                    # the event loop ends with the command, so pooled browsers can't outlive it
+                    await browser_pool.close()
+
             @wraps(f)
             def runner(*args, **kwargs):
-                return asyncer.runnify(f)(*args, **kwargs)
+                return asyncer.runnify(run_and_close_browsers)(*args, **kwargs)
 
             decorator(runner)
         else:
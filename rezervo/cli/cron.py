@@ -35,6 +35,12 @@ def upsert_cli_cron_job(
     log.debug(f":heavy_check_mark: Cronjob '{comment}' created")
 
 
+def remove_cli_cron_job(crontab: CronTab, comment: str):
+    full_comment = f"{read_app_config().cron.job_comment_prefix} [{comment}]"
+    if crontab.remove_all(comment=full_comment) > 0:
+        log.debug(f":heavy_check_mark: Cronjob '{comment}' removed")
+
+
 @cron_cli.command(name="init")
 def initialize_cron():
     with CronTab(user=True) as crontab:
@@ -64,10 +70,12 @@ def initialize_cron():
         )
         upsert_cli_cron_job(
             crontab,
-            command="purge_playwright",
-            schedule="*/5 * * * *",
-            comment="purge playwright processes",
+            command="purge_sats_class_dates",
+            schedule="0 0 * * *",
+            comment="purge sats class dates",
         )
+        # browser processes are now reaped by the browser pool itself
+        remove_cli_cron_job(crontab, comment="purge playwright processes")
 
 
 @cron_cli.command(name="refresh")
@@ -1,9 +1,10 @@
 from collections import defaultdict
-from datetime import datetime
+from datetime import date, datetime
 from uuid import UUID
 
 from fastapi import HTTPException
 from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from starlette import status
 
@@ -438,6 +439,89 @@ def verify_push_notification_subscription(
     ) is not None
 
 
+def get_brp_activity_details(
+    db: Session, subdomain: str, activity_ids: list[int]
+) -> list[models.BrpActivityDetails]:
+    return (
+        db.query(models.BrpActivityDetails)
+        .filter(
+            models.BrpActivityDetails.subdomain == subdomain,
+            models.BrpActivityDetails.activity_id.in_(activity_ids),
+        )
+        .all()
+    )
+
+
+def upsert_brp_activity_details(
+    db: Session,
+    subdomain: str,
+    activity_id: int,
+    description: str,
+    image_url: str | None,
+):
+    db.merge(
+        models.BrpActivityDetails(
+            subdomain=subdomain,
+            activity_id=activity_id,
+            description=description,
+            image_url=image_url,
+            fetched_at=datetime.now(),
+        )
+    )
+    db.commit()
+
+
+def get_provider_setting(db: Session, chain: str, key: str) -> str | None:
+    setting = (
+        db.query(models.ProviderSetting).filter_by(chain=chain, key=key).one_or_none()
+    )
+    return setting.value if setting is not None else None
+
+
+def upsert_provider_setting(db: Session, chain: str, key: str, value: str):
+    db.merge(
+        models.ProviderSetting(
+            chain=chain, key=key, value=value, updated_at=datetime.now()
+        )
+    )
+    db.commit()
+
+
+def get_sats_class_date(db: Session, class_id: str) -> models.SatsClassDate | None:
+    return db.query(models.SatsClassDate).filter_by(class_id=class_id).one_or_none()
+
+
+def upsert_sats_class_dates(db: Session, class_dates: dict[str, tuple[int, date]]):
+    if len(class_dates) > 0:
+        insert_stmt = insert(models.SatsClassDate).values(
+            [
+                {"class_id": class_id, "club_id": club_id, "class_date": class_date}
+                for class_id, (club_id, class_date) in class_dates.items()
+            ]
+        )
+        db.execute(
+            insert_stmt.on_conflict_do_update(
+                index_elements=[models.SatsClassDate.class_id],
+                set_={
+                    "club_id": insert_stmt.excluded.club_id,
+                    "class_date": insert_stmt.excluded.class_date,
+                },
+            )
+        )
+    db.commit()
+
+
+def purge_past_sats_class_dates(db: Session) -> int:
+    # classes in the past are never looked up
+    row_count = (
+        db.query(models.SatsClassDate)
+        .filter(models.SatsClassDate.class_date < date.today())
+        .delete()
+    )
+    db.commit()
+    return row_count
+
+
 def purge_slack_receipts(db) -> int:
     row_count = (
         db.query(models.SlackClassNotificationReceipt)
@@ -22,3 +22,14 @@ class AuthenticationError(Enum):
     AUTH_TEMPORARILY_BLOCKED = auto()
     INVALID_CREDENTIALS = auto()
     MISSING_TOTP_SESSION = auto()
+
+
+class BookingAttemptFailure(Enum):
+    # booking is not open yet, worth polling tightly around the opening time
+    NOT_OPEN = auto()
+    # rate limited or server error, back off with jitter
+    OVERLOADED = auto()
+    # unclassified failure, retry with regular backoff
+    TRANSIENT = auto()
+    # retrying will not help (e.g. already booked, or class no longer available)
+    TERMINAL = auto()
@@ -1,7 +1,28 @@
-from aiohttp import ClientSession, DummyCookieJar, TCPConnector
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any
+from urllib.parse import urlsplit
+
+from aiohttp import (
+    ClientError,
+    ClientResponse,
+    ClientSession,
+    DummyCookieJar,
+    TCPConnector,
+)
+from pydantic import BaseModel
 
 from rezervo.utils.ssl_utils import get_ssl_context
 
+# should be well below the keep-alive timeout of the connector (15 seconds by default)
+KEEP_ALIVE_INTERVAL_SECONDS = 5
+KEEP_ALIVE_STOP_BEFORE_SECONDS = 1
+
+# maximum number of concurrent bounded requests to a single host through the shared client
+MAX_CONCURRENT_REQUESTS_PER_HOST = 16
+
 
 def create_tcp_connector() -> TCPConnector:
     return TCPConnector(ssl_context=get_ssl_context())
@@ -30,3 +51,83 @@ class HttpClient:
         if cls._session is not None:
             await cls._session.close()
             cls._session = None
+        # semaphores are bound to the event loop of the closed session
+        _host_semaphores.clear()
+
+
+class HostRequestStats(BaseModel):
+    in_flight: int = 0
+    queued: int = 0
+    max_queued: int = 0
+    completed: int = 0
+
+
+class JsonResponse(BaseModel):
+    status: int
+    ok: bool
+    # only decoded for successful responses
+    body: Any = None
+
+
+_host_semaphores: dict[str, asyncio.Semaphore] = {}
+_host_stats: dict[str, HostRequestStats] = {}
+
+
+@asynccontextmanager
+async def bounded_request(
+    method: str, url: str, **kwargs: Any
+) -> AsyncIterator[ClientResponse]:
+    """
+    Send a request through the shared client, waiting while the host already has
+    MAX_CONCURRENT_REQUESTS_PER_HOST requests in flight. The connection is released on exit.
+    """
+    host = urlsplit(url).netloc
+    semaphore = _host_semaphores.setdefault(
+        host, asyncio.Semaphore(MAX_CONCURRENT_REQUESTS_PER_HOST)
+    )
+    stats = _host_stats.setdefault(host, HostRequestStats())
+    stats.queued += 1
+    stats.max_queued = max(stats.max_queued, stats.queued)
+    try:
+        await semaphore.acquire()
+    finally:
+        stats.queued -= 1
+    stats.in_flight += 1
+    try:
+        async with HttpClient.singleton().request(method, url, **kwargs) as res:
+            yield res
+    finally:
+        stats.in_flight -= 1
+        stats.completed += 1
+        semaphore.release()
+
+
+async def fetch_json(url: str, method: str = "GET", **kwargs: Any) -> JsonResponse:
+    """
+    Send a bounded request and decode its JSON body before releasing the connection
+    """
+    async with bounded_request(method, url, **kwargs) as res:
+        if not res.ok:
+            return JsonResponse(status=res.status, ok=False)
+        return JsonResponse(
+            status=res.status, ok=True, body=await res.json(content_type=None)
+        )
+
+
+def host_request_stats() -> dict[str, HostRequestStats]:
+    return {host: stats.model_copy() for host, stats in _host_stats.items()}
+
+
+async def keep_connection_alive(url: str, until: datetime) -> None:
+    """
+    Periodically ping the given url through the shared client, to keep a warm connection in the pool
+    """
+    while (
+        remaining_seconds := (until - datetime.now().astimezone()).total_seconds()
+    ) > 0:
+        try:
+            async with HttpClient.singleton().head(url):
+                pass
+        except ClientError:
+            pass
+        await asyncio.sleep(min(KEEP_ALIVE_INTERVAL_SECONDS, remaining_seconds))
@@ -1,6 +1,6 @@
 import enum
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
 from sqlalchemy import (
     CheckConstraint,
@@ -205,3 +205,42 @@ class UserRelation(Base):
             f"<UserRelation (user_one='{self.user_one}' user_two='{self.user_two}' "
             f"relationship='{self.relationship}')>"
         )
+
+
+class BrpActivityDetails(Base):
+    __tablename__ = "brp_activity_details"
+
+    subdomain: Mapped[str] = mapped_column(primary_key=True)
+    activity_id: Mapped[int] = mapped_column(primary_key=True)
+    description: Mapped[str] = mapped_column()
+    image_url: Mapped[str | None] = mapped_column()
+    fetched_at: Mapped[datetime] = mapped_column()
+
+    def __repr__(self):
+        return (
+            f"<BrpActivityDetails (subdomain='{self.subdomain}' activity_id='{self.activity_id}' "
+            f"fetched_at='{self.fetched_at.isoformat()}')>"
+        )
+
+
+class SatsClassDate(Base):
+    __tablename__ = "sats_class_dates"
+
+    class_id: Mapped[str] = mapped_column(primary_key=True)
+    club_id: Mapped[int] = mapped_column()
+    class_date: Mapped[date] = mapped_column(index=True)
+
+    def __repr__(self):
+        return f"<SatsClassDate (class_id='{self.class_id}' club_id='{self.club_id}' class_date='{self.class_date.isoformat()}')>"
+
+
+class ProviderSetting(Base):
+    __tablename__ = "provider_settings"
+
+    chain: Mapped[str] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(primary_key=True)
+    value: Mapped[str] = mapped_column()
+    updated_at: Mapped[datetime] = mapped_column()
+
+    def __repr__(self):
+        return f"<ProviderSetting (chain='{self.chain}' key='{self.key}' value='{self.value}')>"
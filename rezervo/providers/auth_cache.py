@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
+from rezervo.errors import AuthenticationError
+from rezervo.schemas.config.user import ChainIdentifier, ChainUser
+from rezervo.utils.logging_utils import log
+
+# cached auth data is refreshed when it expires within this margin
+AUTH_DATA_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def credentials_fingerprint(username: str, password: str | None) -> str:
+    return hashlib.sha256(f"{username}\0{password or ''}".encode()).hexdigest()
+
+
+class AuthDataCache[AuthData]:
+    """
+    Cache of auth data (e.g. access tokens) per chain user, persisted in the auth data
+    column of the chain user to be shared between processes, and mirrored in memory
+    """
+
+    def __init__(
+        self,
+        serialize: Callable[[AuthData], str],
+        deserialize: Callable[[str], AuthData],
+        expires_at: Callable[[AuthData], datetime | None],
+    ):
+        self._serialize = serialize
+        self._deserialize = deserialize
+        self._expires_at = expires_at
+        # auth data and fingerprint of the credentials it was issued for
+        self._entries: dict[tuple[ChainIdentifier, UUID], tuple[str, AuthData]] = {}
+        self._locks: dict[tuple[ChainIdentifier, UUID], asyncio.Lock] = {}
+
+    def _is_fresh(self, auth_data: AuthData) -> bool:
+        expires_at = self._expires_at(auth_data)
+        return (
+            expires_at is not None
+            and expires_at - AUTH_DATA_REFRESH_MARGIN > datetime.now().astimezone()
+        )
+
+    def _load_persisted(
+        self, chain_user: ChainUser, fingerprint: str
+    ) -> AuthData | None:
+        with SessionLocal() as db:
+            db_chain_user = crud.get_db_chain_user(
+                db, chain_user.chain, chain_user.user_id
+            )
+        if db_chain_user is None or db_chain_user.auth_data is None:
+            return None
+        if (
+            credentials_fingerprint(db_chain_user.username, db_chain_user.password)
+            != fingerprint
+        ):
+            return None
+        try:
+            return self._deserialize(db_chain_user.auth_data)
+        except ValueError:
+            log.warning(
+                f"Invalid persisted auth data for '{chain_user.chain}' user '{chain_user.username}'"
+            )
+            return None
+
+    async def get(
+        self,
+        chain_user: ChainUser,
+        authenticate: Callable[[ChainUser], Awaitable[AuthData | AuthenticationError]],
+    ) -> AuthData | AuthenticationError:
+        key = (chain_user.chain, chain_user.user_id)
+        fingerprint = credentials_fingerprint(chain_user.username, chain_user.password)
+        # concurrent requests for the same user share a single authentication
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry[0] == fingerprint
+                and self._is_fresh(entry[1])
+            ):
+                return entry[1]
+            persisted = self._load_persisted(chain_user, fingerprint)
+            if persisted is not None and self._is_fresh(persisted):
+                self._entries[key] = (fingerprint, persisted)
+                return persisted
+            auth_data = await authenticate(chain_user)
+            if isinstance(auth_data, AuthenticationError):
+                self._entries.pop(key, None)
+                return auth_data
+            self._entries[key] = (fingerprint, auth_data)
+            if self._expires_at(auth_data) is not None:
+                with SessionLocal() as db:
+                    crud.upsert_chain_user_auth_data(
+                        db,
+                        chain_user.chain,
+                        chain_user.user_id,
+                        self._serialize(auth_data),
+                    )
+            return auth_data
+
+    def invalidate(self, chain_user: ChainUser) -> None:
+        self._invalidate_key((chain_user.chain, chain_user.user_id))
+
+    def invalidate_auth_data(self, auth_data: AuthData) -> None:
+        """
+        Invalidate the given auth data for whichever chain user it was cached for, e.g. when rejected by the provider
+        """
+        for key, (_, cached) in list(self._entries.items()):
+            if cached == auth_data:
+                self._invalidate_key(key)
+
+    def _invalidate_key(self, key: tuple[ChainIdentifier, UUID]) -> None:
+        self._entries.pop(key, None)
+        with SessionLocal() as db:
+            crud.upsert_chain_user_auth_data(db, key[0], key[1], None)
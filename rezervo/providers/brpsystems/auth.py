@@ -1,4 +1,5 @@
 import re
+import time
 
 import requests
 
@@ -28,4 +29,6 @@ async def authenticate(
     if invalid_credentials_matches is not None:
         log.error("Authentication failed, invalid credentials")
         return AuthenticationError.INVALID_CREDENTIALS
-    return BrpAuthData(**auth_res_json)
+    return BrpAuthData(
+        **auth_res_json, expires_at=int(time.time()) + auth_res_json["expires_in"]
+    )
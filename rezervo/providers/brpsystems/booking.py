@@ -3,7 +3,7 @@ from datetime import datetime
 import pytz
 import requests
 
-from rezervo.errors import BookingError
+from rezervo.errors import AuthenticationError, BookingAttemptFailure
 from rezervo.http_client import HttpClient
 from rezervo.models import SessionState
 from rezervo.providers.brpsystems.schema import (
@@ -12,12 +12,34 @@ from rezervo.providers.brpsystems.schema import (
     BrpAuthData,
     BrpSubdomain,
 )
+from rezervo.providers.retry import (
+    BookingFailureMarkers,
+    RetryPolicy,
+    classify_booking_response_status,
+)
 from rezervo.schemas.schedule import BookingResult
 from rezervo.utils.logging_utils import log
 
 SCHEDULE_SEARCH_ATTEMPT_DAYS = 7
 MAX_SCHEDULE_SEARCH_ATTEMPTS = 6
 
+# matched against BRP error codes (e.g. 'TOO_EARLY_TO_BOOK') and messages
+BRP_BOOKING_FAILURE_MARKERS = BookingFailureMarkers(
+    not_open=("not open", "too early", "opens at"),
+    terminal=(
+        "already booked",
+        "already has a booking",
+        "fully booked",
+        "is full",
+        "cancelled",
+        "not found",
+    ),
+)
+
+# BRP reports the exact opening time, and popular classes are full within a minute of it,
+# so keep polling tightly but stop retrying sooner and never back off for long
+BRP_RETRY_POLICY = RetryPolicy(backoff_max_seconds=8, deadline_seconds=60)
+
 
 def booking_url(
     subdomain: BrpSubdomain,
@@ -35,9 +57,24 @@ def booking_url(
     )
 
 
+def booking_result_from_booking_data(booking_data: BookingData) -> BookingResult:
+    return BookingResult(
+        status=(
+            SessionState.WAITLIST
+            if booking_data.type is BookingType.WAITING_LIST
+            else SessionState.BOOKED
+        ),
+        position_in_wait_list=(
+            booking_data.waitingListBooking.waitingListPosition
+            if booking_data.waitingListBooking is not None
+            else None
+        ),
+    )
+
+
 async def book_brp_class(
     subdomain: BrpSubdomain, auth_data: BrpAuthData, class_id: int
-) -> BookingResult | BookingError:
+) -> BookingData | BookingAttemptFailure | AuthenticationError:
     async with HttpClient.singleton().post(
         booking_url(subdomain, auth_data, datetime.now()),
         json={"groupActivity": class_id, "allowWaitingList": True},
@@ -46,22 +83,16 @@ async def book_brp_class(
             "Authorization": f"Bearer {auth_data.access_token}",
         },
     ) as res:
+        if res.status == requests.codes.UNAUTHORIZED:
+            log.error("Booking attempt rejected, since the access token is invalid")
+            return AuthenticationError.TOKEN_INVALID
         if res.status != 201:
-            log.error("Booking attempt failed: " + (await res.text()))
-            return BookingError.ERROR
-        booking_data = BookingData(**await res.json())
-        return BookingResult(
-            status=(
-                SessionState.WAITLIST
-                if booking_data.type is BookingType.WAITING_LIST
-                else SessionState.BOOKED
-            ),
-            position_in_wait_list=(
-                booking_data.waitingListBooking.waitingListPosition
-                if booking_data.waitingListBooking is not None
-                else None
-            ),
-        )
+            body = await res.text()
+            log.error("Booking attempt failed: " + body)
+            return classify_booking_response_status(
+                res.status, body, BRP_BOOKING_FAILURE_MARKERS
+            )
+        return BookingData(**await res.json())
 
 
 async def cancel_brp_booking(
@@ -69,7 +100,7 @@ async def cancel_brp_booking(
     auth_data: BrpAuthData,
     booking_reference: int,
     booking_type: BookingType,
-) -> bool:
+) -> bool | BookingAttemptFailure | AuthenticationError:
     log.debug(f"Cancelling booking of class {booking_reference}")
     async with HttpClient.singleton().delete(
         f"{booking_url(subdomain, auth_data)}/{booking_reference}?bookingType={booking_type.value}",
@@ -78,7 +109,15 @@ async def cancel_brp_booking(
             "Authorization": f"Bearer {auth_data.access_token}",
         },
     ) as res:
+        if res.status == requests.codes.UNAUTHORIZED:
+            log.error(
+                "Booking cancellation attempt rejected, since the access token is invalid"
+            )
+            return AuthenticationError.TOKEN_INVALID
         if res.status != requests.codes.NO_CONTENT:
-            log.error("Booking cancellation attempt failed: " + (await res.text()))
-            return False
+            body = await res.text()
+            log.error("Booking cancellation attempt failed: " + body)
+            return classify_booking_response_status(
+                res.status, body, BRP_BOOKING_FAILURE_MARKERS
+            )
     return True
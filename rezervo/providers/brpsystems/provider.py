@@ -1,42 +1,56 @@
 import asyncio
 import datetime
+import time
 from abc import abstractmethod
+from collections.abc import Callable
+from functools import cached_property
 
+import pytz
 import requests
 from apprise import NotifyType
 from pydantic import TypeAdapter
 
 from rezervo.consts import WEEKDAYS
-from rezervo.errors import AuthenticationError, BookingError
+from rezervo.errors import AuthenticationError, BookingAttemptFailure, BookingError
 from rezervo.http_client import HttpClient
 from rezervo.notify.apprise import aprs
+from rezervo.providers.auth_cache import AuthDataCache
 from rezervo.providers.brpsystems.auth import authenticate
 from rezervo.providers.brpsystems.booking import (
+    BRP_RETRY_POLICY,
     MAX_SCHEDULE_SEARCH_ATTEMPTS,
     SCHEDULE_SEARCH_ATTEMPT_DAYS,
     book_brp_class,
+    booking_result_from_booking_data,
     booking_url,
     cancel_brp_booking,
 )
 from rezervo.providers.brpsystems.schedule import (
+    BRP_CLASS_RESOLUTION_CONCURRENCY,
+    BRP_CLASS_RESOLUTION_TTL_SECONDS,
     fetch_brp_class,
     fetch_brp_schedule,
     fetch_detailed_brp_class,
     fetch_detailed_brp_schedule,
+    find_brp_class_in_schedule_by_config,
+    take_brp_activity_details_cache_stats,
 )
 from rezervo.providers.brpsystems.schema import (
     BookingData,
-    BookingType,
     BrpAuthData,
+    BrpBookingReference,
     BrpClass,
     BrpLocationIdentifier,
     BrpSubdomain,
     DetailedBrpClass,
+    booking_reference_from_booking_data,
+    brp_class_booking_opens_at,
+    brp_class_start_time,
+    datetime_from_brp_date_str,
     session_state_from_brp,
-    tz_aware_iso_from_brp_date_str,
 )
 from rezervo.providers.provider import Provider
-from rezervo.providers.schedule import find_class_in_schedule_by_config
+from rezervo.providers.retry import RetryPolicy
 from rezervo.providers.schema import LocationIdentifier
 from rezervo.schemas.config.user import (
     ChainIdentifier,
@@ -67,15 +81,42 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
     def brp_subdomain(self) -> BrpSubdomain:
         raise NotImplementedError()
 
-    async def _authenticate(
-        self, chain_user: ChainUser
-    ) -> BrpAuthData | AuthenticationError:
+    @property
+    def clock_reference_url(self) -> str | None:
+        return f"https://{self.brp_subdomain}.brpsystems.com/brponline/"
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        return BRP_RETRY_POLICY
+
+    @cached_property
+    def _auth_cache(self) -> AuthDataCache[BrpAuthData]:
+        return AuthDataCache(
+            serialize=BrpAuthData.model_dump_json,
+            deserialize=BrpAuthData.model_validate_json,
+            expires_at=self.auth_data_expires_at,
+        )
+
+    async def _login(self, chain_user: ChainUser) -> BrpAuthData | AuthenticationError:
         if chain_user.password is None:
             return AuthenticationError.INVALID_CREDENTIALS
         return await authenticate(
             self.brp_subdomain, chain_user.username, chain_user.password
         )
 
+    async def _authenticate(
+        self, chain_user: ChainUser
+    ) -> BrpAuthData | AuthenticationError:
+        return await self._auth_cache.get(chain_user, self._login)
+
+    def invalidate_auth_data(self, chain_user: ChainUser) -> None:
+        self._auth_cache.invalidate(chain_user)
+
+    def auth_data_expires_at(self, auth_data: BrpAuthData) -> datetime.datetime | None:
+        if auth_data.expires_at is None:
+            return None
+        return datetime.datetime.fromtimestamp(auth_data.expires_at).astimezone()
+
     async def find_class_by_id(
         self, class_id: str
     ) -> RezervoClass | BookingError | AuthenticationError:
@@ -105,6 +146,73 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
             detailed_brp_class if detailed_brp_class is not None else brp_class,
         )
 
+    @cached_property
+    def _class_resolution_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(BRP_CLASS_RESOLUTION_CONCURRENCY)
+
+    @cached_property
+    def _class_resolutions(
+        self,
+    ) -> dict[str, tuple[float, asyncio.Task[RezervoClass | None]]]:
+        # expiry (monotonic, infinite while in flight) and resolution of each class id
+        return {}
+
+    async def _resolve_class(self, class_id: str) -> RezervoClass | None:
+        async with self._class_resolution_semaphore:
+            _class = await self.find_class_by_id(class_id)
+        if not isinstance(_class, RezervoClass):
+            return None
+        return _class
+
+    async def resolve_classes(self, class_ids: list[str]) -> dict[str, RezervoClass]:
+        """
+        Resolve classes by id concurrently (with bounded concurrency), reusing classes of the
+        cached schedule, as well as recent and in-flight resolutions of the same class
+        (e.g. when pulling sessions of many users booking the same classes)
+        """
+        classes: dict[str, RezervoClass] = {}
+        tasks: dict[str, asyncio.Task[RezervoClass | None]] = {}
+        now = time.monotonic()
+        for class_id in dict.fromkeys(class_ids):
+            cached_class = self._schedule_cache.get_class(class_id)
+            if cached_class is not None:
+                classes[class_id] = cached_class
+                continue
+            resolution = self._class_resolutions.get(class_id)
+            if resolution is None or resolution[0] <= now:
+                task = asyncio.create_task(self._resolve_class(class_id))
+                self._class_resolutions[class_id] = (float("inf"), task)
+                task.add_done_callback(
+                    lambda t, i=class_id: self._on_class_resolved(i, t)
+                )
+                resolution = (float("inf"), task)
+            tasks[class_id] = resolution[1]
+        for class_id, _class in zip(
+            tasks.keys(),
+            await asyncio.gather(*[asyncio.shield(t) for t in tasks.values()]),
+            strict=True,
+        ):
+            if _class is not None:
+                classes[class_id] = _class
+        return classes
+
+    def _on_class_resolved(
+        self, class_id: str, task: asyncio.Task[RezervoClass | None]
+    ) -> None:
+        if self._class_resolutions.get(class_id, (0, None))[1] is not task:
+            return
+        if task.cancelled() or task.exception() is not None:
+            del self._class_resolutions[class_id]
+            return
+        self._class_resolutions[class_id] = (
+            time.monotonic() + BRP_CLASS_RESOLUTION_TTL_SECONDS,
+            task,
+        )
+        # prune expired resolutions
+        now = time.monotonic()
+        for i in [i for i, (exp, _) in self._class_resolutions.items() if exp <= now]:
+            del self._class_resolutions[i]
+
     async def find_class(
         self, _class_config: Class
     ) -> RezervoClass | BookingError | AuthenticationError:
@@ -120,27 +228,45 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
         self,
         auth_data: BrpAuthData,
         class_id: str,
-    ) -> BookingResult | BookingError:
+    ) -> BookingResult | BookingError | BookingAttemptFailure | AuthenticationError:
         # make sure class_id is a valid brp class id
         try:
             brp_class_id = int(class_id)
         except ValueError:
             log.error(f"Invalid brp class id: {class_id}")
             return BookingError.MALFORMED_CLASS
-        return await book_brp_class(self.brp_subdomain, auth_data, brp_class_id)
+        booking_data = await book_brp_class(self.brp_subdomain, auth_data, brp_class_id)
+        if isinstance(booking_data, AuthenticationError):
+            self._auth_cache.invalidate_auth_data(auth_data)
+            return booking_data
+        if isinstance(booking_data, BookingAttemptFailure):
+            return booking_data
+        booking_reference = booking_reference_from_booking_data(booking_data)
+        if booking_reference is not None:
+            self._booking_references.setdefault(auth_data.username, {})[
+                brp_class_id
+            ] = booking_reference
+        return booking_result_from_booking_data(booking_data)
 
-    async def _cancel_booking(
-        self,
-        auth_data: BrpAuthData,
-        _class: RezervoClass,
-    ) -> bool:
-        # make sure class_id is a valid brp class id
-        try:
-            brp_class_id = int(_class.id)
-        except ValueError:
-            log.error(f"Invalid brp class id: {_class.id}")
-            return False
-        # TODO: consider memoizing retrieval of booking reference and type
+    @cached_property
+    def _booking_references(self) -> dict[str, dict[int, BrpBookingReference]]:
+        # booking of each booked class, per brp customer
+        return {}
+
+    def _remember_booking_references(
+        self, auth_data: BrpAuthData, bookings: list[BookingData]
+    ) -> dict[int, BrpBookingReference]:
+        booking_references = {
+            booking.groupActivity.id: reference
+            for booking in bookings
+            if (reference := booking_reference_from_booking_data(booking)) is not None
+        }
+        self._booking_references[auth_data.username] = booking_references
+        return booking_references
+
+    async def _fetch_booking_reference(
+        self, auth_data: BrpAuthData, _class: RezervoClass, brp_class_id: int
+    ) -> BrpBookingReference | None:
         try:
             async with HttpClient.singleton().get(
                 booking_url(self.brp_subdomain, auth_data, datetime.datetime.now()),
@@ -157,24 +283,64 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
                 f"Failed to retrieve booked classes for cancellation of class '{_class.activity.name}' (id={brp_class_id})",
                 e,
             )
-            return False
+            return None
         if bookings_response is None:
+            return None
+        return self._remember_booking_references(auth_data, bookings_response).get(
+            brp_class_id
+        )
+
+    async def _cancel_booking(
+        self,
+        auth_data: BrpAuthData,
+        _class: RezervoClass,
+    ) -> bool | BookingAttemptFailure | AuthenticationError:
+        # make sure class_id is a valid brp class id
+        try:
+            brp_class_id = int(_class.id)
+        except ValueError:
+            log.error(f"Invalid brp class id: {_class.id}")
             return False
-        booking_id = None
-        booking_type: BookingType | None = None
-        for booking in bookings_response:
-            if booking.groupActivity.id == brp_class_id:
-                booking_type = booking.type
-                booking_id = booking.model_dump()[str(booking.type.value)]["id"]
-                break
-        if booking_id is None or booking_type is None:
+        booking_references = self._booking_references.setdefault(auth_data.username, {})
+        booking_reference = booking_references.get(brp_class_id)
+        if booking_reference is not None:
+            cancelled = await self._cancel_referenced_booking(
+                auth_data, booking_reference
+            )
+            if (
+                cancelled is True
+                or cancelled is BookingAttemptFailure.OVERLOADED
+                or isinstance(cancelled, AuthenticationError)
+            ):
+                return cancelled
+            # the cached reference may be stale, look it up again and retry once
+            booking_references.pop(brp_class_id, None)
+        booking_reference = await self._fetch_booking_reference(
+            auth_data, _class, brp_class_id
+        )
+        if booking_reference is None:
             log.error(
                 f"No sessions active matching the cancellation criteria for class '{_class.activity.name}' (id={brp_class_id})",
             )
             return False
-        return await cancel_brp_booking(
-            self.brp_subdomain, auth_data, booking_id, booking_type
+        cancelled = await self._cancel_referenced_booking(auth_data, booking_reference)
+        if cancelled is not BookingAttemptFailure.OVERLOADED:
+            # the booking is either gone, or the reference may be stale and should be looked up again
+            self._booking_references[auth_data.username].pop(brp_class_id, None)
+        return cancelled
+
+    async def _cancel_referenced_booking(
+        self, auth_data: BrpAuthData, booking_reference: BrpBookingReference
+    ) -> bool | BookingAttemptFailure | AuthenticationError:
+        cancelled = await cancel_brp_booking(
+            self.brp_subdomain,
+            auth_data,
+            booking_reference.booking_id,
+            booking_reference.booking_type,
         )
+        if isinstance(cancelled, AuthenticationError):
+            self._auth_cache.invalidate_auth_data(auth_data)
+        return cancelled
 
     async def _fetch_past_and_booked_sessions(
         self,
@@ -201,6 +367,12 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
                     "Authorization": f"Bearer {auth_data.access_token}",
                 },
             ) as res:
+                if res.status == requests.codes.UNAUTHORIZED:
+                    log.error(
+                        f"Authentication rejected for '{chain_user.chain}' user '{chain_user.username}'"
+                    )
+                    self.invalidate_auth_data(chain_user)
+                    return None
                 bookings_response: list[BookingData] = await res.json()
         except requests.exceptions.RequestException as e:
             log.error(
@@ -218,11 +390,14 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
         brp_sessions = []
         for s in bookings_response:
             brp_sessions.append(BookingData.model_validate(s))
+        self._remember_booking_references(auth_data, brp_sessions)
+        classes = await self.resolve_classes(
+            [str(s.groupActivity.id) for s in brp_sessions]
+        )
         past_and_imminent_sessions = []
         for s in brp_sessions:
-            # TODO: fetch concurrently
-            _class = await self.find_class_by_id(str(s.groupActivity.id))
-            if not isinstance(_class, RezervoClass):
+            _class = classes.get(str(s.groupActivity.id))
+            if _class is None:
                 continue
             past_and_imminent_sessions.append(
                 UserSession(
@@ -253,6 +428,15 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
         )
         return await fetch_detailed_brp_schedule(self.brp_subdomain, schedule)
 
+    def log_cache_summary(self) -> None:
+        stats = take_brp_activity_details_cache_stats(self.brp_subdomain)
+        if stats.hits + stats.misses == 0:
+            return
+        log.info(
+            f"Brp activity details cache of '{self.brp_subdomain}': {stats.hits} hits, {stats.misses} misses "
+            f"(hit rate {stats.hit_rate:.1%})"
+        )
+
     def _rezervo_schedule_from_brp_schedule(
         self,
         from_date: datetime.datetime,
@@ -263,15 +447,11 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
             from_date.date() + datetime.timedelta(days=i): [] for i in range(days)
         }
         for _class in schedule:
-            class_date = datetime.datetime.fromisoformat(
-                tz_aware_iso_from_brp_date_str(_class.duration.start)
-            ).date()
-            days_map[class_date].append(
-                self.rezervo_class_from_brp_class(
-                    self.brp_subdomain,
-                    _class,
-                )
+            rezervo_class = self.rezervo_class_from_brp_class(
+                self.brp_subdomain,
+                _class,
             )
+            days_map[rezervo_class.start_time.date()].append(rezervo_class)
         return RezervoSchedule(
             days=[
                 RezervoDay(
@@ -286,7 +466,7 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
             ]
         )
 
-    async def fetch_schedule(
+    async def _fetch_schedule(
         self,
         from_date: datetime.datetime,
         days: int,
@@ -315,14 +495,11 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
         brp_class: BrpClass | DetailedBrpClass,
     ) -> RezervoClass:
         category = determine_activity_category(brp_class.name)
+        booking_opens_at = datetime_from_brp_date_str(brp_class.bookableEarliest)
         return RezervoClass(
             id=str(brp_class.id),  # TODO: check if unique across all subdomains
-            start_time=datetime.datetime.fromisoformat(
-                tz_aware_iso_from_brp_date_str(brp_class.duration.start)
-            ),
-            end_time=datetime.datetime.fromisoformat(
-                tz_aware_iso_from_brp_date_str(brp_class.duration.end)
-            ),
+            start_time=datetime_from_brp_date_str(brp_class.duration.start),
+            end_time=datetime_from_brp_date_str(brp_class.duration.end),
             location=RezervoLocation(
                 id=self.location_from_provider_location_identifier(  # type: ignore
                     brp_class.businessUnit.id
@@ -330,13 +507,9 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
                 studio=brp_class.businessUnit.name,
                 room=", ".join([location.name for location in brp_class.locations]),
             ),
-            is_bookable=datetime.datetime.fromisoformat(
-                tz_aware_iso_from_brp_date_str(brp_class.bookableEarliest)
-            )
+            is_bookable=booking_opens_at
             < datetime.datetime.now().astimezone()
-            < datetime.datetime.fromisoformat(
-                tz_aware_iso_from_brp_date_str(brp_class.bookableLatest)
-            ),
+            < datetime_from_brp_date_str(brp_class.bookableLatest),
             is_cancelled=brp_class.cancelled,
             total_slots=brp_class.slots.total,
             available_slots=brp_class.slots.leftToBook,
@@ -360,10 +533,68 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
             ),
             instructors=[RezervoInstructor(name=s.name) for s in brp_class.instructors],
             user_status=None,
-            booking_opens_at=datetime.datetime.fromisoformat(
-                tz_aware_iso_from_brp_date_str(brp_class.bookableEarliest)
+            booking_opens_at=booking_opens_at,
+        )
+
+    @cached_property
+    def _booking_lead_times(self) -> dict[tuple[int, str], datetime.timedelta]:
+        # observed time from booking opening to class start, per business unit and activity
+        return {}
+
+    async def _find_brp_class_occurrence(
+        self,
+        subdomain: BrpSubdomain,
+        business_unit: int,
+        _class_config: Class,
+        date: datetime.datetime,
+    ) -> BrpClass | BookingError:
+        brp_class = find_brp_class_in_schedule_by_config(
+            _class_config,
+            business_unit,
+            await fetch_brp_schedule(subdomain, business_unit, days=1, from_date=date),
+        )
+        if isinstance(brp_class, BrpClass):
+            self._booking_lead_times[(business_unit, _class_config.activity_id)] = (
+                brp_class_start_time(brp_class) - brp_class_booking_opens_at(brp_class)
+            )
+        return brp_class
+
+    def _predicted_brp_class_occurrences(
+        self,
+        business_unit: int,
+        _class_config: Class,
+        occurrence_dates: list[datetime.datetime],
+    ) -> list[datetime.datetime] | None:
+        """
+        Occurrences whose booking opening is predicted to be closest to now, i.e. the last one
+        that has opened and the first one that has not
+        """
+        lead_time = self._booking_lead_times.get(
+            (business_unit, _class_config.activity_id)
+        )
+        if lead_time is None:
+            return None
+        tz = pytz.timezone("Europe/Oslo")  # TODO: clean this
+        now = datetime.datetime.now().astimezone()
+        first_unopened = next(
+            (
+                i
+                for i, date in enumerate(occurrence_dates)
+                if tz.localize(
+                    datetime.datetime.combine(
+                        date.date(),
+                        datetime.time(
+                            _class_config.start_time.hour,
+                            _class_config.start_time.minute,
+                        ),
+                    )
+                )
+                - lead_time
+                > now
             ),
+            len(occurrence_dates),
         )
+        return occurrence_dates[max(first_unopened - 1, 0) : first_unopened + 1]
 
     # TODO: generalize
     async def try_find_brp_class(
@@ -379,52 +610,104 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
                 f"Could not find business unit matching location id {_class_config.location_id}"
             )
             return BookingError.ERROR
-        attempts = 0
-        brp_class = None
+        if not 0 <= _class_config.weekday < len(WEEKDAYS):
+            log.error(f"Invalid weekday number ({_class_config.weekday=})")
+            return BookingError.MALFORMED_SEARCH
         now_date = datetime.datetime.now()
-        from_date = datetime.datetime(now_date.year, now_date.month, now_date.day)
-        search_result = None
-        days_per_search = SCHEDULE_SEARCH_ATTEMPT_DAYS
-        while attempts < MAX_SCHEDULE_SEARCH_ATTEMPTS:
-            brp_schedule = await fetch_brp_schedule(
-                subdomain,
-                business_unit,
-                days=days_per_search,
-                from_date=from_date,
+        today = datetime.datetime(now_date.year, now_date.month, now_date.day)
+        # only the days of the week matching the class can contain it
+        occurrence_dates = [
+            today
+            + datetime.timedelta(
+                days=(_class_config.weekday - today.weekday()) % 7 + 7 * i
             )
-            if brp_schedule is None:
-                log.error("Schedule get request denied")
-                return BookingError.ERROR
-            search_result = find_class_in_schedule_by_config(
-                _class_config,
-                self._rezervo_schedule_from_brp_schedule(
-                    from_date, days_per_search, brp_schedule
-                ),
+            for i in range(
+                MAX_SCHEDULE_SEARCH_ATTEMPTS * SCHEDULE_SEARCH_ATTEMPT_DAYS // 7
             )
-            if (
-                search_result is not None
-                and not isinstance(search_result, BookingError)
-                and not isinstance(search_result, AuthenticationError)
-            ):
-                if brp_class is None:
-                    brp_class = search_result
-                else:
-                    # Check if class has closer booking date than any already found class
-                    now = datetime.datetime.now().astimezone()
-                    new_booking_delta = abs(now - search_result.booking_opens_at)
-                    existing_booking_delta = abs(now - brp_class.booking_opens_at)
-                    if new_booking_delta < existing_booking_delta:
-                        brp_class = search_result
-                    else:
-                        break
-            from_date += datetime.timedelta(days=days_per_search)
-            attempts += 1
-        if brp_class is None:
+        ]
+        searches: dict[datetime.datetime, asyncio.Task[BrpClass | BookingError]] = {}
+
+        def search(date: datetime.datetime) -> asyncio.Task[BrpClass | BookingError]:
+            if date not in searches:
+                task = asyncio.create_task(
+                    self._find_brp_class_occurrence(
+                        subdomain, business_unit, _class_config, date
+                    )
+                )
+                # failures of searches that are never inspected should not be reported
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                searches[date] = task
+            return searches[date]
+
+        try:
+            brp_class = await self._try_find_predicted_brp_class(
+                business_unit, _class_config, occurrence_dates, search
+            )
+            if brp_class is None:
+                brp_class = await self._search_brp_class_occurrences(
+                    occurrence_dates, search
+                )
+        finally:
+            for task in searches.values():
+                task.cancel()
+        if isinstance(brp_class, BookingError):
             log.warning(f"Could not find class matching criteria: {_class_config}")
-            if search_result is None:
-                return BookingError.CLASS_MISSING
-            return search_result
-        return brp_class
+            return brp_class
+        return self.rezervo_class_from_brp_class(subdomain, brp_class)
+
+    async def _try_find_predicted_brp_class(
+        self,
+        business_unit: int,
+        _class_config: Class,
+        occurrence_dates: list[datetime.datetime],
+        search: Callable[[datetime.datetime], asyncio.Task[BrpClass | BookingError]],
+    ) -> BrpClass | None:
+        predicted_dates = self._predicted_brp_class_occurrences(
+            business_unit, _class_config, occurrence_dates
+        )
+        if predicted_dates is None:
+            return None
+        results = await asyncio.gather(*[search(date) for date in predicted_dates])
+        brp_classes = [r for r in results if isinstance(r, BrpClass)]
+        if len(brp_classes) != len(results):
+            return None
+        now = datetime.datetime.now().astimezone()
+        # the prediction only holds if the found occurrences are on either side of now
+        if (
+            predicted_dates[0] != occurrence_dates[0]
+            and brp_class_booking_opens_at(brp_classes[0]) > now
+        ) or (
+            predicted_dates[-1] != occurrence_dates[-1]
+            and brp_class_booking_opens_at(brp_classes[-1]) <= now
+        ):
+            return None
+        return min(brp_classes, key=lambda c: abs(now - brp_class_booking_opens_at(c)))
+
+    async def _search_brp_class_occurrences(
+        self,
+        occurrence_dates: list[datetime.datetime],
+        search: Callable[[datetime.datetime], asyncio.Task[BrpClass | BookingError]],
+    ) -> BrpClass | BookingError:
+        # start all searches up front, but inspect them in order to stop at the closest booking date
+        for date in occurrence_dates:
+            search(date)
+        brp_class = None
+        search_result: BrpClass | BookingError = BookingError.CLASS_MISSING
+        for date in occurrence_dates:
+            search_result = await search(date)
+            if not isinstance(search_result, BrpClass):
+                continue
+            if brp_class is not None:
+                # Check if class has closer booking date than any already found class
+                now = datetime.datetime.now().astimezone()
+                new_booking_delta = abs(now - brp_class_booking_opens_at(search_result))
+                existing_booking_delta = abs(
+                    now - brp_class_booking_opens_at(brp_class)
+                )
+                if new_booking_delta >= existing_booking_delta:
+                    break
+            brp_class = search_result
+        return brp_class if brp_class is not None else search_result
 
     async def verify_authentication(self, credentials: ChainUserCredentials) -> bool:
         return credentials.password is not None and not isinstance(
@@ -460,5 +743,7 @@ class BrpProvider(Provider[BrpAuthData, BrpLocationIdentifier]):
         ) as res:
             if res.status != requests.codes.CREATED:
                 log.error("Check in failed: " + (await res.text()))
+                if res.status == requests.codes.UNAUTHORIZED:
+                    self.invalidate_auth_data(chain_user)
                 return False
         return True
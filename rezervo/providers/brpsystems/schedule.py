@@ -1,27 +1,59 @@
 import asyncio
+import time
 from datetime import UTC, datetime, timedelta
 from urllib.parse import urlencode
 
+import pytz
 import requests
 from apprise import NotifyType
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 
-from rezervo.http_client import HttpClient
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
+from rezervo.errors import BookingError
+from rezervo.http_client import fetch_json, host_request_stats
 from rezervo.notify.apprise import aprs
 from rezervo.providers.brpsystems.schema import (
     BrpActivityDetails,
+    BrpActivityDetailsCacheStats,
     BrpClass,
     BrpReceivedActivityDetails,
     BrpSubdomain,
     DetailedBrpClass,
     RawBrpClass,
+    brp_class_start_time,
 )
+from rezervo.schemas.config.user import Class
 from rezervo.utils.apprise_utils import aprs_ctx
 from rezervo.utils.logging_utils import log
 from rezervo.utils.pydantic_utils import hashable_validation_errors
 
 BRP_MAX_SCHEDULE_DAYS_PER_FETCH = 14
 
+# activity details are kept in memory for this long, and persisted indefinitely
+BRP_ACTIVITY_DETAILS_TTL_SECONDS = 60 * 60
+# persisted activity details older than this are still used, but refreshed in the background
+BRP_ACTIVITY_DETAILS_REFRESH_AGE = timedelta(days=1)
+
+# maximum number of concurrent class lookups per subdomain
+BRP_CLASS_RESOLUTION_CONCURRENCY = 8
+# resolved classes are shared for this long, e.g. between users of the same session pull
+BRP_CLASS_RESOLUTION_TTL_SECONDS = 60
+
+
+# expiry (monotonic, infinite while in flight) and fetch of activity details
+_activity_details: dict[
+    tuple[BrpSubdomain, int],
+    tuple[float, asyncio.Future[BrpActivityDetails | None]],
+] = {}
+_activity_details_refreshes: dict[
+    tuple[BrpSubdomain, int], asyncio.Task[BrpActivityDetails | None]
+] = {}
+# activity details cache lookups since the last summary, per subdomain
+_activity_details_stats: dict[BrpSubdomain, BrpActivityDetailsCacheStats] = {}
+_brp_classes_adapter = TypeAdapter(list[BrpClass])
+_raw_brp_classes_adapter = TypeAdapter(list[RawBrpClass])
+
 
 def classes_schedule_url(subdomain: BrpSubdomain, business_unit: int) -> str:
     return f"https://{subdomain}.brpsystems.com/brponline/api/ver3/businessunits/{business_unit}/groupactivities"
@@ -40,17 +72,14 @@ async def fetch_brp_class(
     business_unit: int,
     class_id: str,
 ) -> BrpClass | None:
-    async with HttpClient.singleton().get(
-        class_url(subdomain, business_unit, class_id)
-    ) as res:
-        if res.status != requests.codes.OK:
-            log.warning(
-                f"Failed to fetch brp class with id {class_id}, received status {res.status}"
-            )
-            return None
-        json_result = await res.json()
+    res = await fetch_json(class_url(subdomain, business_unit, class_id))
+    if res.status != requests.codes.OK:
+        log.warning(
+            f"Failed to fetch brp class with id {class_id}, received status {res.status}"
+        )
+        return None
     try:
-        raw_brp_class = RawBrpClass(**json_result)
+        raw_brp_class = RawBrpClass(**res.body)
         if (
             raw_brp_class.bookableEarliest is None
             or raw_brp_class.bookableLatest is None
@@ -79,45 +108,256 @@ async def fetch_detailed_brp_class(
     return detailed_schedule[0]
 
 
+async def _fetch_brp_activity_details(
+    subdomain: BrpSubdomain, activity_id: int
+) -> BrpActivityDetails | None:
+    res = await fetch_json(detailed_activity_url(subdomain, activity_id))
+    if res.status != requests.codes.OK:
+        log.warning(
+            f"Failed to fetch class detail for {subdomain}, received status {res.status}"
+        )
+        return None
+    details = BrpReceivedActivityDetails(**res.body)
+    image_url = None
+    if details.assets is not None and len(details.assets) > 0:
+        image_url = details.assets[min(2, len(details.assets) - 1)].contentUrl
+    activity_details = BrpActivityDetails(
+        description=details.description if details.description is not None else "",
+        image_url=image_url,
+    )
+    with SessionLocal() as db:
+        crud.upsert_brp_activity_details(
+            db,
+            subdomain,
+            activity_id,
+            activity_details.description,
+            activity_details.image_url,
+        )
+    return activity_details
+
+
+def _remember_brp_activity_details(
+    subdomain: BrpSubdomain, activity_id: int, details: BrpActivityDetails
+) -> asyncio.Future[BrpActivityDetails | None]:
+    future: asyncio.Future[BrpActivityDetails | None] = (
+        asyncio.get_running_loop().create_future()
+    )
+    future.set_result(details)
+    _activity_details[(subdomain, activity_id)] = (
+        time.monotonic() + BRP_ACTIVITY_DETAILS_TTL_SECONDS,
+        future,
+    )
+    return future
+
+
+def _refresh_brp_activity_details_in_background(
+    subdomain: BrpSubdomain, activity_id: int
+) -> None:
+    key = (subdomain, activity_id)
+    if key in _activity_details_refreshes:
+        return
+    task = asyncio.create_task(_fetch_brp_activity_details(subdomain, activity_id))
+    _activity_details_refreshes[key] = task
+
+    def on_done(t: asyncio.Task[BrpActivityDetails | None]) -> None:
+        del _activity_details_refreshes[key]
+        if t.cancelled():
+            return
+        if t.exception() is not None:
+            log.warning(
+                f"Failed to refresh details of brp activity {activity_id} for {subdomain}: {t.exception()}"
+            )
+            return
+        details = t.result()
+        if details is not None:
+            _remember_brp_activity_details(subdomain, activity_id, details)
+
+    task.add_done_callback(on_done)
+
+
+def _load_persisted_brp_activity_details(
+    subdomain: BrpSubdomain, activity_ids: list[int]
+) -> dict[int, asyncio.Future[BrpActivityDetails | None]]:
+    with SessionLocal() as db:
+        rows = crud.get_brp_activity_details(db, subdomain, activity_ids)
+    stale_before = datetime.now() - BRP_ACTIVITY_DETAILS_REFRESH_AGE
+    persisted = {}
+    for row in rows:
+        persisted[row.activity_id] = _remember_brp_activity_details(
+            subdomain,
+            row.activity_id,
+            BrpActivityDetails(description=row.description, image_url=row.image_url),
+        )
+        if row.fetched_at < stale_before:
+            _refresh_brp_activity_details_in_background(subdomain, row.activity_id)
+    return persisted
+
+
+def _fetch_brp_activity_details_once(
+    subdomain: BrpSubdomain, activity_id: int
+) -> asyncio.Future[BrpActivityDetails | None]:
+    key = (subdomain, activity_id)
+    task = asyncio.create_task(_fetch_brp_activity_details(subdomain, activity_id))
+    _activity_details[key] = (float("inf"), task)
+
+    def on_done(t: asyncio.Task[BrpActivityDetails | None]) -> None:
+        if _activity_details.get(key, (0, None))[1] is not t:
+            return
+        if t.cancelled() or t.exception() is not None or t.result() is None:
+            # do not remember failures
+            del _activity_details[key]
+            return
+        _activity_details[key] = (
+            time.monotonic() + BRP_ACTIVITY_DETAILS_TTL_SECONDS,
+            t,
+        )
+
+    task.add_done_callback(on_done)
+    return task
+
+
+async def fetch_brp_activity_details_batch(
+    subdomain: BrpSubdomain, activity_ids: list[int]
+) -> dict[int, BrpActivityDetails | None]:
+    """
+    Fetch details of the given activities, from memory, from the database or from brp (in that order),
+    sharing in-flight fetches of the same activity
+    """
+    fetches: dict[int, asyncio.Future[BrpActivityDetails | None]] = {}
+    stats = _activity_details_stats.setdefault(
+        subdomain, BrpActivityDetailsCacheStats()
+    )
+    now = time.monotonic()
+    for activity_id in dict.fromkeys(activity_ids):
+        cached = _activity_details.get((subdomain, activity_id))
+        if cached is not None and cached[0] > now:
+            fetches[activity_id] = cached[1]
+    missing = [i for i in dict.fromkeys(activity_ids) if i not in fetches]
+    if len(missing) > 0:
+        fetches.update(_load_persisted_brp_activity_details(subdomain, missing))
+    for activity_id in dict.fromkeys(activity_ids):
+        if activity_id not in fetches:
+            stats.misses += 1
+            fetches[activity_id] = _fetch_brp_activity_details_once(
+                subdomain, activity_id
+            )
+        else:
+            stats.hits += 1
+    results = await asyncio.gather(*[asyncio.shield(f) for f in fetches.values()])
+    return dict(zip(fetches.keys(), results, strict=True))
+
+
+def take_brp_activity_details_cache_stats(
+    subdomain: BrpSubdomain,
+) -> BrpActivityDetailsCacheStats:
+    """
+    Activity details cache lookups since the previous call, e.g. to summarize a session pull
+    """
+    return _activity_details_stats.pop(subdomain, BrpActivityDetailsCacheStats())
+
+
 async def fetch_detailed_brp_schedule(
     subdomain: BrpSubdomain,
     schedule: list[BrpClass],
 ) -> list[DetailedBrpClass]:
-    class_details_map: dict[int, BrpActivityDetails] = {}
-    fetch_detailed_activity_tasks = []
-    detected_activity_ids = set()
-    for brp_class in schedule:
-        activity_id = brp_class.groupActivityProduct.id
-        if brp_class.groupActivityProduct.id not in detected_activity_ids:
-            fetch_detailed_activity_tasks.append(
-                HttpClient.singleton().get(
-                    detailed_activity_url(subdomain, activity_id),
-                )
-            )
-            detected_activity_ids.add(activity_id)
-    for res in await asyncio.gather(*fetch_detailed_activity_tasks):
-        if res.status != requests.codes.OK:
-            log.warning(
-                f"Failed to fetch class detail for {subdomain}, received status {res.status}"
-            )
-            continue
-        details = BrpReceivedActivityDetails(**(await res.json()))
-        image_url = None
-        if details.assets is not None and len(details.assets) > 0:
-            image_url = details.assets[min(2, len(details.assets) - 1)].contentUrl
-        class_details_map[details.id] = BrpActivityDetails(
-            description=details.description if details.description is not None else "",
-            image_url=image_url,
-        )
+    class_details_map = await fetch_brp_activity_details_batch(
+        subdomain, [c.groupActivityProduct.id for c in schedule]
+    )
     return [
+        # nested models of the validated class are reused as is
         DetailedBrpClass(
-            **brp_class.model_dump(),
-            activity_details=class_details_map[brp_class.groupActivityProduct.id],
+            **dict(brp_class),
+            activity_details=(
+                class_details_map[brp_class.groupActivityProduct.id]
+                or BrpActivityDetails(description="")
+            ),
         )
         for brp_class in schedule
     ]
 
 
+def find_brp_class_in_schedule_by_config(
+    _class_config: Class, business_unit: int, schedule: list[BrpClass]
+) -> BrpClass | BookingError:
+    """
+    Find the first class matching the given recurring booking directly on the brp fields,
+    without converting the schedule
+    """
+    tz = pytz.timezone("Europe/Oslo")  # TODO: clean this
+    found_slot = False
+    for brp_class in schedule:
+        if (
+            brp_class.businessUnit.id != business_unit
+            or str(brp_class.groupActivityProduct.id) != _class_config.activity_id
+        ):
+            continue
+        start_time = brp_class_start_time(brp_class).astimezone(tz)
+        if start_time.weekday() != _class_config.weekday:
+            continue
+        if (start_time.hour, start_time.minute) == (
+            _class_config.start_time.hour,
+            _class_config.start_time.minute,
+        ):
+            return brp_class
+        found_slot = True
+    if found_slot:
+        return BookingError.INCORRECT_START_TIME
+    return BookingError.CLASS_MISSING
+
+
+def validate_brp_items[T: RawBrpClass | BrpClass](
+    adapter: TypeAdapter[list[T]],
+    model: type[T],
+    items: list,
+    parse_errors: set,
+) -> list[T]:
+    """
+    Validate the items in a single pass, only falling back to validating each item separately if some are malformed
+    """
+    try:
+        return adapter.validate_python(items)
+    except ValidationError:
+        pass
+    validated = []
+    for item in items:
+        try:
+            validated.append(model.model_validate(item))
+        except ValidationError as e:
+            parse_errors.update(hashable_validation_errors(e))
+    return validated
+
+
+def brp_classes_from_json(items: list, parse_errors: set) -> list[BrpClass]:
+    """
+    Validate the bookable classes of a schedule response, reporting malformed classes in parse_errors
+    """
+    bookable_items = []
+    sparse_items = []
+    for item in items:
+        if isinstance(item, dict) and (
+            item.get("bookableEarliest") is None or item.get("bookableLatest") is None
+        ):
+            sparse_items.append(item)
+        else:
+            bookable_items.append(item)
+    if len(sparse_items) > 0:
+        # sparse classes without a booking window are always dropped, but still checked for being malformed
+        sparse_classes = validate_brp_items(
+            _raw_brp_classes_adapter, RawBrpClass, sparse_items, parse_errors
+        )
+        log.debug(
+            f"Dropped {len(sparse_items)} brp classes without a booking window"
+            + (
+                f" ({len(sparse_items) - len(sparse_classes)} malformed)"
+                if len(sparse_classes) < len(sparse_items)
+                else ""
+            )
+        )
+    return validate_brp_items(
+        _brp_classes_adapter, BrpClass, bookable_items, parse_errors
+    )
+
+
 def deduplicated_brp_schedule(classes: list[BrpClass]) -> list[BrpClass]:
     seen_class_ids = set()
     unique_classes = []
@@ -150,31 +390,23 @@ async def fetch_brp_schedule(
             "period.end": to_date.strftime("%Y-%m-%dT%H:%M:%S") + ".000Z",
         }
         fetch_schedule_tasks.append(
-            HttpClient.singleton().get(
+            fetch_json(
                 f"{classes_schedule_url(subdomain, business_unit)}?{urlencode(query_params)}"
             )
         )
         from_date = to_date
-    parse_errors = set()
-    for res in await asyncio.gather(*fetch_schedule_tasks):
+    responses = await asyncio.gather(*fetch_schedule_tasks)
+    host_stats = host_request_stats().get(f"{subdomain}.brpsystems.com")
+    if host_stats is not None:
+        log.debug(
+            f"Brp requests to {subdomain}: {host_stats.in_flight} in flight, "
+            f"{host_stats.queued} queued (max {host_stats.max_queued}), {host_stats.completed} completed"
+        )
+    parse_errors: set = set()
+    for res in responses:
         if res.status != requests.codes.OK:
             raise Exception("Failed to fetch brp schedule")
-        for item in await res.json():
-            try:
-                raw_brp_class = RawBrpClass(**item)
-            except ValidationError as e:
-                parse_errors.update(hashable_validation_errors(e))
-                continue
-            if (
-                raw_brp_class.bookableEarliest is not None
-                and raw_brp_class.bookableLatest is not None
-            ):
-                try:
-                    brp_class = BrpClass(**raw_brp_class.model_dump())
-                except ValidationError as e:
-                    parse_errors.update(hashable_validation_errors(e))
-                    continue
-                classes.append(brp_class)
+        classes.extend(brp_classes_from_json(res.body, parse_errors))
     if len(parse_errors) > 0:
         log.warning(f"Failed to parse some brp classes\n{parse_errors}")
         with aprs_ctx() as error_ctx:
@@ -1,5 +1,6 @@
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 
 import pytz
 from pydantic import BaseModel, ConfigDict
@@ -19,6 +20,8 @@ class BrpAuthData(BaseModel):
     access_token: str
     expires_in: int
     refresh_token: str
+    # not part of the BRP response, derived from `expires_in` when authenticating
+    expires_at: int | None = None
 
 
 class Duration(BaseModel):
@@ -111,6 +114,16 @@ class BrpActivityDetails(BaseModel):
     image_url: str | None = None
 
 
+class BrpActivityDetailsCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
 class DetailedBrpClass(BrpClass):
     activity_details: BrpActivityDetails
 
@@ -161,6 +174,24 @@ class BookingData(BaseModel):
     checkedIn: str | None = None
 
 
+class BrpBookingReference(BaseModel):
+    booking_id: int
+    booking_type: BookingType
+
+
+def booking_reference_from_booking_data(
+    booking: BookingData,
+) -> BrpBookingReference | None:
+    booking_details = (
+        booking.waitingListBooking
+        if booking.type is BookingType.WAITING_LIST
+        else booking.groupActivityBooking
+    )
+    if booking_details is None:
+        return None
+    return BrpBookingReference(booking_id=booking_details.id, booking_type=booking.type)
+
+
 class Country(BaseModel):
     id: int
     name: str
@@ -244,5 +275,15 @@ def session_state_from_brp(
     return SessionState.UNKNOWN
 
 
-def tz_aware_iso_from_brp_date_str(date: str) -> str:
-    return pytz.UTC.localize(datetime.fromisoformat(date.replace("Z", ""))).isoformat()
+# schedules repeat the same timestamps many times (e.g. shared booking windows and class times)
+@lru_cache(maxsize=8192)
+def datetime_from_brp_date_str(date: str) -> datetime:
+    return pytz.UTC.localize(datetime.fromisoformat(date.replace("Z", "")))
+
+
+def brp_class_start_time(brp_class: BaseBrpClass) -> datetime:
+    return datetime_from_brp_date_str(brp_class.duration.start)
+
+
+def brp_class_booking_opens_at(brp_class: BrpClass) -> datetime:
+    return datetime_from_brp_date_str(brp_class.bookableEarliest)
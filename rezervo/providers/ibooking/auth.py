@@ -1,18 +1,23 @@
 import asyncio
+import base64
+import hashlib
 import json
 import re
+import secrets
 import time
-from collections.abc import Mapping, Sequence
+from collections.abc import Awaitable, Mapping, Sequence
 from datetime import datetime
+from enum import Enum
+from urllib.parse import parse_qs, quote_plus, urlsplit
 from uuid import UUID
 
 import humanize
 import pytz
+from aiohttp import ClientError
 from apprise import NotifyType
 from playwright.async_api import (
     Cookie,
     Page,
-    async_playwright,
 )
 from playwright.async_api import (
     TimeoutError as PlaywrightTimeoutError,
@@ -32,21 +37,31 @@ from rezervo.providers.ibooking.urls import (
     BOOKING_URL,
     SIT_AUTH_COOKIE_URL,
     SIT_LOGIN_URL,
+    SIT_OIDC_CLIENT_ID,
+    SIT_OIDC_DEFAULT_REDIRECT_URL,
+    SIT_OIDC_POLICY,
+    SIT_OIDC_SCOPE,
+    SIT_OIDC_URL,
     SIT_OIDC_USER_COOKIE_ORIGIN,
+    SIT_ROOT_URL,
     TOKEN_VALIDATION_URL,
 )
 from rezervo.schemas.camel import CamelModel
 from rezervo.schemas.config.user import ChainIdentifier, ChainUser
 from rezervo.utils.apprise_utils import aprs_ctx
+from rezervo.utils.event_utils import KeyedEvents, wait_for_event
 from rezervo.utils.logging_utils import log
 from rezervo.utils.playwright_utils import (
+    BROWSER_FLOW_TIMEOUT_SECONDS,
+    browser_pool,
     playwright_trace_start,
     playwright_trace_stop,
 )
 
-WAIT_FOR_TOTP_MILLISECONDS = 200
+# waiters are woken by in-process notifications, polling only catches updates from other processes
+WAIT_FOR_TOTP_POLL_SECONDS = 5
 WAIT_FOR_TOTP_MAX_SECONDS = 5 * 60
-WAIT_FOR_TOTP_VERIFICATION_MILLISECONDS = 200
+WAIT_FOR_TOTP_VERIFICATION_POLL_SECONDS = 2
 WAIT_FOR_TOTP_VERIFICATION_MAX_SECONDS = 60
 WAIT_FOR_FRESH_COOKIES_MILLISECONDS = 100
 WAIT_FOR_FRESH_COOKIES_MAX_SECONDS = 30
@@ -57,6 +72,21 @@ SIT_ACCESS_TOKEN_LIFETIME_SECONDS = 60 * 60
 SIT_ACCESS_TOKEN_REFRESH_THRESHOLD_SECONDS = 10 * 60
 SIT_REFRESH_TOKEN_LIFETIME_SECONDS = 24 * 60 * 60
 
+# the public token is renewed in the background this long before it expires
+PUBLIC_IBOOKING_TOKEN_RENEWAL_MARGIN_SECONDS = 10 * 60
+# assumed lifetime when the token validation does not reveal it
+PUBLIC_IBOOKING_TOKEN_FALLBACK_LIFETIME_SECONDS = 15 * 60
+PUBLIC_IBOOKING_TOKEN_RENEWAL_RETRY_SECONDS = 60
+
+# keyed by (chain identifier, user id)
+totp_submitted = KeyedEvents()
+totp_flow_finished = KeyedEvents()
+
+# the redirect uri learned from browser sessions is persisted, to be shared with other processes
+SIT_OIDC_REDIRECT_URL_SETTING_CHAIN = "sit"
+SIT_OIDC_REDIRECT_URL_SETTING_KEY = "oidc_redirect_url"
+_sit_oidc_redirect_url: str | None = None
+
 
 class ExpiringToken(BaseModel):
     token: str
@@ -70,12 +100,54 @@ class IBookingAuthData(BaseModel):
     cookies: Sequence[Mapping]
 
 
+class AuthSessionExtensionTier(Enum):
+    # replay stored session cookies over plain HTTP
+    COOKIE_REPLAY = "cookie replay"
+    # let a browser perform the non-interactive login
+    BROWSER = "browser"
+
+
+class AuthSessionExtensionStats(BaseModel):
+    attempts: int = 0
+    successes: int = 0
+    total_seconds: float = 0
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.attempts if self.attempts > 0 else 0.0
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.attempts if self.attempts > 0 else 0.0
+
+
+_auth_session_extension_stats = {
+    tier: AuthSessionExtensionStats() for tier in AuthSessionExtensionTier
+}
+
+
+def auth_session_extension_stats() -> dict[
+    AuthSessionExtensionTier, AuthSessionExtensionStats
+]:
+    return {
+        tier: stats.model_copy()
+        for tier, stats in _auth_session_extension_stats.items()
+    }
+
+
 class SitAuthRefreshResult(CamelModel):
     access_token: str
     refresh_token: str
     refresh_token_expires_in: int
 
 
+_public_ibooking_token: ExpiringToken | None = None
+# whether the current public token has been handed out, unused tokens are not renewed
+_public_ibooking_token_used = False
+_public_ibooking_token_fetch: asyncio.Task | None = None
+_public_ibooking_token_renewal: asyncio.Task | None = None
+
+
 async def fetch_public_ibooking_token() -> str | AuthenticationError:
     async with HttpClient.singleton().get(BOOKING_URL) as booking_res:
         booking_soup = await booking_res.text()
@@ -88,6 +160,98 @@ async def fetch_public_ibooking_token() -> str | AuthenticationError:
         return AuthenticationError.TOKEN_EXTRACTION_FAILED
 
 
+async def get_public_ibooking_token() -> str | AuthenticationError:
+    """
+    Public ibooking token from an in-process cache, renewed in the background before it expires
+    """
+    global _public_ibooking_token_used
+    token = _public_ibooking_token
+    if token is None or token.expires_at <= time.time():
+        token = await _fetch_public_ibooking_token_once()
+        if isinstance(token, AuthenticationError):
+            return token
+    _public_ibooking_token_used = True
+    return token.token
+
+
+def invalidate_public_ibooking_token(token: str) -> None:
+    """
+    Forget the cached public token if it is the given (rejected) token
+    """
+    global _public_ibooking_token
+    if _public_ibooking_token is not None and _public_ibooking_token.token == token:
+        _public_ibooking_token = None
+
+
+async def renew_public_ibooking_token(rejected_token: str) -> str | None:
+    """
+    Forget the rejected public token, and retrieve a fresh one to retry with (if any)
+    """
+    invalidate_public_ibooking_token(rejected_token)
+    token = await get_public_ibooking_token()
+    if isinstance(token, AuthenticationError) or token == rejected_token:
+        return None
+    return token
+
+
+async def _fetch_public_ibooking_token_once() -> ExpiringToken | AuthenticationError:
+    global _public_ibooking_token_fetch
+    # concurrent callers share a single fetch
+    if _public_ibooking_token_fetch is None or _public_ibooking_token_fetch.done():
+        _public_ibooking_token_fetch = asyncio.create_task(
+            _fetch_and_remember_public_ibooking_token()
+        )
+    return await asyncio.shield(_public_ibooking_token_fetch)
+
+
+async def _fetch_and_remember_public_ibooking_token() -> (
+    ExpiringToken | AuthenticationError
+):
+    global _public_ibooking_token, _public_ibooking_token_used
+    token = await fetch_public_ibooking_token()
+    if isinstance(token, AuthenticationError):
+        return token
+    valid, expires_at = await validate_ibooking_token(token)
+    if not valid or expires_at is None:
+        log.warning(
+            "Could not determine lifetime of public ibooking token, assuming "
+            f"{PUBLIC_IBOOKING_TOKEN_FALLBACK_LIFETIME_SECONDS} seconds"
+        )
+        expires_at = int(time.time()) + PUBLIC_IBOOKING_TOKEN_FALLBACK_LIFETIME_SECONDS
+    _public_ibooking_token = ExpiringToken(token=token, expires_at=expires_at)
+    _public_ibooking_token_used = False
+    _schedule_public_ibooking_token_renewal(
+        expires_at - PUBLIC_IBOOKING_TOKEN_RENEWAL_MARGIN_SECONDS
+    )
+    return _public_ibooking_token
+
+
+def _schedule_public_ibooking_token_renewal(renew_at: float) -> None:
+    global _public_ibooking_token_renewal
+    if (
+        _public_ibooking_token_renewal is not None
+        and _public_ibooking_token_renewal is not asyncio.current_task()
+    ):
+        _public_ibooking_token_renewal.cancel()
+    _public_ibooking_token_renewal = asyncio.create_task(
+        _renew_public_ibooking_token(renew_at)
+    )
+
+
+async def _renew_public_ibooking_token(renew_at: float) -> None:
+    await asyncio.sleep(max(0.0, renew_at - time.time()))
+    token = _public_ibooking_token
+    if token is None or not _public_ibooking_token_used:
+        # let unused tokens expire, the next caller fetches a fresh one
+        return
+    renewal = await _fetch_public_ibooking_token_once()
+    if isinstance(renewal, AuthenticationError) and token.expires_at > time.time():
+        log.warning("Failed to renew public ibooking token, retrying")
+        _schedule_public_ibooking_token_renewal(
+            time.time() + PUBLIC_IBOOKING_TOKEN_RENEWAL_RETRY_SECONDS
+        )
+
+
 async def get_ibooking_token_from_access_token(
     access_token: str,
 ) -> ExpiringToken | None:
@@ -116,8 +280,8 @@ async def validate_ibooking_token(ibooking_token: str):
         return False, None
     expires_string = token_info["authTokenExpires"]
     expires_at = int(
-        datetime.strptime(expires_string, "%Y-%m-%d %H:%M:%S")
-        .replace(tzinfo=pytz.timezone("Europe/Oslo"))
+        pytz.timezone("Europe/Oslo")
+        .localize(datetime.strptime(expires_string, "%Y-%m-%d %H:%M:%S"))
         .timestamp()
     )
     return True, expires_at
@@ -128,29 +292,130 @@ class SitAuthRefreshTokens(BaseModel):
     refresh_token: ExpiringToken
 
 
+def sit_refresh_tokens_from_token_response(data: dict) -> SitAuthRefreshTokens:
+    res = SitAuthRefreshResult(**data)
+    current_time = int(time.time())
+    return SitAuthRefreshTokens(
+        access_token=ExpiringToken(
+            token=res.access_token,
+            expires_at=current_time + SIT_ACCESS_TOKEN_LIFETIME_SECONDS,
+        ),
+        refresh_token=ExpiringToken(
+            token=res.refresh_token,
+            expires_at=current_time + res.refresh_token_expires_in,
+        ),
+    )
+
+
 async def get_tokens_from_refresh_token(
     refresh_token: str,
 ) -> SitAuthRefreshTokens | None:
     async with HttpClient.singleton().post(
-        f"{SIT_AUTH_COOKIE_URL}/sitnettprodb2c.onmicrosoft.com/oauth2/v2.0/token?p=b2c_1_si_email"
-        f"&client_id=1fd8cf25-b13b-4bbe-a673-809725291c9c"
+        f"{SIT_OIDC_URL}/token?p={SIT_OIDC_POLICY}"
+        f"&client_id={SIT_OIDC_CLIENT_ID}"
         f"&grant_type=refresh_token"
-        f"&scope=https%3A%2F%2Fsitnettprodb2c.onmicrosoft.com%2F2390d625-e415-4049-a300-3fab18caa9d2%2Fuser_impersonation+offline_access+openid+profile"
+        f"&scope={quote_plus(SIT_OIDC_SCOPE)}"
         f"&refresh_token={refresh_token}"
     ) as res:
         if not res.ok:
             return None
-        data = SitAuthRefreshResult(**await res.json())
-        current_time = int(time.time())
-        return SitAuthRefreshTokens(
-            access_token=ExpiringToken(
-                token=data.access_token,
-                expires_at=current_time + SIT_ACCESS_TOKEN_LIFETIME_SECONDS,
-            ),
-            refresh_token=ExpiringToken(
-                token=data.refresh_token,
-                expires_at=current_time + data.refresh_token_expires_in,
-            ),
+        return sit_refresh_tokens_from_token_response(await res.json())
+
+
+def _sit_session_cookie_header(cookies: Sequence[Mapping]) -> str:
+    return "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)
+
+
+def _merge_sit_session_cookies(
+    cookies: Sequence[Mapping], res_cookies
+) -> list[Mapping]:
+    """
+    Apply cookies set by the identity provider to the stored (Playwright formatted) session cookies
+    """
+    merged = {cookie["name"]: dict(cookie) for cookie in cookies}
+    for name, morsel in res_cookies.items():
+        cookie = merged.setdefault(
+            name,
+            {
+                "name": name,
+                "domain": urlsplit(SIT_AUTH_COOKIE_URL).hostname,
+                "path": morsel["path"] or "/",
+                "expires": -1,
+                "httpOnly": True,
+                "secure": True,
+                "sameSite": "None",
+            },
+        )
+        cookie["value"] = morsel.value
+    return list(merged.values())
+
+
+async def get_tokens_from_session_cookies(
+    cookies: Sequence[Mapping],
+) -> tuple[SitAuthRefreshTokens, list[Mapping]] | None:
+    """
+    Replay the stored session cookies against the authorize endpoint without user interaction (prompt=none),
+    and redeem the resulting authorization code for fresh tokens. No browser required.
+    """
+    redirect_url = sit_oidc_redirect_url()
+    code_verifier = secrets.token_urlsafe(64)
+    code_challenge = (
+        base64.urlsafe_b64encode(hashlib.sha256(code_verifier.encode()).digest())
+        .rstrip(b"=")
+        .decode()
+    )
+    async with HttpClient.singleton().get(
+        f"{SIT_OIDC_URL}/authorize",
+        params={
+            "p": SIT_OIDC_POLICY,
+            "client_id": SIT_OIDC_CLIENT_ID,
+            "response_type": "code",
+            "response_mode": "query",
+            "redirect_uri": redirect_url,
+            "scope": SIT_OIDC_SCOPE,
+            "prompt": "none",
+            "state": secrets.token_urlsafe(16),
+            "code_challenge": code_challenge,
+            "code_challenge_method": "S256",
+        },
+        headers={"Cookie": _sit_session_cookie_header(cookies)},
+        allow_redirects=False,
+    ) as authorize_res:
+        location = authorize_res.headers.get("Location")
+        refreshed_cookies = _merge_sit_session_cookies(cookies, authorize_res.cookies)
+    if location is None:
+        log.debug(
+            f"Session cookie replay got no redirect (status {authorize_res.status})"
+        )
+        return None
+    query = parse_qs(urlsplit(location).query)
+    if "code" not in query:
+        log.debug(
+            f"Session cookie replay was rejected: {query.get('error', ['unknown'])[0]}"
+        )
+        return None
+    async with HttpClient.singleton().post(
+        f"{SIT_OIDC_URL}/token",
+        params={"p": SIT_OIDC_POLICY},
+        data={
+            "client_id": SIT_OIDC_CLIENT_ID,
+            "grant_type": "authorization_code",
+            "code": query["code"][0],
+            "code_verifier": code_verifier,
+            "redirect_uri": redirect_url,
+            "scope": SIT_OIDC_SCOPE,
+        },
+        # the web app is registered as a single-page application, which requires cross-origin token redemption
+        headers={"Origin": SIT_ROOT_URL},
+    ) as token_res:
+        if not token_res.ok:
+            log.debug(
+                f"Session cookie replay code redemption failed (status {token_res.status})"
+            )
+            return None
+        return (
+            sit_refresh_tokens_from_token_response(await token_res.json()),
+            refreshed_cookies,
         )
 
 
@@ -260,6 +525,40 @@ async def inject_cookies_from_url(page: Page, url, cookies: Sequence[Mapping]):
     await page.context.add_cookies(cookies)  # type: ignore
 
 
+def sit_oidc_redirect_url() -> str:
+    global _sit_oidc_redirect_url
+    if _sit_oidc_redirect_url is None:
+        with SessionLocal() as db:
+            _sit_oidc_redirect_url = crud.get_provider_setting(
+                db,
+                SIT_OIDC_REDIRECT_URL_SETTING_CHAIN,
+                SIT_OIDC_REDIRECT_URL_SETTING_KEY,
+            )
+    # the guessed default is not remembered, so a redirect uri learned by another process is picked up later
+    return _sit_oidc_redirect_url or SIT_OIDC_DEFAULT_REDIRECT_URL
+
+
+def _learn_sit_oidc_redirect_url(request) -> None:
+    global _sit_oidc_redirect_url
+    url = urlsplit(request.url)
+    if not request.url.startswith(SIT_AUTH_COOKIE_URL) or not url.path.endswith(
+        "/authorize"
+    ):
+        return
+    redirect_urls = parse_qs(url.query).get("redirect_uri")
+    if not redirect_urls or redirect_urls[0] == _sit_oidc_redirect_url:
+        return
+    _sit_oidc_redirect_url = redirect_urls[0]
+    log.info(f"Learned Sit OIDC redirect uri '{_sit_oidc_redirect_url}'")
+    with SessionLocal() as db:
+        crud.upsert_provider_setting(
+            db,
+            SIT_OIDC_REDIRECT_URL_SETTING_CHAIN,
+            SIT_OIDC_REDIRECT_URL_SETTING_KEY,
+            _sit_oidc_redirect_url,
+        )
+
+
 async def authenticate_with_session_cookies(
     page: Page, cookies: Sequence[Mapping]
 ) -> SitAuthRefreshTokens | None:
@@ -267,6 +566,7 @@ async def authenticate_with_session_cookies(
     initiate a non-interactive login
     """
     await inject_cookies_from_url(page, SIT_AUTH_COOKIE_URL, cookies)
+    page.on("request", _learn_sit_oidc_redirect_url)
     await page.goto(SIT_LOGIN_URL)
     await page.get_by_text("Logg inn med e-post").click(timeout=10000)
     wait_start = asyncio.get_event_loop().time()
@@ -290,22 +590,22 @@ async def authenticate_with_session_cookies(
 
 
 async def verify_sit_credentials(username: str, password: str):
-    async with async_playwright() as p:
-        browser = await p.firefox.launch()
-        context = await browser.new_context()
-        await playwright_trace_start(context)
-        try:
-            page = await context.new_page()
-            await init_login_with_credentials(page, username, password)
-            valid = await page.locator("button[id='sendCode']").is_enabled(
-                timeout=10000
-            )
-        except PlaywrightTimeoutError:
-            valid = False
-        await playwright_trace_stop(context, "verify_sit_creds")
-        await context.close()
-        await browser.close()
-        return valid
+    try:
+        async with browser_pool.new_context() as context:
+            await playwright_trace_start(context)
+            try:
+                page = await context.new_page()
+                await init_login_with_credentials(page, username, password)
+                valid = await page.locator("button[id='sendCode']").is_enabled(
+                    timeout=10000
+                )
+            except PlaywrightTimeoutError:
+                valid = False
+            await playwright_trace_stop(context, "verify_sit_creds")
+            return valid
+    except PlaywrightTimeoutError:
+        # the flow was aborted by the browser pool
+        return False
 
 
 async def init_login_with_credentials(page: Page, username: str, password: str):
@@ -322,9 +622,11 @@ async def login_with_totp(chain_user: ChainUser) -> IBookingAuthData | None:
             f"Invalid '{chain_user.chain}' user credentials for '{chain_user.username}', password not found"
         )
         return None
-    async with async_playwright() as p:
-        browser = await p.firefox.launch()
-        context = await browser.new_context()
+    # the flow waits for the user to provide the TOTP code
+    async with browser_pool.new_context(
+        timeout_seconds=WAIT_FOR_TOTP_MAX_SECONDS + BROWSER_FLOW_TIMEOUT_SECONDS,
+        interactive=True,
+    ) as context:
         await playwright_trace_start(context)
         try:
             page = await context.new_page()
@@ -333,31 +635,35 @@ async def login_with_totp(chain_user: ChainUser) -> IBookingAuthData | None:
             )
             await page.locator("button[id='sendCode']").click(timeout=30000)
             totp_wait_start = asyncio.get_event_loop().time()
-            with SessionLocal() as db:
-                while (
-                    asyncio.get_event_loop().time() - totp_wait_start
-                ) < WAIT_FOR_TOTP_MAX_SECONDS:
+            with (
+                totp_submitted.listen(
+                    (chain_user.chain, chain_user.user_id)
+                ) as submitted,
+                SessionLocal() as db,
+            ):
+                while True:
                     totp = crud.get_chain_user_totp(
                         db, chain_user.chain, chain_user.user_id
                     )
-                    if totp is not None:
+                    remaining = WAIT_FOR_TOTP_MAX_SECONDS - (
+                        asyncio.get_event_loop().time() - totp_wait_start
+                    )
+                    if totp is not None or remaining <= 0:
                         break
-                    await page.wait_for_timeout(WAIT_FOR_TOTP_MILLISECONDS)
+                    await wait_for_event(
+                        submitted, min(WAIT_FOR_TOTP_POLL_SECONDS, remaining)
+                    )
             if totp is None:
                 log.error(
                     f"TOTP not provided for '{chain_user.chain}' user '{chain_user.username}' (waited {WAIT_FOR_TOTP_MAX_SECONDS} seconds)"
                 )
                 await playwright_trace_stop(context, "login_totp_not_provided")
-                await context.close()
-                await browser.close()
                 return None
             if len(totp) != 6 or not totp.isdigit():
                 log.error(
                     f"Invalid TOTP code from '{chain_user.chain}' user '{chain_user.username}'"
                 )
                 await playwright_trace_stop(context, "login_totp_invalid")
-                await context.close()
-                await browser.close()
                 return None
             await page.locator("#verificationCode").fill(totp, timeout=10000)
             await page.locator("button[id='verifyCode']").click(timeout=10000)
@@ -368,12 +674,9 @@ async def login_with_totp(chain_user: ChainUser) -> IBookingAuthData | None:
                 f"Timeout during TOTP login for '{chain_user.chain}' user '{chain_user.username}'"
             )
             await playwright_trace_stop(context, "login_totp_timeout")
-            await context.close()
-            await browser.close()
             return None
         await playwright_trace_stop(context, "login_totp")
-        await context.close()
-        verification_context = await browser.new_context()
+    async with browser_pool.new_context() as verification_context:
         await playwright_trace_start(verification_context)
         try:
             verification_page = await verification_context.new_page()
@@ -387,17 +690,13 @@ async def login_with_totp(chain_user: ChainUser) -> IBookingAuthData | None:
             await playwright_trace_stop(
                 verification_context, "login_totp_verification_timeout"
             )
-            await verification_context.close()
-            await browser.close()
             return None
         await playwright_trace_stop(verification_context, "login_totp_verification")
-        await verification_context.close()
-        await browser.close()
-        if verification_res is None:
-            log.error(
-                f"TOTP flow verification failed for '{chain_user.chain}' user '{chain_user.username}'"
-            )
-            return None
+    if verification_res is None:
+        log.error(
+            f"TOTP flow verification failed for '{chain_user.chain}' user '{chain_user.username}'"
+        )
+        return None
     ibooking_token = await get_ibooking_token_from_access_token(
         verification_res.access_token.token
     )
@@ -427,7 +726,20 @@ async def initiate_auth_session_interactively(
             log.error(f"'{chain_identifier}' user not found for id '{user_id}'")
             return
         crud.delete_chain_user_totp(db, chain_user.chain, chain_user.user_id)
-    auth_data = await login_with_totp(chain_user)
+    try:
+        await _complete_auth_session_interactively(chain_user)
+    finally:
+        totp_flow_finished.notify((chain_user.chain, chain_user.user_id))
+
+
+async def _complete_auth_session_interactively(chain_user: ChainUser):
+    try:
+        auth_data = await login_with_totp(chain_user)
+    except PlaywrightTimeoutError:
+        log.error(
+            f"TOTP flow aborted for '{chain_user.chain}' user '{chain_user.username}'"
+        )
+        auth_data = None
     with SessionLocal() as db:
         crud.delete_chain_user_totp(db, chain_user.chain, chain_user.user_id)
         if auth_data is None:
@@ -461,6 +773,7 @@ async def extend_auth_session_silently(
     """
     Performs a cookie-based authentication to extend the auth cookie and retrieve fresh access and refresh tokens.
     No user interaction required, unless the session cookies are missing or expired.
+    The cookies are first replayed over plain HTTP, only falling back to a browser if that fails.
     """
     with SessionLocal() as db:
         chain_user = crud.get_chain_user(db, chain_identifier, user_id)
@@ -483,9 +796,101 @@ async def extend_auth_session_silently(
             f"Invalid auth data for '{chain_user.chain}' user '{chain_user.username}'"
         )
         return None
-    async with async_playwright() as p:
-        browser = await p.firefox.launch()
-        context = await browser.new_context()
+    auth_data = await _timed_auth_session_extension(
+        AuthSessionExtensionTier.COOKIE_REPLAY,
+        _extend_auth_session_with_cookie_replay(chain_user, cookies),
+    )
+    if auth_data is None:
+        auth_data = await _timed_auth_session_extension(
+            AuthSessionExtensionTier.BROWSER,
+            _extend_auth_session_with_browser(chain_user, cookies),
+        )
+    if auth_data is None:
+        return None
+    with SessionLocal() as db:
+        db_chain_user = crud.get_db_chain_user(db, chain_identifier, user_id)
+        if db_chain_user is None:
+            log.error(
+                f"Chain user not found for '{chain_user.chain}' user '{chain_user.username}'"
+            )
+            with aprs_ctx() as error_ctx:
+                aprs.notify(
+                    notify_type=NotifyType.FAILURE,
+                    title="Auth session extension failed",
+                    body=f"Refresh token extension failed for '{chain_user.chain}' user '{chain_user.username}'",
+                    attach=[error_ctx],
+                )
+            return None
+        db_chain_user.auth_data = auth_data.model_dump_json()
+        db.commit()
+    log.info(
+        f":heavy_check_mark: Auth session extended for '{chain_user.chain}' user '{chain_user.username}' \n"
+        f"  (refresh token expires in {humanize.naturaldelta(auth_data.refresh_token.expires_at - int(time.time()))})"
+    )
+    return auth_data
+
+
+async def _timed_auth_session_extension(
+    tier: AuthSessionExtensionTier,
+    extension: Awaitable[IBookingAuthData | None],
+) -> IBookingAuthData | None:
+    start = time.perf_counter()
+    try:
+        auth_data = await extension
+    except PlaywrightTimeoutError:
+        log.error(f"Auth session extension with {tier.value} was aborted")
+        auth_data = None
+    elapsed = time.perf_counter() - start
+    stats = _auth_session_extension_stats[tier]
+    stats.attempts += 1
+    stats.total_seconds += elapsed
+    if auth_data is not None:
+        stats.successes += 1
+    log.info(
+        f"Auth session extension with {tier.value} {'succeeded' if auth_data is not None else 'failed'} "
+        f"in {elapsed:.2f}s ({stats.successes}/{stats.attempts} succeeded in this process, "
+        f"{stats.mean_seconds:.2f}s on average)"
+    )
+    return auth_data
+
+
+async def _extend_auth_session_with_cookie_replay(
+    chain_user: ChainUser, cookies: Sequence[Mapping]
+) -> IBookingAuthData | None:
+    try:
+        replay_res = await get_tokens_from_session_cookies(cookies)
+    except (ClientError, TimeoutError) as e:
+        log.debug(f"Session cookie replay failed: {e}")
+        return None
+    if replay_res is None:
+        return None
+    refresh_res, refreshed_cookies = replay_res
+    ibooking_token = await get_ibooking_token_from_access_token(
+        refresh_res.access_token.token
+    )
+    if ibooking_token is None:
+        log.debug(
+            f"Ibooking token extraction after session cookie replay failed for '{chain_user.chain}' user '{chain_user.username}'"
+        )
+        return None
+    ibooking_valid, _ = await validate_ibooking_token(ibooking_token.token)
+    if not ibooking_valid:
+        log.debug(
+            f"Ibooking token from session cookie replay is invalid for '{chain_user.chain}' user '{chain_user.username}'"
+        )
+        return None
+    return IBookingAuthData(
+        access_token=refresh_res.access_token,
+        ibooking_token=ibooking_token,
+        refresh_token=refresh_res.refresh_token,
+        cookies=refreshed_cookies,
+    )
+
+
+async def _extend_auth_session_with_browser(
+    chain_user: ChainUser, cookies: Sequence[Mapping]
+) -> IBookingAuthData | None:
+    async with browser_pool.new_context() as context:
         await playwright_trace_start(context)
         try:
             page = await context.new_page()
@@ -496,8 +901,6 @@ async def extend_auth_session_silently(
                     f"Refresh token extension failed for '{chain_user.chain}' user '{chain_user.username}'"
                 )
                 await playwright_trace_stop(context, "extend_auth_session_failed")
-                await context.close()
-                await browser.close()
                 with aprs_ctx() as error_ctx:
                     aprs.notify(
                         notify_type=NotifyType.FAILURE,
@@ -514,8 +917,6 @@ async def extend_auth_session_silently(
                     f"Ibooking token extraction failed for '{chain_user.chain}' user '{chain_user.username}'"
                 )
                 await playwright_trace_stop(context, "extend_auth_session_failed")
-                await context.close()
-                await browser.close()
                 with aprs_ctx() as error_ctx:
                     aprs.notify(
                         notify_type=NotifyType.FAILURE,
@@ -530,8 +931,6 @@ async def extend_auth_session_silently(
                     f"Ibooking token is invalid for '{chain_user.chain}' user '{chain_user.username}'"
                 )
                 await playwright_trace_stop(context, "extend_auth_session_failed")
-                await context.close()
-                await browser.close()
                 with aprs_ctx() as error_ctx:
                     aprs.notify(
                         notify_type=NotifyType.FAILURE,
@@ -546,36 +945,11 @@ async def extend_auth_session_silently(
                 f"Timeout during silent auth session extension for '{chain_user.chain}' user '{chain_user.username}'"
             )
             await playwright_trace_stop(context, "extend_auth_session_timeout")
-            await context.close()
-            await browser.close()
             return None
         await playwright_trace_stop(context, "extend_auth_session")
-        await context.close()
-        await browser.close()
-    with SessionLocal() as db:
-        db_chain_user = crud.get_db_chain_user(db, chain_identifier, user_id)
-        if db_chain_user is None:
-            log.error(
-                f"Chain user not found for '{chain_user.chain}' user '{chain_user.username}'"
-            )
-            with aprs_ctx() as error_ctx:
-                aprs.notify(
-                    notify_type=NotifyType.FAILURE,
-                    title="Auth session extension failed",
-                    body=f"Refresh token extension failed for '{chain_user.chain}' user '{chain_user.username}'",
-                    attach=[error_ctx],
-                )
-            return None
-        auth_data = IBookingAuthData(
-            access_token=refresh_res.access_token,
-            ibooking_token=ibooking_token,
-            refresh_token=refresh_res.refresh_token,
-            cookies=cookies,
-        )
-        db_chain_user.auth_data = auth_data.model_dump_json()
-        db.commit()
-    log.info(
-        f":heavy_check_mark: Auth session extended for '{chain_user.chain}' user '{chain_user.username}' \n"
-        f"  (refresh token expires in {humanize.naturaldelta(refresh_res.refresh_token.expires_at - int(time.time()))})"
+    return IBookingAuthData(
+        access_token=refresh_res.access_token,
+        ibooking_token=ibooking_token,
+        refresh_token=refresh_res.refresh_token,
+        cookies=cookies,
     )
-    return auth_data
@@ -1,4 +1,4 @@
-from rezervo.errors import BookingError
+from rezervo.errors import BookingAttemptFailure
 from rezervo.http_client import HttpClient
 from rezervo.models import SessionState
 from rezervo.providers.ibooking.schema import (
@@ -9,26 +9,53 @@ from rezervo.providers.ibooking.urls import (
     ADD_BOOKING_URL,
     CANCEL_BOOKING_URL,
 )
+from rezervo.providers.retry import (
+    BookingFailureMarkers,
+    RetryPolicy,
+    classify_booking_failure_message,
+    classify_booking_response_status,
+)
 from rezervo.schemas.schedule import BookingResult
 from rezervo.utils.logging_utils import log
 
+IBOOKING_BOOKING_FAILURE_MARKERS = BookingFailureMarkers(
+    not_open=("ikke åpnet", "ikke åpen", "åpner", "for tidlig"),
+    terminal=("allerede", "er full", "fullt", "ingen ledige", "avlyst"),
+)
+
+# a single, fairly slow server answers every ibooking request, and classes open on the minute,
+# so poll less eagerly (a poll rarely returns within the default interval anyway) for a shorter window
+IBOOKING_RETRY_POLICY = RetryPolicy(
+    opening_poll_interval_seconds=0.25,
+    opening_poll_window_seconds=5,
+    backoff_max_seconds=15,
+)
+
 
 async def book_ibooking_class(
     domain: IBookingDomain, token: str, class_id: int
-) -> BookingResult | BookingError:
+) -> BookingResult | BookingAttemptFailure:
     # TODO: handle different domains
     log.debug(f"Booking class {class_id}")
     async with HttpClient.singleton().post(
         ADD_BOOKING_URL, data={"classId": class_id, "token": token}
     ) as response:
         if not response.ok:
-            log.error("Booking attempt failed: " + (await response.text()))
-            # TODO: distinguish between "retryable" and "non-retryable" errors
-            #       (e.g. should not retry if already booked)
-            return BookingError.ERROR
+            body = await response.text()
+            log.error("Booking attempt failed: " + body)
+            return classify_booking_response_status(
+                response.status, body, IBOOKING_BOOKING_FAILURE_MARKERS
+            )
         booking_response = IBookingBookingResponse(**await response.json())
         if not booking_response.success:
-            return BookingError.ERROR
+            log.error(f"Booking attempt failed: {booking_response.error_message}")
+            return (
+                classify_booking_failure_message(
+                    booking_response.error_message or "",
+                    IBOOKING_BOOKING_FAILURE_MARKERS,
+                )
+                or BookingAttemptFailure.TRANSIENT
+            )
 
         return BookingResult(
             status=(
@@ -44,19 +71,30 @@ async def book_ibooking_class(
         )
 
 
-async def cancel_booking(domain: IBookingDomain, token, class_id: int) -> bool:
+async def cancel_booking(
+    domain: IBookingDomain, token, class_id: int
+) -> bool | BookingAttemptFailure:
     # TODO: handle different domains
     log.debug(f"Cancelling booking of class {class_id}")
     async with HttpClient.singleton().post(
         CANCEL_BOOKING_URL, data={"classId": class_id, "token": token}
     ) as res:
         if not res.ok:
-            log.error("Booking cancellation attempt failed: " + (await res.text()))
-            return False
+            res_body = await res.text()
+            log.error("Booking cancellation attempt failed: " + res_body)
+            return classify_booking_response_status(
+                res.status, res_body, IBOOKING_BOOKING_FAILURE_MARKERS
+            )
         body = await res.json()
     if body["success"] is False:
-        log.error("Booking cancellation attempt failed: " + body.errorMessage)
-        return False
+        error_message = body.get("errorMessage") or ""
+        log.error("Booking cancellation attempt failed: " + error_message)
+        return (
+            classify_booking_failure_message(
+                error_message, IBOOKING_BOOKING_FAILURE_MARKERS
+            )
+            or False
+        )
     if (
         "class" not in body
         or "userStatus" not in body["class"]
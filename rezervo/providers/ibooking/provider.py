@@ -1,21 +1,26 @@
 import asyncio
 import math
 from abc import abstractmethod
+from collections.abc import Callable
 from datetime import datetime, timedelta
+from typing import Any
 from uuid import UUID
 
-from rezervo.errors import AuthenticationError, BookingError
+from rezervo.errors import AuthenticationError, BookingAttemptFailure, BookingError
 from rezervo.http_client import HttpClient, create_client_session
 from rezervo.models import SessionState
 from rezervo.providers.ibooking.auth import (
     IBookingAuthData,
     extend_auth_session_silently,
-    fetch_public_ibooking_token,
+    get_public_ibooking_token,
     initiate_auth_session_interactively,
+    invalidate_public_ibooking_token,
     refresh_chain_user_auth_data,
+    renew_public_ibooking_token,
     verify_sit_credentials,
 )
 from rezervo.providers.ibooking.booking import (
+    IBOOKING_RETRY_POLICY,
     book_ibooking_class,
     cancel_booking,
 )
@@ -30,12 +35,14 @@ from rezervo.providers.ibooking.schema import (
     tz_aware_iso_from_ibooking_date_str,
 )
 from rezervo.providers.ibooking.urls import (
+    BOOKING_URL,
     CLASS_URL,
     CLASSES_SCHEDULE_DAYS_IN_SINGLE_BATCH,
     CLASSES_SCHEDULE_URL,
     MY_SESSIONS_URL,
 )
 from rezervo.providers.provider import Provider
+from rezervo.providers.retry import RetryPolicy
 from rezervo.providers.schedule import find_class_in_schedule_by_config
 from rezervo.providers.schema import LocationIdentifier
 from rezervo.schemas.config.user import (
@@ -60,6 +67,30 @@ from rezervo.utils.logging_utils import log
 from rezervo.utils.str_utils import standardize_activity_name
 
 
+async def get_json(url: str) -> tuple[int, Any | None]:
+    async with HttpClient.singleton().get(url) as res:
+        return res.status, (await res.json() if res.ok else None)
+
+
+async def get_json_with_public_ibooking_token(
+    token: str, build_url: Callable[[str], str]
+) -> tuple[int, Any | None]:
+    """
+    Fetch the response status and JSON body of the url built with the given public token.
+    A rejected token is renewed, and the request retried once.
+    """
+    status, body = await get_json(build_url(token))
+    if status not in (401, 403):
+        return status, body
+    renewed_token = await renew_public_ibooking_token(token)
+    if renewed_token is None:
+        return status, body
+    status, body = await get_json(build_url(renewed_token))
+    if status in (401, 403):
+        invalidate_public_ibooking_token(renewed_token)
+    return status, body
+
+
 class IBookingProvider(Provider[IBookingAuthData, IBookingLocationIdentifier]):
     @property
     def totp_enabled(self) -> bool:
@@ -74,6 +105,14 @@ class IBookingProvider(Provider[IBookingAuthData, IBookingLocationIdentifier]):
     def ibooking_domain(self) -> IBookingDomain:
         raise NotImplementedError()
 
+    @property
+    def clock_reference_url(self) -> str | None:
+        return BOOKING_URL
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        return IBOOKING_RETRY_POLICY
+
     async def _authenticate(
         self, chain_user: ChainUser
     ) -> IBookingAuthData | AuthenticationError:
@@ -82,22 +121,28 @@ class IBookingProvider(Provider[IBookingAuthData, IBookingLocationIdentifier]):
     async def extend_auth_session(self, chain_user: ChainUser) -> None:
         await extend_auth_session_silently(chain_user.chain, chain_user.user_id)
 
+    def auth_data_expires_at(self, auth_data: IBookingAuthData) -> datetime | None:
+        return datetime.fromtimestamp(
+            min(auth_data.access_token.expires_at, auth_data.ibooking_token.expires_at)
+        ).astimezone()
+
     async def find_class_by_id(
         self, class_id: str
     ) -> RezervoClass | BookingError | AuthenticationError:
-        ibooking_token = await fetch_public_ibooking_token()
+        ibooking_token = await get_public_ibooking_token()
         if isinstance(ibooking_token, AuthenticationError):
             log.error("Failed to retrieve public ibooking token")
             return ibooking_token
         log.debug(f"Searching for class by id: {class_id}")
         # TODO: handle different domains
-        async with HttpClient.singleton().get(
-            f"{CLASS_URL}?token={ibooking_token}&id={class_id}&lang=no"
-        ) as class_response:
-            if not class_response.ok:
-                log.error("Class get request failed")
-                return BookingError.ERROR
-            ibooking_class = IBookingClass(**(await class_response.json())["class"])
+        status, class_res = await get_json_with_public_ibooking_token(
+            ibooking_token,
+            lambda token: f"{CLASS_URL}?token={token}&id={class_id}&lang=no",
+        )
+        if class_res is None:
+            log.error(f"Class get request failed (status {status})")
+            return BookingError.ERROR
+        ibooking_class = IBookingClass(**class_res["class"])
         if ibooking_class is None:
             return BookingError.CLASS_MISSING
         return self.rezervo_class_from_ibooking_class(ibooking_class)
@@ -114,7 +159,7 @@ class IBookingProvider(Provider[IBookingAuthData, IBookingLocationIdentifier]):
         self,
         auth_data: IBookingAuthData,
         class_id: str,
-    ) -> BookingResult | BookingError:
+    ) -> BookingResult | BookingError | BookingAttemptFailure:
         try:
             ibooking_class_id = int(class_id)
         except ValueError:
@@ -128,7 +173,7 @@ class IBookingProvider(Provider[IBookingAuthData, IBookingLocationIdentifier]):
         self,
         auth_data: IBookingAuthData,
         _class: RezervoClass,
-    ) -> bool:
+    ) -> bool | BookingAttemptFailure:
         try:
             ibooking_class_id = int(_class.id)
         except ValueError:
@@ -183,15 +228,19 @@ class IBookingProvider(Provider[IBookingAuthData, IBookingLocationIdentifier]):
                 past_and_booked_sessions.append(session)
         return past_and_booked_sessions
 
-    async def fetch_schedule(
+    async def _fetch_schedule(
         self,
         from_date: datetime,
         days: int,
         locations: list[LocationIdentifier],
     ) -> RezervoSchedule:
+        ibooking_token = await get_public_ibooking_token()
+        if isinstance(ibooking_token, AuthenticationError):
+            log.error("Failed to retrieve public ibooking token")
+            return RezervoSchedule(days=[])
         return await self.fetch_ibooking_schedule(
             self.ibooking_domain,
-            await fetch_public_ibooking_token(),
+            ibooking_token,
             days,
             studios=(
                 [
@@ -255,16 +304,18 @@ class IBookingProvider(Provider[IBookingAuthData, IBookingLocationIdentifier]):
         # TODO: support different domains (not just sit.no)
         if domain != "sit":
             raise NotImplementedError()
-        async with HttpClient.singleton().get(
-            f"{CLASSES_SCHEDULE_URL}"
-            f"?token={token}"
-            f"{f'&from={from_iso}' if from_iso is not None else ''}"
-            f"{('&studios=' + ','.join([str(s) for s in studios])) if studios else ''}"
-            f"&lang=no"
-        ) as res:
-            if not res.ok:
-                return None
-            json_res = await res.json()
+        _, json_res = await get_json_with_public_ibooking_token(
+            token,
+            lambda t: (
+                f"{CLASSES_SCHEDULE_URL}"
+                f"?token={t}"
+                f"{f'&from={from_iso}' if from_iso is not None else ''}"
+                f"{('&studios=' + ','.join([str(s) for s in studios])) if studios else ''}"
+                f"&lang=no"
+            ),
+        )
+        if json_res is None:
+            return None
         return RezervoSchedule(
             days=[
                 RezervoDay(
@@ -313,7 +364,7 @@ class IBookingProvider(Provider[IBookingAuthData, IBookingLocationIdentifier]):
         domain: IBookingDomain,
         _class_config: Class,
     ) -> RezervoClass | BookingError | AuthenticationError:
-        ibooking_token = await fetch_public_ibooking_token()
+        ibooking_token = await get_public_ibooking_token()
         if isinstance(ibooking_token, AuthenticationError):
             log.error("Failed to retrieve public ibooking token")
             return ibooking_token
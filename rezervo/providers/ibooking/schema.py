@@ -74,6 +74,7 @@ class IBookingBookingResponse(CamelModel):
     success: bool
     waitlist: bool
     waitlist_position: int
+    error_message: str | None = None
 
 
 def ibooking_class_from_sit_session_class(
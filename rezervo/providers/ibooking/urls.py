@@ -13,5 +13,11 @@ SIT_ROOT_URL = "https://www.sit.no"
 SIT_LOGIN_URL = f"{SIT_ROOT_URL}/profile"
 SIT_OIDC_USER_COOKIE_ORIGIN = SIT_ROOT_URL
 SIT_AUTH_COOKIE_URL = "https://sitnettprodb2c.b2clogin.com"
+SIT_OIDC_URL = f"{SIT_AUTH_COOKIE_URL}/sitnettprodb2c.onmicrosoft.com/oauth2/v2.0"
+SIT_OIDC_POLICY = "b2c_1_si_email"
+SIT_OIDC_CLIENT_ID = "1fd8cf25-b13b-4bbe-a673-809725291c9c"
+SIT_OIDC_SCOPE = "https://sitnettprodb2c.onmicrosoft.com/2390d625-e415-4049-a300-3fab18caa9d2/user_impersonation offline_access openid profile"
+# fallback until the redirect uri actually used by the Sit web app is learned from a browser session
+SIT_OIDC_DEFAULT_REDIRECT_URL = SIT_LOGIN_URL
 
 # TODO: generalize (using https://espern.no as an example of another domain)
@@ -1,10 +1,14 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
+from functools import cached_property
+
+import jwt
 
 from rezervo import models
 from rezervo.consts import WEEKDAYS
-from rezervo.errors import AuthenticationError, BookingError
+from rezervo.errors import AuthenticationError, BookingAttemptFailure, BookingError
 from rezervo.http_client import HttpClient
+from rezervo.providers.auth_cache import AuthDataCache
 from rezervo.providers.mirage.schema_generated import (
     BookingResult as MirageBookingResult,
 )
@@ -17,6 +21,7 @@ from rezervo.providers.mirage.schema_generated import (
     Session as MirageSession,
 )
 from rezervo.providers.provider import Provider
+from rezervo.providers.retry import RetryPolicy, classify_booking_response_status
 from rezervo.providers.schedule import find_class_in_schedule_by_config
 from rezervo.providers.schema import LocationIdentifier
 from rezervo.schemas.config.config import read_app_config
@@ -45,6 +50,9 @@ type MirageLocationIdentifier = str
 
 FIND_CLASS_SEARCH_DAYS = 8
 
+# mirage is a mock provider used while developing, where failures should surface quickly
+MIRAGE_RETRY_POLICY = RetryPolicy(backoff_max_seconds=4, deadline_seconds=20)
+
 
 class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
     @property
@@ -52,6 +60,14 @@ class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
     def mirage_chain_identifier(self) -> str:
         raise NotImplementedError()
 
+    @property
+    def clock_reference_url(self) -> str | None:
+        return self._chain_url()
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        return MIRAGE_RETRY_POLICY
+
     def _chain_url(self, *segments: str) -> str:
         base = read_app_config().mirage.base_url.rstrip("/")
         return "/".join(
@@ -78,7 +94,15 @@ class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
                 return AuthenticationError.ERROR
             return LoginResponse(**await res.json()).accessToken
 
-    async def _authenticate(
+    @cached_property
+    def _auth_cache(self) -> AuthDataCache[MirageAuthData]:
+        return AuthDataCache(
+            serialize=str,
+            deserialize=str,
+            expires_at=self.auth_data_expires_at,
+        )
+
+    async def _login_chain_user(
         self, chain_user: ChainUser
     ) -> MirageAuthData | AuthenticationError:
         auth_data = await self._login(chain_user.username, chain_user.password)
@@ -88,6 +112,24 @@ class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
             )
         return auth_data
 
+    async def _authenticate(
+        self, chain_user: ChainUser
+    ) -> MirageAuthData | AuthenticationError:
+        return await self._auth_cache.get(chain_user, self._login_chain_user)
+
+    def auth_data_expires_at(self, auth_data: MirageAuthData) -> datetime | None:
+        # access tokens are JWTs, and we only need to peek at their expiry
+        try:
+            exp = jwt.decode(auth_data, options={"verify_signature": False}).get("exp")
+        except jwt.InvalidTokenError:
+            return None
+        if exp is None:
+            return None
+        return datetime.fromtimestamp(exp).astimezone()
+
+    def invalidate_auth_data(self, chain_user: ChainUser) -> None:
+        self._auth_cache.invalidate(chain_user)
+
     async def verify_authentication(self, credentials: ChainUserCredentials) -> bool:
         return not isinstance(
             await self._login(credentials.username, credentials.password),
@@ -126,7 +168,7 @@ class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
             booking_opens_at=m.bookingOpensAt,
         )
 
-    async def fetch_schedule(
+    async def _fetch_schedule(
         self,
         from_date: datetime,
         days: int,
@@ -187,7 +229,7 @@ class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
         self,
         auth_data: MirageAuthData,
         class_id: str,
-    ) -> BookingResult | BookingError:
+    ) -> BookingResult | BookingError | BookingAttemptFailure | AuthenticationError:
         async with HttpClient.singleton().post(
             self._chain_url("bookings"),
             json={"classId": class_id},
@@ -195,7 +237,10 @@ class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
         ) as res:
             if not res.ok:
                 log.error(f"Mirage booking failed ({res.status}): {await res.text()}")
-                return BookingError.ERROR
+                if res.status == 401:
+                    self._auth_cache.invalidate_auth_data(auth_data)
+                    return AuthenticationError.TOKEN_INVALID
+                return classify_booking_response_status(res.status)
             result = MirageBookingResult(**await res.json())
         return BookingResult(
             status=models.SessionState(result.status.value),
@@ -206,7 +251,7 @@ class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
         self,
         auth_data: MirageAuthData,
         _class: RezervoClass,
-    ) -> bool:
+    ) -> bool | BookingAttemptFailure | AuthenticationError:
         async with HttpClient.singleton().delete(
             self._chain_url("bookings", _class.id),
             headers=self._auth_headers(auth_data),
@@ -215,7 +260,11 @@ class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
                 log.error(
                     f"Mirage cancellation failed for class '{_class.id}' ({res.status})"
                 )
-            return res.ok
+                if res.status == 401:
+                    self._auth_cache.invalidate_auth_data(auth_data)
+                    return AuthenticationError.TOKEN_INVALID
+                return classify_booking_response_status(res.status)
+            return True
 
     async def _fetch_past_and_booked_sessions(
         self,
@@ -233,6 +282,8 @@ class MirageProvider(Provider[MirageAuthData, MirageLocationIdentifier], ABC):
                 log.error(
                     f"Failed to retrieve mirage sessions for '{chain_user.username}' ({res.status})"
                 )
+                if res.status == 401:
+                    self.invalidate_auth_data(chain_user)
                 return None
             sessions = [MirageSession(**s) for s in await res.json()]
         return [
@@ -1,18 +1,16 @@
 import asyncio
+import random
 import re
-import time
 from abc import ABC, abstractmethod
 from datetime import datetime
+from functools import cached_property
 from uuid import UUID
 
 import pytz
 from apprise import NotifyType
 
-from rezervo.consts import (
-    BOOKING_INITIAL_BURST_ATTEMPTS,
-    PLANNED_SESSIONS_NEXT_WHOLE_WEEKS,
-)
-from rezervo.errors import AuthenticationError, BookingError
+from rezervo.consts import PLANNED_SESSIONS_NEXT_WHOLE_WEEKS
+from rezervo.errors import AuthenticationError, BookingAttemptFailure, BookingError
 from rezervo.models import SessionState
 from rezervo.notify.apprise import aprs
 from rezervo.notify.notify import (
@@ -20,6 +18,9 @@ from rezervo.notify.notify import (
     notify_class_friends_of_booking,
     notify_class_friends_of_cancellation,
 )
+from rezervo.providers.retry import RetryPolicy, classify_booking_attempt
+from rezervo.providers.schedule import ScheduleIndex
+from rezervo.providers.schedule_cache import ScheduleCache
 from rezervo.providers.schema import (
     Branch,
     LocationIdentifier,
@@ -40,6 +41,7 @@ from rezervo.schemas.schedule import (
     SessionRezervoClass,
     UserSession,
 )
+from rezervo.utils.clock_utils import ClockCalibration
 from rezervo.utils.logging_utils import log
 from rezervo.utils.time_utils import (
     from_compact_iso_week,
@@ -56,6 +58,17 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
     def totp_regex(self) -> str | None:
         return None
 
+    @property
+    def clock_reference_url(self) -> str | None:
+        """
+        Url of a provider server to calibrate the local clock against before booking
+        """
+        return None
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        return RetryPolicy()
+
     @property
     @abstractmethod
     def branches(self) -> list[Branch[LocationProviderIdentifier]]:
@@ -95,6 +108,14 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
     async def extend_auth_session(self, chain_user: ChainUser) -> None:  # noqa: B027
         pass
 
+    def auth_data_expires_at(self, auth_data: AuthData) -> datetime | None:
+        return None
+
+    def invalidate_auth_data(self, chain_user: ChainUser) -> None:  # noqa: B027
+        """
+        Discard any cached auth data of the given user, forcing a fresh authentication
+        """
+
     async def try_authenticate(
         self,
         chain_user: ChainUser,
@@ -121,9 +142,12 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
                 break
             if attempts >= max_attempts:
                 break
-            sleep_seconds = 2**attempts
-            log.warning(f"Exponential backoff, retrying in {sleep_seconds} seconds...")
-            time.sleep(sleep_seconds)
+            # jittered, to spread out retries when many users authenticate concurrently
+            sleep_seconds = 2**attempts * random.uniform(0.5, 1)
+            log.warning(
+                f"Exponential backoff, retrying in {sleep_seconds:.1f} seconds..."
+            )
+            await asyncio.sleep(sleep_seconds)
         if not success:
             log.error(
                 f"Authentication failed after {attempts} attempt"
@@ -152,7 +176,7 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
         self,
         auth_data: AuthData,
         class_id: str,
-    ) -> BookingResult | BookingError:
+    ) -> BookingResult | BookingError | BookingAttemptFailure | AuthenticationError:
         raise NotImplementedError()
 
     async def try_book_class(
@@ -162,6 +186,7 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
         _class: RezervoClass,
         config: ConfigValue,
         user_id: UUID,
+        clock: ClockCalibration | None = None,
     ) -> BookingResult | BookingError | AuthenticationError:
         max_attempts = config.booking.max_attempts
         if max_attempts < 1:
@@ -170,25 +195,50 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
         if isinstance(auth_data, AuthenticationError):
             log.error("Invalid authentication")
             return auth_data
+        policy = self.retry_policy
+        started_at = datetime.now().astimezone()
         booking_result = None
         attempts = 0
         while attempts < max_attempts:
+            sent_at = datetime.now().astimezone()
             booking_result = await self._book_class(auth_data, _class.id)
             attempts += 1
-            if isinstance(booking_result, BookingResult):
+            if clock is not None:
+                log.info(
+                    f"Booking attempt {attempts} landed "
+                    f"{clock.landing_error_seconds(sent_at, _class.booking_opens_at) * 1000:+.0f}ms "
+                    f"relative to opening ({clock})"
+                )
+            if isinstance(booking_result, BookingResult | AuthenticationError):
+                # retrying with rejected auth data is pointless
                 break
-            if attempts >= BOOKING_INITIAL_BURST_ATTEMPTS:
-                sleep_seconds = 2 ** (attempts - BOOKING_INITIAL_BURST_ATTEMPTS)
+            if attempts >= max_attempts:
+                break
+            failure = classify_booking_attempt(booking_result)
+            retry_delay = policy.retry_delay(
+                failure,
+                attempts,
+                started_at,
+                datetime.now().astimezone(),
+                _class.booking_opens_at,
+            )
+            if retry_delay is None:
+                log.error(f"Aborting booking after {failure.name} failure")
+                break
+            if retry_delay > 0:
                 log.warning(
-                    f"Exponential backoff, retrying in {sleep_seconds} seconds..."
+                    f"Booking attempt failed ({failure.name}), retrying in {retry_delay:.2f} seconds..."
                 )
-                await asyncio.sleep(sleep_seconds)
+                await asyncio.sleep(retry_delay)
         if not isinstance(booking_result, BookingResult):
             log.error(
                 f"Booking failed after {attempts} attempt"
                 + ("s" if attempts != 1 else "")
             )
+            if isinstance(booking_result, BookingError | AuthenticationError):
+                return booking_result
             return BookingError.ERROR
+        self.invalidate_schedule(_class)
         log.info(
             f"Successfully booked class '{_class.activity.name}'"
             + (f" after {attempts} attempts" if attempts != 1 else "")
@@ -200,12 +250,16 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
             + (f" after {attempts} attempts" if attempts != 1 else ""),
         )
         if config.notifications:
-            time_zone_adjusted_class = _class
-            time_zone_adjusted_class.start_time = _class.start_time.astimezone(
-                pytz.timezone("Europe/Oslo")
-            )  # TODO: clean this
-            time_zone_adjusted_class.end_time = _class.end_time.astimezone(
-                pytz.timezone("Europe/Oslo")
+            # copy, since the class may be shared (e.g. through the schedule cache)
+            time_zone_adjusted_class = _class.model_copy(
+                update={
+                    "start_time": _class.start_time.astimezone(
+                        pytz.timezone("Europe/Oslo")
+                    ),
+                    "end_time": _class.end_time.astimezone(
+                        pytz.timezone("Europe/Oslo")
+                    ),
+                }
             )  # TODO: clean this
             # ical_url = f"{ICAL_URL}/?id={_class.id}&token={token}"    # TODO: consider re-introducing ical
             await notify_booking(
@@ -219,7 +273,7 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
         self,
         auth_data: AuthData,
         _class: RezervoClass,
-    ) -> bool:
+    ) -> bool | BookingAttemptFailure | AuthenticationError:
         raise NotImplementedError()
 
     async def try_cancel_booking(
@@ -235,27 +289,40 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
         if isinstance(auth_data, AuthenticationError):
             log.error("Invalid authentication")
             return auth_data
+        policy = self.retry_policy
+        started_at = datetime.now().astimezone()
         cancelled = False
+        cancellation_result: bool | BookingAttemptFailure | AuthenticationError = False
         attempts = 0
         while not cancelled:
-            cancelled = await self._cancel_booking(auth_data, _class)
+            cancellation_result = await self._cancel_booking(auth_data, _class)
+            cancelled = cancellation_result is True
             attempts += 1
-            if cancelled:
+            if cancelled or isinstance(cancellation_result, AuthenticationError):
                 break
             if attempts >= config.booking.max_attempts:
                 break
-            if attempts >= BOOKING_INITIAL_BURST_ATTEMPTS:
-                sleep_seconds = 2 ** (attempts - BOOKING_INITIAL_BURST_ATTEMPTS)
+            failure = classify_booking_attempt(cancellation_result)
+            retry_delay = policy.retry_delay(
+                failure, attempts, started_at, datetime.now().astimezone()
+            )
+            if retry_delay is None:
+                log.error(f"Aborting booking cancellation after {failure.name} failure")
+                break
+            if retry_delay > 0:
                 log.warning(
-                    f"Exponential backoff, retrying in {sleep_seconds} seconds..."
+                    f"Booking cancellation attempt failed ({failure.name}), retrying in {retry_delay:.2f} seconds..."
                 )
-                await asyncio.sleep(sleep_seconds)
+                await asyncio.sleep(retry_delay)
         if not cancelled:
             log.error(
                 f"Booking cancellation failed after {attempts} attempt"
                 + ("s" if attempts != 1 else "")
             )
+            if isinstance(cancellation_result, AuthenticationError):
+                return cancellation_result
             return BookingError.ERROR
+        self.invalidate_schedule(_class)
         log.info(
             f"Successfully cancelled '{_class.activity.name}'"
             + (f" after {attempts} attempts" if attempts != 1 else "")
@@ -263,19 +330,31 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
         await notify_class_friends_of_cancellation(user_id, _class)
         return None
 
+    async def fetch_planned_sessions_schedule(
+        self, locations: list[LocationIdentifier] | None = None
+    ) -> RezervoSchedule:
+        return await self.fetch_schedule(
+            datetime.combine(datetime.now(), datetime.min.time()),
+            total_days_for_next_whole_weeks(PLANNED_SESSIONS_NEXT_WHOLE_WEEKS),
+            locations if locations is not None else self.locations(),
+        )
+
     async def fetch_sessions(
         self,
         chain_user: ChainUser,
         locations: list[LocationIdentifier] | None = None,
+        schedule: RezervoSchedule | ScheduleIndex | None = None,
     ) -> list[UserSession]:
+        """
+        Pull planned, past and booked sessions of the given user.
+        The schedule of planned sessions may be given when pulling sessions of many users,
+        to only fetch (and process) it once.
+        """
         log.info(
             f":right_arrow_curving_down:  Pulling user sessions from '{chain_user.chain}' for '{chain_user.username}' ..."
         )
-        schedule = await self.fetch_schedule(
-            datetime.combine(datetime.now(), datetime.min.time()),
-            total_days_for_next_whole_weeks(PLANNED_SESSIONS_NEXT_WHOLE_WEEKS),
-            locations if locations is not None else self.locations(),
-        )
+        if schedule is None:
+            schedule = await self.fetch_planned_sessions_schedule(locations)
         planned_sessions = self.extract_planned_sessions(chain_user, schedule)
         past_and_booked_sessions = await self._fetch_past_and_booked_sessions(
             chain_user, locations
@@ -291,7 +370,7 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
     def extract_planned_sessions(
         self,
         chain_user: ChainUser,
-        schedule: RezervoSchedule,
+        schedule: RezervoSchedule | ScheduleIndex,
     ) -> list[UserSession]:
         planned_classes = get_user_planned_sessions_from_schedule(
             config_from_chain_user(chain_user),
@@ -316,12 +395,37 @@ class Provider[AuthData, LocationProviderIdentifier](ABC):
     ) -> list[UserSession] | None:
         raise NotImplementedError()
 
-    @abstractmethod
+    @cached_property
+    def _schedule_cache(self) -> ScheduleCache:
+        return ScheduleCache()
+
     async def fetch_schedule(
         self,
         from_date: datetime,
         days: int,
         locations: list[LocationIdentifier],
+    ) -> RezervoSchedule:
+        return await self._schedule_cache.get(
+            from_date, days, locations, self._fetch_schedule
+        )
+
+    def invalidate_schedule(self, _class: RezervoClass) -> None:
+        """
+        Discard the cached schedule of the day of the given class, e.g. after its availability changed
+        """
+        self._schedule_cache.invalidate(_class.location.id, _class.start_time.date())
+
+    def log_cache_summary(self) -> None:  # noqa: B027
+        """
+        Summarize how well provider specific caches performed since the previous summary, e.g. after a session pull
+        """
+
+    @abstractmethod
+    async def _fetch_schedule(
+        self,
+        from_date: datetime,
+        days: int,
+        locations: list[LocationIdentifier],
     ) -> RezervoSchedule:
         raise NotImplementedError()
 
@@ -0,0 +1,108 @@
+import random
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from rezervo.consts import BOOKING_INITIAL_BURST_ATTEMPTS
+from rezervo.errors import BookingAttemptFailure, BookingError
+
+# client error statuses for which retrying the same request is pointless
+TERMINAL_BOOKING_RESPONSE_STATUSES = {404, 409, 410}
+
+
+class BookingFailureMarkers(BaseModel):
+    """
+    Lowercase fragments of a provider's failure messages (or error codes) revealing the kind of failure
+    """
+
+    not_open: tuple[str, ...] = ()
+    terminal: tuple[str, ...] = ()
+
+
+def classify_booking_failure_message(
+    message: str, markers: BookingFailureMarkers
+) -> BookingAttemptFailure | None:
+    normalized = message.lower().replace("_", " ")
+    if any(marker in normalized for marker in markers.not_open):
+        return BookingAttemptFailure.NOT_OPEN
+    if any(marker in normalized for marker in markers.terminal):
+        return BookingAttemptFailure.TERMINAL
+    return None
+
+
+def classify_booking_response_status(
+    status: int,
+    body: str = "",
+    markers: BookingFailureMarkers = BookingFailureMarkers(),
+) -> BookingAttemptFailure:
+    if status == 429 or status >= 500:
+        return BookingAttemptFailure.OVERLOADED
+    message_failure = classify_booking_failure_message(body, markers)
+    if message_failure is not None:
+        return message_failure
+    if status in TERMINAL_BOOKING_RESPONSE_STATUSES:
+        return BookingAttemptFailure.TERMINAL
+    return BookingAttemptFailure.TRANSIENT
+
+
+def classify_booking_attempt(
+    result: BookingError | BookingAttemptFailure | bool,
+) -> BookingAttemptFailure:
+    if isinstance(result, BookingAttemptFailure):
+        return result
+    if result is BookingError.ERROR or result is False:
+        # unclassified failure
+        return BookingAttemptFailure.TRANSIENT
+    return BookingAttemptFailure.TERMINAL
+
+
+class RetryPolicy(BaseModel):
+    """
+    Decides whether and when to retry a failed booking (or cancellation) attempt,
+    based on the classification of the failure and the time budget of the operation
+    """
+
+    # polling interval while booking is not open yet
+    opening_poll_interval_seconds: float = 0.1
+    # how long after the expected opening time to keep polling tightly
+    opening_poll_window_seconds: float = 10
+    # unclassified failures are retried immediately this many times before backing off
+    initial_burst_attempts: int = BOOKING_INITIAL_BURST_ATTEMPTS
+    backoff_base_seconds: float = 1
+    backoff_max_seconds: float = 30
+    # total time budget for all attempts
+    deadline_seconds: float = 120
+
+    def retry_delay(
+        self,
+        failure: BookingAttemptFailure,
+        attempts: int,
+        started_at: datetime,
+        now: datetime,
+        opens_at: datetime | None = None,
+    ) -> float | None:
+        """
+        Seconds to wait before the next attempt, or None if the operation should be aborted
+        """
+        if failure is BookingAttemptFailure.TERMINAL:
+            return None
+        if (
+            failure is BookingAttemptFailure.NOT_OPEN
+            and opens_at is not None
+            and (now - opens_at).total_seconds() < self.opening_poll_window_seconds
+        ):
+            delay = self.opening_poll_interval_seconds
+        elif failure is BookingAttemptFailure.OVERLOADED:
+            # full jitter, to avoid synchronized retries from concurrent bookings
+            delay = random.uniform(0, self._backoff_seconds(attempts))
+        elif attempts < self.initial_burst_attempts:
+            delay = 0
+        else:
+            delay = self._backoff_seconds(attempts - self.initial_burst_attempts + 1)
+        elapsed = (now - started_at).total_seconds()
+        if elapsed + delay > self.deadline_seconds:
+            return None
+        return delay
+
+    def _backoff_seconds(self, n: int) -> float:
+        return min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** (n - 1))
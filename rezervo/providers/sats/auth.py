@@ -1,8 +1,13 @@
-from aiohttp import ClientSession, FormData
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from aiohttp import ClientResponse, ClientSession, FormData
 from pydantic import ValidationError
 
 from rezervo.errors import AuthenticationError
-from rezervo.http_client import create_tcp_connector
+from rezervo.http_client import HttpClient
 from rezervo.providers.sats.consts import SATS_AUTH_COOKIE_NAME, SATS_REQUEST_HEADERS
 from rezervo.providers.sats.helpers import retrieve_sats_page_props
 from rezervo.providers.sats.schema import SatsBookingsResponse, SatsMyPageResponse
@@ -16,26 +21,44 @@ from rezervo.utils.logging_utils import log
 
 type SatsAuthData = str
 
+# successfully validated tokens are trusted for this long, without fetching My Page again
+SATS_TOKEN_VALIDATION_TTL_SECONDS = 5 * 60
+
+# expiry (monotonic) of the validation of each token
+_validated_tokens: dict[SatsAuthData, float] = {}
 
-def create_public_sats_client_session() -> ClientSession:
+
+def create_sats_login_session() -> ClientSession:
+    # a separate cookie jar collects the auth cookie, while connections are shared with the pool
     return ClientSession(
-        connector=create_tcp_connector(),
+        connector=HttpClient.singleton().connector,
+        connector_owner=False,
         headers=SATS_REQUEST_HEADERS,
     )
 
 
-def create_authed_sats_session(auth_data: SatsAuthData) -> ClientSession:
-    return ClientSession(
-        connector=create_tcp_connector(),
-        cookies={SATS_AUTH_COOKIE_NAME: auth_data},
+@asynccontextmanager
+async def sats_request(
+    method: str, url: str, auth_data: SatsAuthData | None = None, **kwargs: Any
+) -> AsyncIterator[ClientResponse]:
+    """
+    Send a request to Sats through the shared connection pool, authenticated as the user
+    of the given auth data (if any). The connection is released on exit.
+    """
+    async with HttpClient.singleton().request(
+        method,
+        url,
         headers=SATS_REQUEST_HEADERS,
-    )
+        cookies=({SATS_AUTH_COOKIE_NAME: auth_data} if auth_data is not None else None),
+        **kwargs,
+    ) as res:
+        yield res
 
 
 async def fetch_authed_sats_cookie(
     username: str, password: str | None
 ) -> SatsAuthData | AuthenticationError:
-    async with create_public_sats_client_session() as session:
+    async with create_sats_login_session() as session:
         auth_res = await session.post(
             AUTH_URL,
             data=FormData(
@@ -64,10 +87,10 @@ async def fetch_authed_sats_cookie(
 async def validate_token(
     auth_data: SatsAuthData,
 ) -> None | AuthenticationError:
-    async with (
-        create_authed_sats_session(auth_data) as session,
-        session.get(MY_PAGE_URL) as my_page_res,
-    ):
+    validated_until = _validated_tokens.get(auth_data)
+    if validated_until is not None and validated_until > time.monotonic():
+        return None
+    async with sats_request("GET", MY_PAGE_URL, auth_data) as my_page_res:
         if not my_page_res.ok:
             log.error("Validation of Sats authentication token failed")
             return AuthenticationError.TOKEN_VALIDATION_FAILED
@@ -80,4 +103,12 @@ async def validate_token(
                 return AuthenticationError.TOKEN_INVALID
         except ValidationError:
             return AuthenticationError.TOKEN_INVALID
+    now = time.monotonic()
+    for token in [t for t, until in _validated_tokens.items() if until <= now]:
+        del _validated_tokens[token]
+    _validated_tokens[auth_data] = now + SATS_TOKEN_VALIDATION_TTL_SECONDS
     return None
+
+
+def invalidate_token_validation(auth_data: SatsAuthData) -> None:
+    _validated_tokens.pop(auth_data, None)
@@ -1,5 +1,6 @@
 import json
 import re
+from functools import lru_cache
 
 import xxhash
 
@@ -21,5 +22,13 @@ def club_name_from_center_name(center_name: str) -> str:
     return center_name.removeprefix("SATS ")
 
 
+@lru_cache(maxsize=4096)
 def create_activity_id(activity_name: str, club_name: str) -> str:
     return xxhash.xxh64(f"{activity_name}@{club_name}".strip()).hexdigest()
+
+
+def club_id_from_sats_id(sats_id: str) -> int | None:
+    club_id_match = re.search(r"(\d+)p", sats_id)
+    if not club_id_match:
+        return None
+    return int(club_id_match.group(1))
@@ -1,7 +1,5 @@
 import asyncio
-import re
 from abc import ABC
-from collections.abc import Callable
 from datetime import datetime, timedelta
 
 import pytz
@@ -10,27 +8,38 @@ from aiohttp import FormData
 from rezervo.consts import WEEKDAYS
 from rezervo.database import crud
 from rezervo.database.database import SessionLocal
-from rezervo.errors import AuthenticationError, BookingError
+from rezervo.errors import AuthenticationError, BookingAttemptFailure, BookingError
 from rezervo.models import SessionState
 from rezervo.providers.provider import Provider
+from rezervo.providers.retry import (
+    BookingFailureMarkers,
+    RetryPolicy,
+    classify_booking_response_status,
+)
 from rezervo.providers.sats.auth import (
     SatsAuthData,
-    create_authed_sats_session,
     fetch_authed_sats_cookie,
+    invalidate_token_validation,
+    sats_request,
     validate_token,
 )
 from rezervo.providers.sats.consts import (
     SATS_EXPOSED_CLASSES_DAYS_INTO_FUTURE,
 )
 from rezervo.providers.sats.helpers import (
+    club_id_from_sats_id,
     club_name_from_center_name,
     create_activity_id,
     retrieve_sats_page_props,
 )
 from rezervo.providers.sats.schedule import (
+    SatsClassPredicate,
     fetch_sats_classes,
     find_sats_class,
     is_schedule_fetchable_for_date,
+    remember_sats_class_dates,
+    sats_class_config_predicate,
+    sats_class_id_predicate,
 )
 from rezervo.providers.sats.schema import (
     SatsBooking,
@@ -41,6 +50,7 @@ from rezervo.providers.sats.schema import (
     SatsLocationIdentifier,
 )
 from rezervo.providers.sats.urls import (
+    BASE_PATH,
     BOOKING_URL,
     BOOKINGS_PATH,
     BOOKINGS_URL,
@@ -68,8 +78,38 @@ from rezervo.utils.category_utils import determine_activity_category
 from rezervo.utils.logging_utils import log
 from rezervo.utils.str_utils import standardize_activity_name
 
+SATS_BOOKING_FAILURE_MARKERS = BookingFailureMarkers(
+    not_open=("ikke åpnet", "ikke åpen", "for tidlig", "not open", "too early"),
+    terminal=(
+        "allerede",
+        "already",
+        "er full",
+        "fullt",
+        "fully booked",
+        "avlyst",
+        "cancelled",
+    ),
+)
+
+# the sats api gateway answers bursts with 502s and rate limits by account,
+# so poll and retry unclassified failures more gently, and back off from a higher base
+SATS_RETRY_POLICY = RetryPolicy(
+    opening_poll_interval_seconds=0.5,
+    initial_burst_attempts=2,
+    backoff_base_seconds=2,
+    backoff_max_seconds=60,
+)
+
 
 class SatsProvider(Provider[SatsAuthData, SatsLocationIdentifier], ABC):
+    @property
+    def clock_reference_url(self) -> str | None:
+        return BASE_PATH
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        return SATS_RETRY_POLICY
+
     async def _authenticate(
         self, chain_user: ChainUser
     ) -> SatsAuthData | AuthenticationError:
@@ -96,12 +136,16 @@ class SatsProvider(Provider[SatsAuthData, SatsLocationIdentifier], ABC):
             )
         return auth_data
 
+    def invalidate_auth_data(self, chain_user: ChainUser) -> None:
+        if chain_user.auth_data is not None:
+            invalidate_token_validation(chain_user.auth_data)
+
     async def _search_for_class(
         self,
         from_date: datetime,
         days: int,
         locations: list[LocationIdentifier],
-        comparator_fn: Callable[[SatsClass], bool],
+        predicate: SatsClassPredicate,
     ):
         club_ids = self.club_ids_from_locations(locations)
         tasks = []
@@ -113,7 +157,7 @@ class SatsProvider(Provider[SatsAuthData, SatsLocationIdentifier], ABC):
                         find_sats_class(
                             club_ids,
                             fetch_date,
-                            comparator_fn,
+                            predicate,
                         )
                     )
                 )
@@ -127,56 +171,69 @@ class SatsProvider(Provider[SatsAuthData, SatsLocationIdentifier], ABC):
             if res is not None:
                 for t in tasks:
                     t.cancel()
+                remember_sats_class_dates([res])
                 return self.rezervo_class_from_sats_class(res)
         return BookingError.CLASS_MISSING
 
     async def find_class_by_id(
         self, class_id: str
     ) -> RezervoClass | BookingError | AuthenticationError:
-        def comparator_fn(sats_class: SatsClass):
-            return class_id == sats_class.id
-
+        location_id = self.extract_location_id(class_id)
+        with SessionLocal() as db:
+            class_date = crud.get_sats_class_date(db, class_id)
+        if class_date is not None and is_schedule_fetchable_for_date(
+            class_date.class_date
+        ):
+            _class = await self._search_for_class(
+                datetime.combine(class_date.class_date, datetime.min.time()),
+                1,
+                [location_id],
+                sats_class_id_predicate(class_id),
+            )
+            if isinstance(_class, RezervoClass):
+                return _class
+            log.debug(f"Sats class {class_id} not found on its indexed date")
         return await self._search_for_class(
             datetime.now(),
             SATS_EXPOSED_CLASSES_DAYS_INTO_FUTURE,
-            [self.extract_location_id(class_id)],
-            comparator_fn,
+            [location_id],
+            sats_class_id_predicate(class_id),
         )
 
     async def find_class(
         self, _class_config: Class
     ) -> RezervoClass | BookingError | AuthenticationError:
-        def comparator_fn(sats_class: SatsClass):
-            _class = self.rezervo_class_from_sats_class(sats_class)
-            return (
-                _class.activity.id == _class_config.activity_id
-                and _class.start_time.weekday() == _class_config.weekday
-                and _class.location.id == _class_config.location_id
-                and _class.start_time.hour == _class_config.start_time.hour
-                and _class.start_time.minute == _class_config.start_time.minute
+        club_id = self.provider_location_identifier_from_location_identifier(
+            _class_config.location_id
+        )
+        if club_id is None:
+            log.error(
+                f"Could not find club matching location id {_class_config.location_id}"
             )
-
+            return BookingError.ERROR
         # TODO: booking opening time is, in a non-obvious way, assumed to be 7 days before the class starts
         #       booking rules should possibly be hardcoded instead to determine class with closest booking time
         return await self._search_for_class(
             _class_config.calculate_next_occurrence(include_today=False),
             1,
             [_class_config.location_id],
-            comparator_fn,
+            sats_class_config_predicate(_class_config, club_id),
         )
 
     async def _book_class(
         self,
         auth_data: SatsAuthData,
         class_id: str,
-    ) -> BookingResult | BookingError:
-        async with (
-            create_authed_sats_session(auth_data) as session,
-            session.post(BOOKING_URL, data={"id": class_id}) as res,
-        ):
+    ) -> BookingResult | BookingError | BookingAttemptFailure:
+        async with sats_request(
+            "POST", BOOKING_URL, auth_data, data={"id": class_id}
+        ) as res:
             if not res.ok:
-                log.error("Booking attempt failed: " + (await res.text()))
-                return BookingError.ERROR
+                body = await res.text()
+                log.error("Booking attempt failed: " + body)
+                return classify_booking_response_status(
+                    res.status, body, SATS_BOOKING_FAILURE_MARKERS
+                )
             booking_data = SatsBookingResponse(**await res.json())
             return BookingResult(
                 status=(
@@ -195,34 +252,41 @@ class SatsProvider(Provider[SatsAuthData, SatsLocationIdentifier], ABC):
         self,
         auth_data: SatsAuthData,
         _class: RezervoClass,
-    ) -> bool:
-        async with create_authed_sats_session(auth_data) as session:
-            async with session.get(BOOKINGS_URL) as bookings_res:
-                sats_day_bookings = SatsBookingsResponse(
-                    **retrieve_sats_page_props(str(await bookings_res.read()))
-                ).myUpcomingTraining
-            for day_bookings in sats_day_bookings:
-                for booking in day_bookings.upcomingTrainings.trainings:
-                    start_time = pytz.timezone("Europe/Oslo").localize(
-                        datetime.fromisoformat(f"{booking.date}T{booking.startTime}")
-                    )
-                    if (
-                        club_name_from_center_name(booking.centerName)
-                        == _class.location.studio
-                        and booking.activityName == _class.activity.name
-                        and booking.instructor == _class.instructors[0].name
-                        and start_time == _class.start_time
-                    ):
-                        async with session.post(
-                            CANCEL_BOOKING_URL,
-                            data=FormData(
-                                {
-                                    "participationId": booking.hiddenInput[0].value,
-                                    "redirectUrl": BOOKINGS_PATH,
-                                }
-                            ),
-                        ) as res:
-                            return res.ok
+    ) -> bool | BookingAttemptFailure:
+        async with sats_request("GET", BOOKINGS_URL, auth_data) as bookings_res:
+            sats_day_bookings = SatsBookingsResponse(
+                **retrieve_sats_page_props(str(await bookings_res.read()))
+            ).myUpcomingTraining
+        for day_bookings in sats_day_bookings:
+            for booking in day_bookings.upcomingTrainings.trainings:
+                start_time = pytz.timezone("Europe/Oslo").localize(
+                    datetime.fromisoformat(f"{booking.date}T{booking.startTime}")
+                )
+                if (
+                    club_name_from_center_name(booking.centerName)
+                    == _class.location.studio
+                    and booking.activityName == _class.activity.name
+                    and booking.instructor == _class.instructors[0].name
+                    and start_time == _class.start_time
+                ):
+                    async with sats_request(
+                        "POST",
+                        CANCEL_BOOKING_URL,
+                        auth_data,
+                        data=FormData(
+                            {
+                                "participationId": booking.hiddenInput[0].value,
+                                "redirectUrl": BOOKINGS_PATH,
+                            }
+                        ),
+                    ) as res:
+                        if res.ok:
+                            return True
+                        body = await res.text()
+                        log.error("Booking cancellation attempt failed: " + body)
+                        return classify_booking_response_status(
+                            res.status, body, SATS_BOOKING_FAILURE_MARKERS
+                        )
         return False
 
     async def _find_class_from_booking_task(
@@ -241,10 +305,7 @@ class SatsProvider(Provider[SatsAuthData, SatsLocationIdentifier], ABC):
                 f"Authentication failed for '{chain_user.chain}' user '{chain_user.username}'"
             )
             return None
-        async with (
-            create_authed_sats_session(auth_data) as session,
-            session.get(BOOKINGS_URL) as bookings_res,
-        ):
+        async with sats_request("GET", BOOKINGS_URL, auth_data) as bookings_res:
             sats_day_bookings = SatsBookingsResponse(
                 **retrieve_sats_page_props(str(await bookings_res.read()))
             ).myUpcomingTraining
@@ -303,38 +364,43 @@ class SatsProvider(Provider[SatsAuthData, SatsLocationIdentifier], ABC):
             is not None
         ]
 
-    async def fetch_schedule(
+    async def _fetch_schedule(
         self,
         from_date: datetime,
         days: int,
         locations: list[LocationIdentifier],
     ) -> RezervoSchedule:
         club_ids = self.club_ids_from_locations(locations)
-        return RezervoSchedule(
-            days=await asyncio.gather(
-                *(
-                    self.fetch_sats_classes_as_rezervo_day(
-                        from_date + timedelta(days=i), club_ids
-                    )
-                    for i in range(days)
+        schedule_days = await asyncio.gather(
+            *(
+                self.fetch_sats_classes_as_rezervo_day(
+                    from_date + timedelta(days=i), club_ids
                 )
+                for i in range(days)
             )
         )
+        # days that failed to be fetched are left out
+        return RezervoSchedule(days=[d for d in schedule_days if d is not None])
 
     async def fetch_sats_classes_as_rezervo_day(
         self, date: datetime, club_ids: list[str]
-    ) -> RezervoDay:
+    ) -> RezervoDay | None:
+        sats_classes = (
+            await fetch_sats_classes(club_ids, date)
+            if is_schedule_fetchable_for_date(date.date())
+            else []
+        )
+        if sats_classes is None:
+            log.warning(f"Failed to fetch Sats schedule for {date.date().isoformat()}")
+            return None
+        remember_sats_class_dates(sats_classes)
         return RezervoDay(
             day_name=WEEKDAYS[date.weekday()],
             date=date.isoformat(),
-            classes=(
-                [
-                    self.rezervo_class_from_sats_class(sats_class)
-                    for sats_class in await fetch_sats_classes(club_ids, date)
-                ]
-                if is_schedule_fetchable_for_date(date.date())
-                else []
-            ),
+            classes=[
+                self.rezervo_class_from_sats_class(sats_class)
+                for sats_class in sats_classes
+            ],
         )
 
     def rezervo_class_from_sats_class(
@@ -379,10 +445,9 @@ class SatsProvider(Provider[SatsAuthData, SatsLocationIdentifier], ABC):
         )
 
     def extract_location_id(self, sats_id: str) -> str:
-        provider_location_id_match = re.search(r"(\d+)p", sats_id)
-        if not provider_location_id_match:
+        provider_location_id = club_id_from_sats_id(sats_id)
+        if provider_location_id is None:
             raise Exception("Could not retrieve location id from sats_id")
-        provider_location_id = int(provider_location_id_match.group(1))
         location_id = self.location_from_provider_location_identifier(
             provider_location_id
         )
@@ -2,16 +2,24 @@ import asyncio
 import datetime
 from collections.abc import Callable
 
-from rezervo.http_client import HttpClient
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
+from rezervo.http_client import fetch_json
 from rezervo.providers.sats.consts import SATS_EXPOSED_CLASSES_DAYS_INTO_FUTURE
+from rezervo.providers.sats.helpers import club_id_from_sats_id, create_activity_id
 from rezervo.providers.sats.schema import (
     SatsClass,
     SatsScheduleResponse,
 )
 from rezervo.providers.sats.urls import SCHEDULE_URL
+from rezervo.schemas.config.user import Class
 
 BATCH_SIZE = 20  # Limited by the Sats API pagination
-TASK_COUNT = 5  # Number of parallel fetchers
+# number of pages fetched concurrently for a day before any page count has been observed
+INITIAL_PAGE_COUNT_ESTIMATE = 5
+
+# number of pages needed to reach the end of a day, per set of clubs and weekday
+_page_counts: dict[tuple[frozenset[str], int], int] = {}
 
 
 def is_schedule_fetchable_for_date(date: datetime.date) -> bool:
@@ -26,41 +34,162 @@ def is_schedule_fetchable_for_date(date: datetime.date) -> bool:
 async def fetch_sats_classes_with_offset(
     club_ids: list[str], date: datetime.datetime, offset: int
 ) -> list[SatsClass] | None:
-    async with HttpClient.singleton().post(
+    res = await fetch_json(
         SCHEDULE_URL,
+        method="POST",
         json={
             "clubIds": ",".join(club_ids),
             "date": date.strftime("%Y-%m-%d"),
             "offset": offset,
         },
-    ) as res:
-        if not res.ok:
-            return None
-        return SatsScheduleResponse(**(await res.json())).classes
+    )
+    if not res.ok:
+        return None
+    return SatsScheduleResponse(**res.body).classes
+
+
+async def fetch_sats_pages(
+    club_ids: list[str],
+    date: datetime.datetime,
+    first_page: int,
+    page_count: int,
+    find_class_comparator_fn: Callable[[SatsClass], bool] | None,
+) -> tuple[list[SatsClass] | None, int | None]:
+    """
+    Fetch the given pages concurrently, cancelling pages after the first short (i.e. last) page,
+    or all pages once a class matches the comparator.
+    Returns the classes in schedule order (None if a page failed) and the index of the last page, if it was reached.
+    """
+    tasks = {
+        asyncio.create_task(
+            fetch_sats_classes_with_offset(club_ids, date, page * BATCH_SIZE)
+        ): page
+        for page in range(first_page, first_page + page_count)
+    }
+    pages: dict[int, list[SatsClass]] = {}
+    last_page = None
+    failed_pages = set()
+    pending = set(tasks.keys())
+    try:
+        while len(pending) > 0:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                page = tasks[task]
+                # failed pages end the pagination, like empty pages
+                result = task.result()
+                if result is None:
+                    failed_pages.add(page)
+                classes = result or []
+                pages[page] = classes
+                if len(classes) < BATCH_SIZE and (
+                    last_page is None or page < last_page
+                ):
+                    last_page = page
+                if find_class_comparator_fn is not None:
+                    for sats_class in classes:
+                        if find_class_comparator_fn(sats_class):
+                            return [sats_class], page
+            if last_page is not None:
+                for task in pending:
+                    if tasks[task] > last_page:
+                        task.cancel()
+                pending = {t for t in pending if tasks[t] <= last_page}
+    finally:
+        for task in pending:
+            task.cancel()
+    if find_class_comparator_fn is not None:
+        return [], last_page
+    if len(failed_pages) > 0:
+        return None, last_page
+    return [
+        sats_class
+        for page in sorted(pages.keys())
+        if last_page is None or page <= last_page
+        for sats_class in pages[page]
+    ], last_page
 
 
-async def fetch_classes_batch_task(
+async def fetch_sats_classes_paginated(
     club_ids: list[str],
     date: datetime.datetime,
     find_class_comparator_fn: Callable[[SatsClass], bool] | None,
-    start_batch: int,
-    batch_step: int,
-    batch_size: int,
-) -> list[SatsClass]:
-    batch_classes: list[SatsClass] = []
-    offset = batch_size * start_batch
+) -> list[SatsClass] | None:
+    """
+    Fetch the schedule of a day in concurrent waves of pages, where the first wave covers the
+    number of pages previously needed for the same clubs and weekday.
+    Returns None if any page failed, rather than an incomplete schedule.
+    """
+    key = (frozenset(club_ids), date.weekday())
+    page_count = _page_counts.get(key, INITIAL_PAGE_COUNT_ESTIMATE)
+    first_page = 0
+    classes: list[SatsClass] = []
     while True:
-        classes = await fetch_sats_classes_with_offset(club_ids, date, offset)
-        if classes is None or len(classes) == 0:
-            break
-        if find_class_comparator_fn is not None:
-            for sats_class in classes:
-                if find_class_comparator_fn(sats_class):
-                    return [sats_class]
-        else:
-            batch_classes.extend(classes)
-        offset += batch_size * batch_step
-    return batch_classes
+        wave_classes, last_page = await fetch_sats_pages(
+            club_ids, date, first_page, page_count, find_class_comparator_fn
+        )
+        if wave_classes is None:
+            return None
+        if find_class_comparator_fn is not None and len(wave_classes) > 0:
+            return wave_classes
+        classes.extend(wave_classes)
+        if last_page is not None:
+            _page_counts[key] = last_page + 1
+            return classes
+        first_page += page_count
+        page_count *= 2
+
+
+def remember_sats_class_dates(sats_classes: list[SatsClass]) -> None:
+    """
+    Index the club and date of the given classes, for later lookups by class id
+    """
+    class_dates = {
+        sats_class.id: (
+            club_id,
+            datetime.datetime.fromisoformat(sats_class.metadata.startsAt).date(),
+        )
+        for sats_class in sats_classes
+        if (club_id := club_id_from_sats_id(sats_class.id)) is not None
+    }
+    if len(class_dates) == 0:
+        return
+    with SessionLocal() as db:
+        crud.upsert_sats_class_dates(db, class_dates)
+
+
+type SatsClassPredicate = Callable[[SatsClass], bool]
+
+
+def sats_class_id_predicate(class_id: str) -> SatsClassPredicate:
+    return lambda sats_class: sats_class.id == class_id
+
+
+def sats_class_config_predicate(
+    _class_config: Class, club_id: int
+) -> SatsClassPredicate:
+    """
+    Match classes of a recurring booking directly on the Sats fields, cheapest checks first
+    """
+    start_time = (
+        _class_config.weekday,
+        _class_config.start_time.hour,
+        _class_config.start_time.minute,
+    )
+
+    def predicate(sats_class: SatsClass) -> bool:
+        if club_id_from_sats_id(sats_class.id) != club_id:
+            return False
+        starts_at = datetime.datetime.fromisoformat(sats_class.metadata.startsAt)
+        if (starts_at.weekday(), starts_at.hour, starts_at.minute) != start_time:
+            return False
+        return (
+            create_activity_id(sats_class.metadata.name, sats_class.metadata.clubName)
+            == _class_config.activity_id
+        )
+
+    return predicate
 
 
 async def find_sats_class(
@@ -68,50 +197,12 @@ async def find_sats_class(
     date: datetime.datetime,
     comparator_fn: Callable[[SatsClass], bool],
 ) -> SatsClass | None:
-    tasks = [
-        asyncio.create_task(
-            fetch_classes_batch_task(
-                club_ids,
-                date,
-                comparator_fn,
-                i,
-                TASK_COUNT,
-                BATCH_SIZE,
-            )
-        )
-        for i in range(TASK_COUNT)
-    ]
-    for coro in asyncio.as_completed(tasks):
-        try:
-            res = await coro
-        except asyncio.CancelledError:
-            for t in tasks:
-                t.cancel()
-            raise
-        if res is not None and len(res) > 0:
-            for t in tasks:
-                t.cancel()
-            return res[0]
-    return None
+    classes = await fetch_sats_classes_paginated(club_ids, date, comparator_fn)
+    return classes[0] if classes else None
 
 
 async def fetch_sats_classes(
     club_ids: list[str],
     date: datetime.datetime,
-) -> list[SatsClass]:
-    classes = []
-    for res in await asyncio.gather(
-        *[
-            fetch_classes_batch_task(
-                club_ids,
-                date,
-                None,
-                i,
-                TASK_COUNT,
-                BATCH_SIZE,
-            )
-            for i in range(TASK_COUNT)
-        ]
-    ):
-        classes.extend(res)
-    return classes
+) -> list[SatsClass] | None:
+    return await fetch_sats_classes_paginated(club_ids, date, None)
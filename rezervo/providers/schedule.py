@@ -6,34 +6,81 @@ from rezervo.schemas.config.user import Class
 from rezervo.schemas.schedule import RezervoClass, RezervoSchedule
 from rezervo.utils.logging_utils import log
 
+# location id, activity id and weekday
+type ScheduleSlotKey = tuple[str, str, int]
+# location id, activity id, weekday, and local hour and minute of the start time
+type ScheduleClassKey = tuple[str, str, int, int, int]
+
+
+class ScheduleIndex:
+    """
+    Classes of a schedule indexed by the fields matched against recurring bookings,
+    such that matching a recurring booking is a lookup instead of a scan of the schedule
+    """
+
+    def __init__(self, schedule: RezervoSchedule):
+        # classes are kept in schedule order, together with their position in the schedule
+        self._classes: dict[ScheduleClassKey, list[tuple[int, RezervoClass]]] = {}
+        self._slots: set[ScheduleSlotKey] = set()
+        weekdays = {name: i for i, name in enumerate(WEEKDAYS)}
+        tz = pytz.timezone("Europe/Oslo")  # TODO: clean this
+        position = 0
+        for day in schedule.days:
+            weekday = weekdays.get(day.day_name)
+            if weekday is None:
+                continue
+            for c in day.classes:
+                localized_start_time = c.start_time.astimezone(tz)
+                self._slots.add((c.location.id, c.activity.id, weekday))
+                self._classes.setdefault(
+                    (
+                        c.location.id,
+                        c.activity.id,
+                        weekday,
+                        localized_start_time.hour,
+                        localized_start_time.minute,
+                    ),
+                    [],
+                ).append((position, c))
+                position += 1
+
+    def matching_classes(self, _class_config: Class) -> list[tuple[int, RezervoClass]]:
+        """
+        Classes matching the given recurring booking, with their position in the schedule
+        """
+        return self._classes.get(
+            (
+                _class_config.location_id,
+                _class_config.activity_id,
+                _class_config.weekday,
+                _class_config.start_time.hour,
+                _class_config.start_time.minute,
+            ),
+            [],
+        )
+
+    def has_slot(self, _class_config: Class) -> bool:
+        """
+        Whether the activity is scheduled at the location on the weekday of the given recurring booking,
+        regardless of start time
+        """
+        return (
+            _class_config.location_id,
+            _class_config.activity_id,
+            _class_config.weekday,
+        ) in self._slots
+
 
 def find_class_in_schedule_by_config(
-    _class_config: Class, schedule: RezervoSchedule
+    _class_config: Class, schedule: RezervoSchedule | ScheduleIndex
 ) -> RezervoClass | BookingError:
     if not 0 <= _class_config.weekday < len(WEEKDAYS):
         log.error(f"Invalid weekday number ({_class_config.weekday=})")
         return BookingError.MALFORMED_SEARCH
-    weekday_str = WEEKDAYS[_class_config.weekday]
-    result = None
-    for day in schedule.days:
-        if day.day_name != weekday_str:
-            continue
-        for c in day.classes:
-            if c.location.id != _class_config.location_id:
-                continue
-            if c.activity.id != _class_config.activity_id:
-                continue
-            localized_start_time = c.start_time.astimezone(
-                pytz.timezone("Europe/Oslo")
-            )  # TODO: clean this
-            time_matches = (
-                localized_start_time.hour == _class_config.start_time.hour
-                and localized_start_time.minute == _class_config.start_time.minute
-            )
-            if not time_matches:
-                result = BookingError.INCORRECT_START_TIME
-                continue
-            return c
-    if result is None:
-        result = BookingError.CLASS_MISSING
-    return result
+    index = schedule if isinstance(schedule, ScheduleIndex) else ScheduleIndex(schedule)
+    matches = index.matching_classes(_class_config)
+    if len(matches) > 0:
+        return matches[0][1]
+    if index.has_slot(_class_config):
+        return BookingError.INCORRECT_START_TIME
+    return BookingError.CLASS_MISSING
@@ -0,0 +1,213 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from datetime import date, datetime, timedelta
+
+from rezervo.consts import WEEKDAYS
+from rezervo.providers.schema import LocationIdentifier
+from rezervo.schemas.schedule import RezervoClass, RezervoDay, RezervoSchedule
+
+# cached schedule days expire faster the closer they are, since availability changes more often
+SCHEDULE_CACHE_TTL_NEAR_SECONDS = 60
+SCHEDULE_CACHE_TTL_WEEK_SECONDS = 5 * 60
+SCHEDULE_CACHE_TTL_DISTANT_SECONDS = 30 * 60
+SCHEDULE_CACHE_NEAR_DAYS = 2
+SCHEDULE_CACHE_WEEK_DAYS = 7
+
+type ScheduleCacheKey = tuple[LocationIdentifier, date]
+
+
+def schedule_cache_ttl_seconds(day: date) -> float:
+    days_ahead = (day - date.today()).days
+    if days_ahead < SCHEDULE_CACHE_NEAR_DAYS:
+        return SCHEDULE_CACHE_TTL_NEAR_SECONDS
+    if days_ahead < SCHEDULE_CACHE_WEEK_DAYS:
+        return SCHEDULE_CACHE_TTL_WEEK_SECONDS
+    return SCHEDULE_CACHE_TTL_DISTANT_SECONDS
+
+
+class ScheduleCache:
+    """
+    Cache of the schedule of a single chain, divided into (location, day) entries.
+    Concurrent requests share in-flight fetches of overlapping entries.
+    """
+
+    def __init__(self):
+        # expiry (monotonic), date string as returned by the provider, and classes
+        self._entries: dict[
+            ScheduleCacheKey, tuple[float, str, list[RezervoClass]]
+        ] = {}
+        self._in_flight: dict[ScheduleCacheKey, asyncio.Future[None]] = {}
+        # bumped on invalidation of keys being fetched, to discard results of fetches started before it
+        self._generations: dict[ScheduleCacheKey, int] = {}
+        # entry containing each cached class
+        self._class_keys: dict[str, ScheduleCacheKey] = {}
+
+    def _is_fresh(self, key: ScheduleCacheKey) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    async def get(
+        self,
+        from_date: datetime,
+        days: int,
+        locations: list[LocationIdentifier],
+        fetch: Callable[
+            [datetime, int, list[LocationIdentifier]], Awaitable[RezervoSchedule]
+        ],
+    ) -> RezervoSchedule:
+        dates = [from_date.date() + timedelta(days=i) for i in range(days)]
+        keys = [(location, d) for location in locations for d in dates]
+        await self._fetch_missing(
+            [k for k in keys if not self._is_fresh(k) and k not in self._in_flight],
+            fetch,
+        )
+        while True:
+            in_flight = [self._in_flight[k] for k in keys if k in self._in_flight]
+            if len(in_flight) == 0:
+                break
+            # failures are raised by the fetching request, and retried below
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        await self._fetch_missing([k for k in keys if k not in self._entries], fetch)
+        schedule_days = []
+        for d in dates:
+            entries = [self._entries.get((location, d)) for location in locations]
+            schedule_days.append(
+                RezervoDay(
+                    day_name=WEEKDAYS[d.weekday()],
+                    date=next((e[1] for e in entries if e is not None), d.isoformat()),
+                    classes=sorted(
+                        [c for e in entries if e is not None for c in e[2]],
+                        key=lambda c: c.start_time,
+                    ),
+                )
+            )
+        return RezervoSchedule(days=schedule_days)
+
+    async def _fetch_missing(
+        self,
+        keys: list[ScheduleCacheKey],
+        fetch: Callable[
+            [datetime, int, list[LocationIdentifier]], Awaitable[RezervoSchedule]
+        ],
+    ) -> None:
+        # locations missing the same range of days are fetched together
+        ranges: dict[LocationIdentifier, tuple[date, date]] = {}
+        for location, d in keys:
+            first, last = ranges.get(location, (d, d))
+            ranges[location] = (min(first, d), max(last, d))
+        groups: dict[tuple[date, date], list[ScheduleCacheKey]] = {}
+        for location, (first, last) in ranges.items():
+            groups.setdefault((first, last), []).extend(
+                (location, first + timedelta(days=i))
+                for i in range((last - first).days + 1)
+            )
+        # register in-flight fetches before yielding, for concurrent requests to join them
+        registered = [self._register(group) for group in groups.values()]
+        try:
+            await asyncio.gather(*[self._fetch(f, fetch) for f in registered])
+        finally:
+            # fetches cancelled before starting never resolve their futures
+            for futures in registered:
+                for k, future in futures.items():
+                    if not future.done():
+                        future.cancel()
+                    self._unregister(k, future)
+
+    def _register(
+        self, keys: list[ScheduleCacheKey]
+    ) -> dict[ScheduleCacheKey, asyncio.Future[None]]:
+        loop = asyncio.get_running_loop()
+        futures = {k: loop.create_future() for k in keys}
+        for future in futures.values():
+            # waiters ignore failures, so avoid warnings about unretrieved exceptions
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight.update(futures)
+        return futures
+
+    def _unregister(self, key: ScheduleCacheKey, future: asyncio.Future[None]) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if key not in self._in_flight:
+            # generations only matter to fetches in flight
+            self._generations.pop(key, None)
+
+    async def _fetch(
+        self,
+        futures: dict[ScheduleCacheKey, asyncio.Future[None]],
+        fetch: Callable[
+            [datetime, int, list[LocationIdentifier]], Awaitable[RezervoSchedule]
+        ],
+    ) -> None:
+        keys = list(futures.keys())
+        generations = {k: self._generations.get(k, 0) for k in keys}
+        first_date = min(d for _, d in keys)
+        last_date = max(d for _, d in keys)
+        locations = list(dict.fromkeys(location for location, _ in keys))
+        try:
+            schedule = await fetch(
+                datetime.combine(first_date, datetime.min.time()),
+                (last_date - first_date).days + 1,
+                locations,
+            )
+            # only days actually returned are cached, since missing days may have failed to be fetched
+            fetched: dict[ScheduleCacheKey, tuple[str, list[RezervoClass]]] = {}
+            for day in schedule.days:
+                day_date = datetime.fromisoformat(day.date).date()
+                for location in locations:
+                    if (location, day_date) in futures:
+                        fetched[(location, day_date)] = (day.date, [])
+                for c in day.classes:
+                    if (c.location.id, day_date) in fetched:
+                        fetched[(c.location.id, day_date)][1].append(c)
+            self._prune_expired()
+            for k, (date_str, classes) in fetched.items():
+                if self._generations.get(k, 0) != generations[k]:
+                    continue
+                self._entries[k] = (
+                    time.monotonic() + schedule_cache_ttl_seconds(k[1]),
+                    date_str,
+                    classes,
+                )
+                for c in classes:
+                    self._class_keys[c.id] = k
+            for future in futures.values():
+                future.set_result(None)
+        except BaseException as e:
+            for future in futures.values():
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                else:
+                    future.cancel()
+            raise
+        finally:
+            for k, future in futures.items():
+                self._unregister(k, future)
+
+    def _prune_expired(self) -> None:
+        now = time.monotonic()
+        for k in [k for k, e in self._entries.items() if e[0] <= now]:
+            del self._entries[k]
+        self._class_keys = {
+            class_id: k
+            for class_id, k in self._class_keys.items()
+            if k in self._entries
+        }
+
+    def get_class(self, class_id: str) -> RezervoClass | None:
+        """
+        Class with the given id, if it is part of a fresh cache entry
+        """
+        key = self._class_keys.get(class_id)
+        if key is None or not self._is_fresh(key):
+            return None
+        return next((c for c in self._entries[key][2] if c.id == class_id), None)
+
+    def invalidate(
+        self, location: LocationIdentifier | None = None, day: date | None = None
+    ) -> None:
+        for k in list(self._entries.keys() | self._in_flight.keys()):
+            if (location is None or k[0] == location) and (day is None or k[1] == day):
+                self._entries.pop(k, None)
+                if k in self._in_flight:
+                    self._generations[k] = self._generations.get(k, 0) + 1
@@ -14,6 +14,11 @@ class Booking(OrmBase):
     timezone: str
     max_attempts: int = 10
     max_waiting_minutes: int = 60
+    clock_calibration_samples: int = 5
+    # land the first booking attempt slightly after opening, to account for estimation errors
+    landing_margin_milliseconds: int = 20
+    precision_spin_milliseconds: int = 300
+    prewarm_seconds: int = 30
 
 
 class Cron(OrmBase):
@@ -25,6 +30,11 @@ class Cron(OrmBase):
     job_comment_prefix: str = "rezervo"
 
 
+class Booker(OrmBase):
+    enabled: bool = False
+    refresh_interval_minutes: int = 30
+
+
 class Transfersh(CamelOrmBase):
     url: str
 
@@ -127,6 +137,7 @@ class AppConfig(OrmBase):
     auth: Auth
     booking: Booking
     cron: Cron
+    booker: Booker = Booker()
     content: Content | None = None
     mirage: Mirage = Mirage()
     host: str
@@ -6,6 +6,7 @@ from rezervo.chains.active import ACTIVE_CHAIN_IDENTIFIERS, get_chain
 from rezervo.database import crud
 from rezervo.database.database import SessionLocal
 from rezervo.models import SessionState
+from rezervo.providers.schedule import ScheduleIndex
 from rezervo.schemas.config.user import ChainConfig, ChainIdentifier
 from rezervo.schemas.schedule import (
     BookingResult,
@@ -36,20 +37,42 @@ async def pull_chain_sessions(
     else:
         with SessionLocal() as db:
             chain_users = crud.get_chain_users(db, chain_identifier)
+    chain = get_chain(chain_identifier)
+    # the schedule is shared by all users, so it is fetched once, and only at locations with planned sessions
+    schedule_index = ScheduleIndex(
+        await chain.fetch_planned_sessions_schedule(
+            list(
+                dict.fromkeys(
+                    r.location_id
+                    for cu in chain_users
+                    if cu.active
+                    for r in cu.recurring_bookings
+                )
+            )
+        )
+    )
     for cu, user_sessions in zip(
         chain_users,
         await asyncio.gather(
             *[
-                get_chain(chain_identifier).fetch_sessions(chain_user)
+                chain.fetch_sessions(chain_user, schedule=schedule_index)
                 for chain_user in chain_users
-            ]
+            ],
+            # one failing user should not abort pulling sessions of all other users
+            return_exceptions=True,
         ),
         strict=False,
     ):
+        if isinstance(user_sessions, BaseException):
+            log.error(
+                f"Failed to pull '{chain_identifier}' sessions for '{cu.username}': {user_sessions}"
+            )
+            continue
         with SessionLocal() as db:
             crud.upsert_user_chain_sessions(
                 db, cu.user_id, chain_identifier, user_sessions
             )
+    chain.log_cache_summary()
 
 
 async def pull_sessions(
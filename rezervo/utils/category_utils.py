@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic.main import BaseModel
 
 
@@ -138,6 +140,7 @@ ACTIVITY_CATEGORIES = [
 ]
 
 
+@lru_cache(maxsize=1024)
 def determine_activity_category(activity_name: str) -> RezervoCategory:
     for category in ACTIVITY_CATEGORIES:
         for keyword in category.keywords:
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+from pydantic import BaseModel
+
+from rezervo.http_client import HttpClient
+from rezervo.utils.logging_utils import log
+
+# spread samples over a non-integer interval to narrow down the one-second resolution of the 'Date' header
+CLOCK_CALIBRATION_SAMPLE_INTERVAL_SECONDS = 0.37
+
+
+class ClockCalibration(BaseModel):
+    # provider clock minus local clock
+    offset_seconds: float = 0
+    round_trip_seconds: float = 0
+    # uncertainty of the offset estimate (half the width of the feasible offset interval)
+    uncertainty_seconds: float | None = None
+
+    def provider_time(self, local_time: datetime) -> datetime:
+        return local_time + timedelta(seconds=self.offset_seconds)
+
+    def local_time(self, provider_time: datetime) -> datetime:
+        return provider_time - timedelta(seconds=self.offset_seconds)
+
+    def dispatch_time(self, provider_target: datetime) -> datetime:
+        """
+        Local time at which to send a request for it to arrive at the given provider time
+        """
+        return self.local_time(provider_target) - timedelta(
+            seconds=self.round_trip_seconds / 2
+        )
+
+    def landing_error_seconds(
+        self, sent_at: datetime, provider_target: datetime
+    ) -> float:
+        """
+        Estimated arrival time (on the provider clock) of a request sent at the given local time,
+        relative to the given provider target time
+        """
+        estimated_arrival = self.provider_time(sent_at) + timedelta(
+            seconds=self.round_trip_seconds / 2
+        )
+        return (estimated_arrival - provider_target).total_seconds()
+
+    def __str__(self):
+        return (
+            f"offset={self.offset_seconds * 1000:+.0f}ms "
+            f"rtt={self.round_trip_seconds * 1000:.0f}ms"
+            + (
+                f" ±{self.uncertainty_seconds * 1000:.0f}ms"
+                if self.uncertainty_seconds is not None
+                else ""
+            )
+        )
+
+
+async def calibrate_clock(url: str, samples: int) -> ClockCalibration | None:
+    """
+    Estimate the offset between the local clock and the clock of the server at the given url.
+    Each sample bounds the offset by comparing the (second resolution) 'Date' response header
+    to the local send and receive times, and the bounds of all samples are intersected.
+    """
+    lower_bound = float("-inf")
+    upper_bound = float("inf")
+    round_trips: list[float] = []
+    midpoints: list[float] = []
+    for i in range(samples):
+        if i > 0:
+            await asyncio.sleep(CLOCK_CALIBRATION_SAMPLE_INTERVAL_SECONDS)
+        try:
+            sent_at = time.time()
+            async with HttpClient.singleton().head(url) as res:
+                received_at = time.time()
+                date_header = res.headers.get("Date")
+        except Exception as e:
+            log.warning(f"Clock calibration request to {url} failed: {e}")
+            continue
+        if date_header is None:
+            log.warning(f"Clock calibration response from {url} has no 'Date' header")
+            return None
+        server_second = parsedate_to_datetime(date_header).timestamp()
+        round_trips.append(received_at - sent_at)
+        # the server clock read somewhere in [server_second, server_second + 1) between sending and receiving
+        lower_bound = max(lower_bound, server_second - received_at)
+        upper_bound = min(upper_bound, server_second + 1 - sent_at)
+        midpoints.append(server_second + 0.5 - (sent_at + received_at) / 2)
+    if len(round_trips) == 0:
+        return None
+    if lower_bound <= upper_bound:
+        offset = (lower_bound + upper_bound) / 2
+        uncertainty = (upper_bound - lower_bound) / 2
+    else:
+        # inconsistent samples (e.g. server clock adjusted during calibration), fall back to average
+        offset = sum(midpoints) / len(midpoints)
+        uncertainty = None
+    return ClockCalibration(
+        offset_seconds=offset,
+        round_trip_seconds=min(round_trips),
+        uncertainty_seconds=uncertainty,
+    )
+
+
+async def sleep_until(target: datetime, spin_seconds: float) -> None:
+    """
+    Sleep until the given (local) time, sleeping coarsely before spin-waiting the last part
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (target - datetime.now().astimezone()).total_seconds()
+    coarse_sleep_seconds = deadline - loop.time() - spin_seconds
+    if coarse_sleep_seconds > 0:
+        await asyncio.sleep(coarse_sleep_seconds)
+    while loop.time() < deadline:
+        # yield to the event loop while spinning, to not starve other tasks
+        await asyncio.sleep(0)
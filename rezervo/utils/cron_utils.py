@@ -90,6 +90,9 @@ async def build_cron_jobs_from_config(
                     precheck=True,
                 )
             )
+        if conf.config.booker.enabled:
+            # the actual booking is handled by the long-lived booker daemon
+            continue
         jobs.append(
             build_booking_cron_job(
                 user,
@@ -0,0 +1,42 @@
+import asyncio
+import contextlib
+from collections.abc import Hashable, Iterator
+
+
+class KeyedEvents:
+    """
+    In-process wake-ups for tasks waiting on something identified by a key.
+    Notifications are not queued, so waiters must still check the actual state after waking.
+    """
+
+    def __init__(self):
+        self._events: dict[Hashable, set[asyncio.Event]] = {}
+
+    @contextlib.contextmanager
+    def listen(self, key: Hashable) -> Iterator[asyncio.Event]:
+        event = asyncio.Event()
+        self._events.setdefault(key, set()).add(event)
+        try:
+            yield event
+        finally:
+            listeners = self._events.get(key)
+            if listeners is not None:
+                listeners.discard(event)
+                if not listeners:
+                    del self._events[key]
+
+    def notify(self, key: Hashable) -> None:
+        for event in self._events.get(key, ()):
+            event.set()
+
+
+async def wait_for_event(event: asyncio.Event, timeout: float) -> bool:
+    """
+    Wait until the event is set or the timeout passes, clearing the event before returning
+    """
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except TimeoutError:
+        return False
+    event.clear()
+    return True
@@ -1,10 +1,48 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
 from pathlib import Path
 
+import psutil
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Playwright,
+    async_playwright,
+)
+from playwright.async_api import (
+    Error as PlaywrightError,
+)
+from playwright.async_api import (
+    TimeoutError as PlaywrightTimeoutError,
+)
+from pydantic import BaseModel
+
 from rezervo.schemas.config.config import read_app_config
+from rezervo.utils.logging_utils import log
 
 PLAYWRIGHT_TRACING = read_app_config().is_development
 PLAYWRIGHT_TRACING_DIR = Path("playwright_traces")
 
+# maximum number of browser contexts in use at the same time, further flows wait for a free context
+BROWSER_POOL_MAX_CONTEXTS = 4
+# interactive flows (e.g. waiting for a TOTP code from the user) may hold their context for minutes,
+# so they have a separate budget of contexts, not starving the automated flows
+BROWSER_POOL_MAX_INTERACTIVE_CONTEXTS = 4
+# the browser is replaced after serving this many contexts, or when using this much memory
+BROWSER_POOL_MAX_USES = 50
+BROWSER_POOL_MAX_RSS_BYTES = 1024 * 1024 * 1024
+# a browser using this much memory is killed right away, aborting its flows
+BROWSER_POOL_KILL_RSS_BYTES = 2 * BROWSER_POOL_MAX_RSS_BYTES
+BROWSER_POOL_WATCHDOG_INTERVAL_SECONDS = 5
+# an unused browser is closed after this long
+BROWSER_POOL_IDLE_SECONDS = 5 * 60
+# flows still using their context after this long are aborted, unless given another timeout
+BROWSER_FLOW_TIMEOUT_SECONDS = 2 * 60
+# processes still alive this long after asking a browser (or Playwright) to close are killed
+BROWSER_CLOSE_TIMEOUT_SECONDS = 10
+
 
 def build_playwright_tracing_path(name: str) -> Path:
     return PLAYWRIGHT_TRACING_DIR / f"{name}.zip"
@@ -18,3 +56,311 @@ async def playwright_trace_start(context):
 async def playwright_trace_stop(context, name):
     if PLAYWRIGHT_TRACING:
         await context.tracing.stop(path=build_playwright_tracing_path(name))
+
+
+def child_processes() -> set[psutil.Process]:
+    return set(psutil.Process().children(recursive=True))
+
+
+def is_alive(process: psutil.Process) -> bool:
+    with contextlib.suppress(psutil.NoSuchProcess, psutil.AccessDenied):
+        return process.is_running() and process.status() != psutil.STATUS_ZOMBIE
+    return False
+
+
+def process_tree(roots: Iterable[psutil.Process]) -> set[psutil.Process]:
+    processes = set()
+    for root in roots:
+        with contextlib.suppress(psutil.NoSuchProcess, psutil.AccessDenied):
+            if is_alive(root):
+                processes.add(root)
+                processes.update(root.children(recursive=True))
+    return processes
+
+
+def processes_rss_bytes(processes: Iterable[psutil.Process]) -> int:
+    rss = 0
+    for process in processes:
+        with contextlib.suppress(psutil.NoSuchProcess, psutil.AccessDenied):
+            rss += process.memory_info().rss
+    return rss
+
+
+def kill_processes(processes: Iterable[psutil.Process]) -> int:
+    killed = 0
+    for process in processes:
+        with contextlib.suppress(psutil.NoSuchProcess, psutil.AccessDenied):
+            if is_alive(process):
+                process.kill()
+                killed += 1
+    return killed
+
+
+class BrowserPoolStats(BaseModel):
+    launched: int = 0
+    recycled: int = 0
+    # browsers killed for using too much memory, or for not closing when asked to
+    killed: int = 0
+    aborted_flows: int = 0
+    browsers: int = 0
+    active_contexts: int = 0
+    waiting: int = 0
+    peak_rss_bytes: int = 0
+
+
+class PooledBrowser:
+    def __init__(self, browser: Browser, processes: set[psutil.Process]):
+        self.browser = browser
+        # processes spawned by the launch, their descendants are included when sampling
+        self.processes = processes
+        self.uses = 0
+        self.active_contexts = 0
+        # retiring browsers accept no new contexts, and are closed when their last context is closed
+        self.retiring = False
+        self.killed = False
+        self.flows: set[asyncio.Timeout] = set()
+
+    def process_tree(self) -> set[psutil.Process]:
+        return process_tree(self.processes)
+
+
+class BrowserPool:
+    """
+    A long-lived Firefox browser shared by Playwright flows, each flow getting its own isolated context.
+    Supervises the browser processes it spawns, enforcing flow timeouts and memory limits.
+    """
+
+    def __init__(self):
+        self._playwright: Playwright | None = None
+        self._playwright_processes: set[psutil.Process] = set()
+        self._current: PooledBrowser | None = None
+        self._browsers: set[PooledBrowser] = set()
+        self._slots: asyncio.Semaphore | None = None
+        self._interactive_slots: asyncio.Semaphore | None = None
+        self._lock: asyncio.Lock | None = None
+        self._idle_close: asyncio.Task | None = None
+        self._watchdog: asyncio.Task | None = None
+        self._stats = BrowserPoolStats()
+        self.waiting = 0
+
+    @property
+    def active_contexts(self) -> int:
+        return sum(b.active_contexts for b in self._browsers)
+
+    def stats(self) -> BrowserPoolStats:
+        return self._stats.model_copy(
+            update={
+                "browsers": len(self._browsers),
+                "active_contexts": self.active_contexts,
+                "waiting": self.waiting,
+            }
+        )
+
+    @asynccontextmanager
+    async def new_context(
+        self,
+        timeout_seconds: float = BROWSER_FLOW_TIMEOUT_SECONDS,
+        interactive: bool = False,
+    ) -> AsyncIterator[BrowserContext]:
+        """
+        Borrow an isolated browser context. Flows exceeding the timeout are aborted with a Playwright TimeoutError.
+        Interactive flows, waiting for user input, borrow from a separate budget of contexts.
+        """
+        slots = self._get_slots(interactive)
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            pooled = await self._checkout()
+            try:
+                context = await pooled.browser.new_context()
+            except BaseException:
+                await self._checkin(pooled)
+                raise
+            try:
+                async with asyncio.timeout(timeout_seconds) as flow:
+                    pooled.flows.add(flow)
+                    try:
+                        yield context
+                    finally:
+                        pooled.flows.discard(flow)
+            except TimeoutError as e:
+                if not flow.expired():
+                    raise
+                self._stats.aborted_flows += 1
+                reason = (
+                    "its browser was killed"
+                    if pooled.killed
+                    else f"it exceeded {timeout_seconds} seconds"
+                )
+                log.warning(f"Browser flow aborted, since {reason}")
+                raise PlaywrightTimeoutError(
+                    f"Browser flow aborted, since {reason}"
+                ) from e
+            finally:
+                with contextlib.suppress(PlaywrightError, TimeoutError):
+                    async with asyncio.timeout(BROWSER_CLOSE_TIMEOUT_SECONDS):
+                        await context.close()
+                await self._checkin(pooled)
+        finally:
+            slots.release()
+
+    def _get_slots(self, interactive: bool) -> asyncio.Semaphore:
+        if interactive:
+            if self._interactive_slots is None:
+                self._interactive_slots = asyncio.Semaphore(
+                    BROWSER_POOL_MAX_INTERACTIVE_CONTEXTS
+                )
+            return self._interactive_slots
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(BROWSER_POOL_MAX_CONTEXTS)
+        return self._slots
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _checkout(self) -> PooledBrowser:
+        async with self._get_lock():
+            if self._idle_close is not None:
+                self._idle_close.cancel()
+                self._idle_close = None
+            current = self._current
+            if current is not None and not current.browser.is_connected():
+                log.warning("Pooled browser disconnected, launching a new one")
+                current.retiring = True
+                await self._close_if_unused(current)
+            if self._current is None or self._current.retiring:
+                self._current = await self._launch()
+                self._browsers.add(self._current)
+            if self._watchdog is None or self._watchdog.done():
+                self._watchdog = asyncio.create_task(self._watch())
+            pooled = self._current
+            pooled.uses += 1
+            pooled.active_contexts += 1
+            if pooled.uses >= BROWSER_POOL_MAX_USES:
+                pooled.retiring = True
+            return pooled
+
+    async def _launch(self) -> PooledBrowser:
+        if self._playwright is None:
+            existing = child_processes()
+            self._playwright = await async_playwright().start()
+            self._playwright_processes = child_processes() - existing
+        # processes appearing during the launch belong to the new browser, unless they descend from another one
+        existing = child_processes()
+        browser = await self._playwright.firefox.launch()
+        spawned = child_processes() - existing
+        for other in self._browsers:
+            spawned -= other.process_tree()
+        self._stats.launched += 1
+        return PooledBrowser(browser, spawned)
+
+    async def _checkin(self, pooled: PooledBrowser) -> None:
+        async with self._get_lock():
+            pooled.active_contexts -= 1
+            if not pooled.retiring:
+                rss = self._sample_rss(pooled)
+                if rss > BROWSER_POOL_MAX_RSS_BYTES:
+                    log.warning(
+                        f"Pooled browser uses {rss // (1024 * 1024)} MB, replacing it"
+                    )
+                    pooled.retiring = True
+            await self._close_if_unused(pooled)
+            if self.active_contexts == 0 and self._idle_close is None:
+                self._idle_close = asyncio.create_task(self._close_when_idle())
+
+    def _sample_rss(self, pooled: PooledBrowser) -> int:
+        rss = processes_rss_bytes(pooled.process_tree())
+        self._stats.peak_rss_bytes = max(self._stats.peak_rss_bytes, rss)
+        return rss
+
+    async def _watch(self) -> None:
+        """
+        Sample the memory usage of pooled browsers while they are in use, retiring or killing them when above limits
+        """
+        while self.active_contexts > 0:
+            for pooled in list(self._browsers):
+                rss = self._sample_rss(pooled)
+                if rss > BROWSER_POOL_KILL_RSS_BYTES:
+                    log.error(
+                        f"Pooled browser uses {rss // (1024 * 1024)} MB, killing it and aborting its flows"
+                    )
+                    await self._kill(pooled)
+                elif rss > BROWSER_POOL_MAX_RSS_BYTES and not pooled.retiring:
+                    log.warning(
+                        f"Pooled browser uses {rss // (1024 * 1024)} MB, retiring it"
+                    )
+                    pooled.retiring = True
+            await asyncio.sleep(BROWSER_POOL_WATCHDOG_INTERVAL_SECONDS)
+
+    async def _kill(self, pooled: PooledBrowser) -> None:
+        async with self._get_lock():
+            pooled.retiring = True
+            pooled.killed = True
+            if self._current is pooled:
+                self._current = None
+            kill_processes(pooled.process_tree())
+            self._stats.killed += 1
+            now = asyncio.get_running_loop().time()
+            for flow in pooled.flows:
+                flow.reschedule(now)
+            await self._close_if_unused(pooled)
+
+    async def _close_if_unused(self, pooled: PooledBrowser) -> None:
+        if not pooled.retiring or pooled.active_contexts > 0:
+            return
+        if self._current is pooled:
+            self._current = None
+        if pooled in self._browsers:
+            self._browsers.discard(pooled)
+            self._stats.recycled += 1
+            await self._reap(pooled)
+
+    async def _reap(self, pooled: PooledBrowser) -> None:
+        processes = pooled.process_tree()
+        with contextlib.suppress(PlaywrightError, TimeoutError):
+            async with asyncio.timeout(BROWSER_CLOSE_TIMEOUT_SECONDS):
+                await pooled.browser.close()
+        leftovers = kill_processes(processes)
+        if leftovers > 0:
+            log.warning(f"Killed {leftovers} browser processes left after closing")
+            self._stats.killed += 1
+
+    async def _close_when_idle(self) -> None:
+        await asyncio.sleep(BROWSER_POOL_IDLE_SECONDS)
+        self._idle_close = None
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Close all pooled browsers and stop Playwright, killing any of their processes left behind.
+        Browsers with contexts in use are instead closed as soon as their contexts are closed.
+        """
+        async with self._get_lock():
+            if self.active_contexts > 0:
+                for pooled in self._browsers:
+                    pooled.retiring = True
+                return
+            if self._idle_close is not None:
+                self._idle_close.cancel()
+                self._idle_close = None
+            for pooled in list(self._browsers):
+                await self._reap(pooled)
+            self._browsers.clear()
+            self._current = None
+            if self._playwright is not None:
+                processes = process_tree(self._playwright_processes)
+                with contextlib.suppress(PlaywrightError, TimeoutError):
+                    async with asyncio.timeout(BROWSER_CLOSE_TIMEOUT_SECONDS):
+                        await self._playwright.stop()
+                kill_processes(processes)
+                self._playwright = None
+                self._playwright_processes = set()
+                log.debug(f"Browser pool closed: {self.stats()}")
+
+
+browser_pool = BrowserPool()
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 
 def format_name_list_to_natural(names: list[str]):
@@ -9,6 +10,7 @@ def format_name_list_to_natural(names: list[str]):
     )
 
 
+@lru_cache(maxsize=1024)
 def standardize_activity_name(raw: str) -> str:
     s = re.sub(r"\s\(\d+\)$", "", raw)
     s = re.sub(r"^\s*-\s*", "", s)
@@ -0,0 +1,24 @@
+import json
+import tempfile
+from pathlib import Path
+
+from rezervo.schemas.config import app
+
+CONFIG_TEMPLATE = Path(__file__).parents[1] / "rezervo" / "config.template.json"
+
+
+def use_template_app_config():
+    """
+    Modules read the app config on import, so point them to a valid copy of the template config
+    """
+    config = json.loads(CONFIG_TEMPLATE.read_text())
+    config["database_connection_string"] = (
+        "postgresql+psycopg2://rezervo@localhost/rezervo"
+    )
+    config["fusionauth"]["application_id"] = "00000000-0000-0000-0000-000000000000"
+    config_file = Path(tempfile.mkdtemp(prefix="rezervo-tests-")) / "config.json"
+    config_file.write_text(json.dumps(config))
+    app.CONFIG_FILE = str(config_file)
+
+
+use_template_app_config()
@@ -0,0 +1,158 @@
+import json
+from collections.abc import Awaitable, Callable, Sequence
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any
+
+from pydantic import BaseModel
+
+from rezervo.errors import BookingAttemptFailure, BookingError
+from rezervo.providers import provider as provider_module
+from rezervo.providers.provider import Provider
+from rezervo.providers.retry import RetryPolicy, classify_booking_attempt
+from rezervo.schemas.schedule import RezervoClass
+
+
+class RecordedResponse(BaseModel):
+    status: int
+    body: Any = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    async def text(self) -> str:
+        return self.body if isinstance(self.body, str) else json.dumps(self.body)
+
+    async def json(self) -> Any:
+        return json.loads(self.body) if isinstance(self.body, str) else self.body
+
+
+class ReplaySession:
+    """
+    Stand-in for the shared http client, answering requests with recorded responses in order
+    """
+
+    def __init__(self, responses: Sequence[RecordedResponse]):
+        self._responses = list(responses)
+        self.requests: list[tuple[str, str]] = []
+
+    @asynccontextmanager
+    async def _request(self, method: str, url: str, **_kwargs):
+        self.requests.append((method, url))
+        yield self._responses.pop(0)
+
+    def get(self, url: str, **kwargs):
+        return self._request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self._request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self._request("DELETE", url, **kwargs)
+
+
+class SimulatedClock:
+    """
+    Clock of a replayed operation, advanced by response times and retry delays instead of waiting for them
+    """
+
+    def __init__(self, now: datetime):
+        self.now = now
+        self.sleeps: list[float] = []
+
+    def advance(self, seconds: float) -> None:
+        self.now += timedelta(seconds=seconds)
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.advance(seconds)
+
+    def install(self, monkeypatch) -> None:
+        clock = self
+
+        class SimulatedDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock.now if tz is None else clock.now.astimezone(tz)
+
+        monkeypatch.setattr(provider_module, "datetime", SimulatedDatetime)
+        monkeypatch.setattr(provider_module.asyncio, "sleep", self.sleep)
+
+
+class ReplayedAttempt(BaseModel):
+    sent_at: datetime
+    # None if the attempt succeeded
+    failure: BookingAttemptFailure | None
+
+
+type Attempt = Callable[[], Awaitable[Any]]
+
+
+class ReplayProvider(Provider[str, str]):
+    """
+    Provider whose booking and cancellation attempts are answered by the given attempt functions,
+    to drive the retry loops of Provider on a simulated clock
+    """
+
+    branches = []
+
+    def __init__(
+        self,
+        clock: SimulatedClock,
+        book: Attempt | None = None,
+        cancel: Attempt | None = None,
+        retry_policy: RetryPolicy | None = None,
+        response_seconds: float = 0.05,
+    ):
+        self.clock = clock
+        self._book = book
+        self._cancel = cancel
+        self._retry_policy = retry_policy or RetryPolicy()
+        self.response_seconds = response_seconds
+        self.attempts: list[ReplayedAttempt] = []
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        return self._retry_policy
+
+    async def _attempt(self, attempt: Attempt | None) -> Any:
+        if attempt is None:
+            raise NotImplementedError()
+        sent_at = self.clock.now
+        result = await attempt()
+        self.clock.advance(self.response_seconds)
+        failed = result is not True and isinstance(
+            result, BookingError | BookingAttemptFailure | bool
+        )
+        self.attempts.append(
+            ReplayedAttempt(
+                sent_at=sent_at,
+                failure=classify_booking_attempt(result) if failed else None,
+            )
+        )
+        return result
+
+    async def _book_class(self, auth_data: str, class_id: str):
+        return await self._attempt(self._book)
+
+    async def _cancel_booking(self, auth_data: str, _class: RezervoClass):
+        return await self._attempt(self._cancel)
+
+    async def _authenticate(self, chain_user):
+        raise NotImplementedError()
+
+    async def verify_authentication(self, credentials):
+        raise NotImplementedError()
+
+    async def find_class_by_id(self, class_id):
+        raise NotImplementedError()
+
+    async def find_class(self, _class_config):
+        raise NotImplementedError()
+
+    async def _fetch_past_and_booked_sessions(self, chain_user, locations=None):
+        raise NotImplementedError()
+
+    async def _fetch_schedule(self, from_date, days, locations):
+        raise NotImplementedError()
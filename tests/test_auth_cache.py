@@ -0,0 +1,44 @@
+import asyncio
+import contextlib
+import uuid
+
+from rezervo.providers import auth_cache
+from rezervo.providers.auth_cache import AuthDataCache
+from rezervo.schemas.config.user import ChainUser
+
+
+def chain_user(username: str) -> ChainUser:
+    return ChainUser(
+        chain="3t",
+        user_id=uuid.uuid4(),
+        username=username,
+        password="secret",
+        recurring_bookings=[],
+    )
+
+
+def test_rejected_auth_data_is_invalidated_for_its_chain_user(monkeypatch):
+    persisted = {}
+    monkeypatch.setattr(auth_cache, "SessionLocal", contextlib.nullcontext)
+    monkeypatch.setattr(
+        auth_cache.crud,
+        "upsert_chain_user_auth_data",
+        lambda _db, chain, user_id, auth_data: persisted.update(
+            {(chain, user_id): auth_data}
+        ),
+    )
+    cache = AuthDataCache[str](
+        serialize=str, deserialize=str, expires_at=lambda _: None
+    )
+    monkeypatch.setattr(cache, "_load_persisted", lambda *_: None)
+    alice, bob = chain_user("alice"), chain_user("bob")
+
+    async def login(user: ChainUser) -> str:
+        return f"token-{user.username}"
+
+    assert asyncio.run(cache.get(alice, login)) == "token-alice"
+    assert asyncio.run(cache.get(bob, login)) == "token-bob"
+    cache.invalidate_auth_data("token-alice")
+    assert persisted == {("3t", alice.user_id): None}
+    assert ("3t", bob.user_id) in cache._entries
+    assert ("3t", alice.user_id) not in cache._entries
@@ -0,0 +1,101 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from rezervo import booker as booker_module
+from rezervo.booker import Booker
+from rezervo.errors import AuthenticationError, BookingError
+from rezervo.schemas.config.user import ChainUser, Class, ClassTime
+from rezervo.schemas.schedule import RezervoActivity, RezervoClass, RezervoLocation
+
+RECURRING_BOOKING = Class(
+    activity_id="1",
+    weekday=0,
+    location_id="moholt",
+    start_time=ClassTime(hour=7, minute=0),
+    display_name="Spinning",
+)
+
+
+def upcoming_class(opens_at: datetime) -> RezervoClass:
+    return RezervoClass(
+        id="1",
+        start_time=opens_at + timedelta(days=2),
+        end_time=opens_at + timedelta(days=2, hours=1),
+        location=RezervoLocation(id="moholt", studio="Moholt"),
+        activity=RezervoActivity(
+            id="1", name="Spinning", category="Other", color="#000"
+        ),
+        instructors=[],
+        is_bookable=False,
+        is_cancelled=False,
+        booking_opens_at=opens_at,
+    )
+
+
+def chain_users() -> list[tuple[ChainUser, Class]]:
+    chain_user = ChainUser(
+        chain="3t",
+        user_id=uuid.uuid4(),
+        username="1234",
+        password="secret",
+        recurring_bookings=[RECURRING_BOOKING],
+    )
+    return [(chain_user, RECURRING_BOOKING)]
+
+
+def test_transient_resolution_failure_is_retried_and_alerted(monkeypatch):
+    opens_at = datetime.now().astimezone() + timedelta(minutes=10)
+    resolutions = [
+        upcoming_class(opens_at),
+        BookingError.ERROR,
+        AuthenticationError.ERROR,
+        upcoming_class(opens_at),
+    ]
+
+    async def find_class(*_args):
+        return resolutions.pop(0)
+
+    async def sleep(_seconds):
+        pass
+
+    notifications = []
+    monkeypatch.setattr(booker_module, "find_class", find_class)
+    monkeypatch.setattr(booker_module.asyncio, "sleep", sleep)
+    monkeypatch.setattr(
+        booker_module,
+        "aprs",
+        SimpleNamespace(notify=lambda **kwargs: notifications.append(kwargs)),
+    )
+
+    async def resolve():
+        booker = Booker(timedelta(minutes=30), timedelta(minutes=2))
+        # a previous refresh learned when the class opens
+        await booker._resolve_job("3t", RECURRING_BOOKING)
+        error = await booker._resolve_job("3t", RECURRING_BOOKING)
+        assert error is BookingError.ERROR
+        booker._on_resolution_failed("3t", RECURRING_BOOKING, chain_users(), error)
+        await asyncio.gather(*booker._resolution_retries)
+        return booker
+
+    booker = asyncio.run(resolve())
+    assert len(notifications) == 1
+    assert [job.booking_opens_at for _, _, job in booker._heap] == [opens_at]
+    assert resolutions == []
+
+
+def test_missing_class_is_not_retried(monkeypatch):
+    async def find_class(*_args):
+        raise AssertionError("a missing class should not be resolved again")
+
+    monkeypatch.setattr(booker_module, "find_class", find_class)
+
+    async def resolve():
+        booker = Booker(timedelta(minutes=30), timedelta(minutes=2))
+        booker._on_resolution_failed(
+            "3t", RECURRING_BOOKING, chain_users(), BookingError.CLASS_MISSING
+        )
+        return booker
+
+    assert len(asyncio.run(resolve())._resolution_retries) == 0
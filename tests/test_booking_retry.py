@@ -0,0 +1,300 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import UUID
+
+import pytest
+
+from rezervo.chains.dotgym import DotGymChain
+from rezervo.chains.ttt import TttChain
+from rezervo.errors import AuthenticationError, BookingAttemptFailure, BookingError
+from rezervo.http_client import HttpClient
+from rezervo.providers import provider as provider_module
+from rezervo.providers.brpsystems.booking import (
+    BRP_RETRY_POLICY,
+    book_brp_class,
+    cancel_brp_booking,
+)
+from rezervo.providers.brpsystems.schema import (
+    BookingType,
+    BrpAuthData,
+    BrpBookingReference,
+)
+from rezervo.providers.ibooking.booking import (
+    IBOOKING_RETRY_POLICY,
+    book_ibooking_class,
+)
+from rezervo.providers.retry import classify_booking_response_status
+from rezervo.providers.sats.provider import SATS_BOOKING_FAILURE_MARKERS
+from rezervo.schemas.config.config import Booking
+from rezervo.schemas.schedule import (
+    BookingResult,
+    RezervoActivity,
+    RezervoClass,
+    RezervoLocation,
+)
+from tests.replay import (
+    RecordedResponse,
+    ReplayProvider,
+    ReplaySession,
+    SimulatedClock,
+)
+
+OPENS_AT = datetime(2026, 10, 19, 7, 0).astimezone()
+
+BRP_AUTH_DATA = BrpAuthData(
+    username="1234",
+    roles=[],
+    token_type="bearer",
+    access_token="access",
+    expires_in=3600,
+    refresh_token="refresh",
+)
+
+BOOKED_CLASS = RezervoClass(
+    id="1",
+    start_time=OPENS_AT + timedelta(days=2),
+    end_time=OPENS_AT + timedelta(days=2, hours=1),
+    location=RezervoLocation(id="moholt", studio="Moholt"),
+    activity=RezervoActivity(id="1", name="Spinning", category="Other", color="#000"),
+    instructors=[],
+    is_bookable=True,
+    is_cancelled=False,
+    booking_opens_at=OPENS_AT,
+)
+
+IBOOKING_BOOKED = RecordedResponse(
+    status=200, body={"success": True, "waitlist": False, "waitlistPosition": 0}
+)
+
+
+def ibooking_failure(message: str) -> RecordedResponse:
+    return RecordedResponse(
+        status=200,
+        body={
+            "success": False,
+            "waitlist": False,
+            "waitlistPosition": 0,
+            "errorMessage": message,
+        },
+    )
+
+
+USER_ID = UUID(int=0)
+
+
+def replay_config(attempts: int):
+    return SimpleNamespace(
+        booking=Booking(timezone="Europe/Oslo", max_attempts=attempts),
+        notifications=None,
+    )
+
+
+def replay_provider(monkeypatch, responses, started_at=OPENS_AT, **kwargs):
+    session = ReplaySession(responses)
+    monkeypatch.setattr(HttpClient, "singleton", lambda: session)
+    clock = SimulatedClock(started_at)
+    clock.install(monkeypatch)
+    return ReplayProvider(clock, **kwargs)
+
+
+def replay_booking(
+    monkeypatch, responses, book, retry_policy, started_at=OPENS_AT, attempts=100
+):
+    provider = replay_provider(
+        monkeypatch, responses, started_at, book=book, retry_policy=retry_policy
+    )
+    result = asyncio.run(
+        provider.try_book_class(
+            "3t", "token", BOOKED_CLASS, replay_config(attempts), USER_ID
+        )
+    )
+    return provider, result
+
+
+def book_brp():
+    return book_brp_class("3t", BRP_AUTH_DATA, 1)
+
+
+def book_ibooking():
+    return book_ibooking_class("sit", "token", 1)
+
+
+def test_polls_tightly_until_brp_booking_opens(monkeypatch):
+    too_early = RecordedResponse(
+        status=403, body={"errorCode": "TOO_EARLY_TO_BOOK", "message": "Too early"}
+    )
+    already_booked = RecordedResponse(status=403, body={"errorCode": "ALREADY_BOOKED"})
+    provider, result = replay_booking(
+        monkeypatch,
+        [too_early, too_early, already_booked],
+        book_brp,
+        BRP_RETRY_POLICY,
+        started_at=OPENS_AT - timedelta(seconds=0.2),
+    )
+    assert [a.failure for a in provider.attempts] == [
+        BookingAttemptFailure.NOT_OPEN,
+        BookingAttemptFailure.NOT_OPEN,
+        BookingAttemptFailure.TERMINAL,
+    ]
+    assert provider.clock.sleeps == [BRP_RETRY_POLICY.opening_poll_interval_seconds] * 2
+    assert result is BookingError.ERROR
+
+
+def test_aborts_immediately_when_already_booked_with_ibooking(monkeypatch):
+    provider, result = replay_booking(
+        monkeypatch,
+        [ibooking_failure("Du er allerede påmeldt denne timen")],
+        book_ibooking,
+        IBOOKING_RETRY_POLICY,
+    )
+    assert [a.failure for a in provider.attempts] == [BookingAttemptFailure.TERMINAL]
+    assert result is BookingError.ERROR
+
+
+def test_retries_ibooking_until_booked(monkeypatch):
+    provider, result = replay_booking(
+        monkeypatch,
+        [
+            ibooking_failure("Påmelding åpner kl. 07:00"),
+            RecordedResponse(status=503, body="Service Unavailable"),
+            IBOOKING_BOOKED,
+        ],
+        book_ibooking,
+        IBOOKING_RETRY_POLICY,
+    )
+    assert [a.failure for a in provider.attempts] == [
+        BookingAttemptFailure.NOT_OPEN,
+        BookingAttemptFailure.OVERLOADED,
+        None,
+    ]
+    assert isinstance(result, BookingResult)
+
+
+def test_backs_off_with_jitter_when_overloaded(monkeypatch):
+    overloaded = RecordedResponse(status=429, body="Too Many Requests")
+    provider, result = replay_booking(
+        monkeypatch, [overloaded] * 4, book_brp, BRP_RETRY_POLICY, attempts=4
+    )
+    assert all(a.failure is BookingAttemptFailure.OVERLOADED for a in provider.attempts)
+    assert len(provider.clock.sleeps) == 3
+    for n, delay in enumerate(provider.clock.sleeps, start=1):
+        assert 0 <= delay <= BRP_RETRY_POLICY._backoff_seconds(n)
+    assert result is BookingError.ERROR
+
+
+def test_gives_up_unclassified_failures_at_deadline(monkeypatch):
+    unclassified = RecordedResponse(status=403, body={"errorCode": "UNKNOWN"})
+    provider, result = replay_booking(
+        monkeypatch, [unclassified] * 100, book_brp, BRP_RETRY_POLICY
+    )
+    assert all(a.failure is BookingAttemptFailure.TRANSIENT for a in provider.attempts)
+    assert len(provider.attempts) < 100
+    last_sent_at = provider.attempts[-1].sent_at
+    assert (
+        last_sent_at - OPENS_AT
+    ).total_seconds() <= BRP_RETRY_POLICY.deadline_seconds
+    assert result is BookingError.ERROR
+
+
+def test_retries_overloaded_brp_cancellation(monkeypatch):
+    async def notify_class_friends_of_cancellation(*_args):
+        pass
+
+    monkeypatch.setattr(
+        provider_module,
+        "notify_class_friends_of_cancellation",
+        notify_class_friends_of_cancellation,
+    )
+    provider = replay_provider(
+        monkeypatch,
+        [
+            RecordedResponse(status=503, body="Service Unavailable"),
+            RecordedResponse(status=204),
+        ],
+        cancel=lambda: cancel_brp_booking(
+            "3t", BRP_AUTH_DATA, 10, BookingType.GROUP_ACTIVITY
+        ),
+        retry_policy=BRP_RETRY_POLICY,
+    )
+    result = asyncio.run(
+        provider.try_cancel_booking("token", BOOKED_CLASS, replay_config(10), USER_ID)
+    )
+    assert [a.failure for a in provider.attempts] == [
+        BookingAttemptFailure.OVERLOADED,
+        None,
+    ]
+    assert len(provider.clock.sleeps) == 1
+    assert result is None
+
+
+@pytest.mark.parametrize(
+    ("status", "body", "failure"),
+    [
+        (400, "Timen er full", BookingAttemptFailure.TERMINAL),
+        (400, "Booking er ikke åpnet ennå", BookingAttemptFailure.NOT_OPEN),
+        (409, "", BookingAttemptFailure.TERMINAL),
+        (400, "<html>Bad request</html>", BookingAttemptFailure.TRANSIENT),
+        (502, "Bad gateway", BookingAttemptFailure.OVERLOADED),
+    ],
+)
+def test_classifies_sats_responses(status, body, failure):
+    assert (
+        classify_booking_response_status(status, body, SATS_BOOKING_FAILURE_MARKERS)
+        is failure
+    )
+
+
+def test_booked_result_is_returned(monkeypatch):
+    session = ReplaySession([IBOOKING_BOOKED])
+    monkeypatch.setattr(HttpClient, "singleton", lambda: session)
+    assert isinstance(asyncio.run(book_ibooking()), BookingResult)
+
+
+def test_rejected_brp_access_token_is_reported(monkeypatch):
+    session = ReplaySession([RecordedResponse(status=401, body="Unauthorized")])
+    monkeypatch.setattr(HttpClient, "singleton", lambda: session)
+    assert asyncio.run(book_brp()) is AuthenticationError.TOKEN_INVALID
+
+
+def test_rejected_mirage_access_token_is_invalidated(monkeypatch):
+    session = ReplaySession([RecordedResponse(status=401, body="Unauthorized")] * 2)
+    monkeypatch.setattr(HttpClient, "singleton", lambda: session)
+    provider = DotGymChain()
+    invalidated = []
+    monkeypatch.setattr(
+        provider._auth_cache, "invalidate_auth_data", invalidated.append
+    )
+    assert (
+        asyncio.run(provider._book_class("token", "1"))
+        is AuthenticationError.TOKEN_INVALID
+    )
+    assert (
+        asyncio.run(provider._cancel_booking("token", BOOKED_CLASS))
+        is AuthenticationError.TOKEN_INVALID
+    )
+    assert invalidated == ["token", "token"]
+
+
+def test_stale_brp_booking_reference_is_looked_up_again(monkeypatch):
+    session = ReplaySession(
+        [RecordedResponse(status=404, body="Not found"), RecordedResponse(status=204)]
+    )
+    monkeypatch.setattr(HttpClient, "singleton", lambda: session)
+    provider = TttChain()
+    provider._booking_references[BRP_AUTH_DATA.username] = {
+        1: BrpBookingReference(booking_id=10, booking_type=BookingType.GROUP_ACTIVITY)
+    }
+    fetched_reference = BrpBookingReference(
+        booking_id=11, booking_type=BookingType.GROUP_ACTIVITY
+    )
+
+    async def fetch_booking_reference(*_args):
+        return fetched_reference
+
+    monkeypatch.setattr(provider, "_fetch_booking_reference", fetch_booking_reference)
+    assert asyncio.run(provider._cancel_booking(BRP_AUTH_DATA, BOOKED_CLASS)) is True
+    assert [url.split("?")[0].rsplit("/", 1)[1] for _, url in session.requests] == [
+        "10",
+        "11",
+    ]
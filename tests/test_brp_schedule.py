@@ -0,0 +1,138 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from pydantic import ValidationError
+
+from rezervo.providers.brpsystems.schedule import brp_classes_from_json
+from rezervo.providers.brpsystems.schema import BrpClass, RawBrpClass
+from rezervo.utils.logging_utils import log
+
+BRP_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.000Z"
+
+
+def brp_item(class_id: int, start: datetime, bookable: bool = True) -> dict:
+    return {
+        "id": class_id,
+        "name": "Spinning 45",
+        "duration": {
+            "start": start.strftime(BRP_DATE_FORMAT),
+            "end": (start + timedelta(minutes=45)).strftime(BRP_DATE_FORMAT),
+        },
+        "groupActivityProduct": {"id": class_id % 20, "name": "Spinning 45"},
+        "businessUnit": {
+            "id": class_id % 4,
+            "name": "Gym",
+            "location": "Trondheim",
+            "companyNameForInvoice": "Gym AS",
+        },
+        "locations": [{"id": 1, "name": "Sal 1"}],
+        "instructors": [{"id": 1, "name": "Instructor", "isSubstitute": False}],
+        "externalMessage": None,
+        "internalMessage": None,
+        "cancelled": False,
+        "slots": {
+            "total": 30,
+            "totalBookable": 30,
+            "reservedForDropin": 0,
+            "leftToBook": 12,
+            "leftToBookIncDropin": 12,
+            "hasWaitingList": True,
+            "inWaitingList": 0,
+        },
+        "bookableEarliest": (
+            (start - timedelta(days=2)).strftime(BRP_DATE_FORMAT) if bookable else None
+        ),
+        "bookableLatest": (
+            (start - timedelta(minutes=5)).strftime(BRP_DATE_FORMAT)
+            if bookable
+            else None
+        ),
+    }
+
+
+def build_schedule_items(days: int = 14, classes_per_day: int = 120) -> list[dict]:
+    first_day = datetime(2026, 10, 19, 6)
+    return [
+        brp_item(
+            day * classes_per_day + i,
+            first_day + timedelta(days=day, minutes=7 * i),
+            # every tenth class is sparse, lacking a booking window
+            bookable=i % 10 != 0,
+        )
+        for day in range(days)
+        for i in range(classes_per_day)
+    ]
+
+
+def validate_one_by_one(items: list, parse_errors: set) -> list[BrpClass]:
+    """
+    Reference implementation, validating each class twice
+    """
+    classes = []
+    for item in items:
+        try:
+            raw_brp_class = RawBrpClass(**item)
+        except ValidationError as e:
+            parse_errors.add(str(e))
+            continue
+        if (
+            raw_brp_class.bookableEarliest is not None
+            and raw_brp_class.bookableLatest is not None
+        ):
+            try:
+                classes.append(BrpClass(**raw_brp_class.model_dump()))
+            except ValidationError as e:
+                parse_errors.add(str(e))
+    return classes
+
+
+def test_sparse_classes_are_dropped():
+    items = build_schedule_items(days=1, classes_per_day=20)
+    parse_errors: set = set()
+    classes = brp_classes_from_json(items, parse_errors)
+    assert classes == validate_one_by_one(items, set())
+    assert len(classes) == 18
+    assert parse_errors == set()
+
+
+def test_malformed_classes_are_reported():
+    items = build_schedule_items(days=1, classes_per_day=20)
+    del items[1]["slots"]
+    parse_errors: set = set()
+    classes = brp_classes_from_json(items, parse_errors)
+    assert [c.id for c in classes] == [c.id for c in validate_one_by_one(items, set())]
+    assert len(classes) == 17
+    assert len(parse_errors) > 0
+
+
+def test_malformed_sparse_classes_are_reported():
+    items = build_schedule_items(days=1, classes_per_day=20)
+    # the first class lacks a booking window, and would be dropped anyway
+    del items[0]["slots"]
+    parse_errors: set = set()
+    assert len(brp_classes_from_json(items, parse_errors)) == 18
+    assert len(parse_errors) > 0
+
+
+@pytest.mark.benchmark
+def test_single_pass_validation_outperforms_validating_one_by_one():
+    """
+    Micro-benchmark validating a 14-day, 4-location schedule response (1680 classes),
+    timings are logged, shown with 'pytest -m benchmark --log-cli-level=INFO'
+    """
+    items = build_schedule_items()
+    runs = 5
+    started_at = time.perf_counter()
+    for _ in range(runs):
+        one_by_one = validate_one_by_one(items, set())
+    one_by_one_seconds = (time.perf_counter() - started_at) / runs
+    started_at = time.perf_counter()
+    for _ in range(runs):
+        single_pass = brp_classes_from_json(items, set())
+    single_pass_seconds = (time.perf_counter() - started_at) / runs
+    log.info(
+        f"{len(items)} brp classes: one by one {one_by_one_seconds * 1000:.1f} ms, "
+        f"single pass {single_pass_seconds * 1000:.1f} ms"
+    )
+    assert single_pass == one_by_one
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from datetime import UTC, datetime
+
+import pytest
+
+from rezervo.http_client import HttpClient
+from rezervo.providers.ibooking import auth
+from rezervo.providers.ibooking.auth import ExpiringToken, validate_ibooking_token
+from rezervo.providers.ibooking.provider import get_json_with_public_ibooking_token
+from tests.replay import RecordedResponse, ReplaySession
+
+BOOKING_PAGE = RecordedResponse(status=200, body='var clientToken = "fresh";')
+TOKEN_INFO = RecordedResponse(
+    status=200, body={"authTokenExpires": "2026-10-19 12:00:00"}
+)
+
+
+@pytest.fixture
+def stale_public_token(monkeypatch):
+    monkeypatch.setattr(
+        auth,
+        "_public_ibooking_token",
+        ExpiringToken(token="stale", expires_at=int(time.time()) + 3600),
+    )
+    monkeypatch.setattr(auth, "_public_ibooking_token_fetch", None)
+    monkeypatch.setattr(auth, "_public_ibooking_token_renewal", None)
+
+
+def replay(monkeypatch, responses, operation):
+    session = ReplaySession(responses)
+    monkeypatch.setattr(HttpClient, "singleton", lambda: session)
+    return asyncio.run(operation()), [url for _, url in session.requests]
+
+
+def test_token_expiry_is_localized_to_oslo(monkeypatch):
+    (valid, expires_at), _ = replay(
+        monkeypatch,
+        [
+            RecordedResponse(
+                status=200, body={"authTokenExpires": "2026-01-15 12:00:00"}
+            )
+        ],
+        lambda: validate_ibooking_token("token"),
+    )
+    assert valid
+    # Oslo is UTC+1 in winter, rather than the +00:43 LMT offset of an unlocalized pytz zone
+    assert expires_at == int(datetime(2026, 1, 15, 11, tzinfo=UTC).timestamp())
+
+
+def test_rejected_public_token_is_renewed_and_retried_once(
+    monkeypatch, stale_public_token
+):
+    (status, body), urls = replay(
+        monkeypatch,
+        [
+            RecordedResponse(status=401),
+            BOOKING_PAGE,
+            TOKEN_INFO,
+            RecordedResponse(status=200, body={"days": []}),
+        ],
+        lambda: get_json_with_public_ibooking_token("stale", lambda t: f"schedule/{t}"),
+    )
+    assert (status, body) == (200, {"days": []})
+    assert urls[0] == "schedule/stale"
+    assert urls[-1] == "schedule/fresh"
+    assert auth._public_ibooking_token.token == "fresh"
+
+
+def test_renewed_public_token_is_not_retried_again(monkeypatch, stale_public_token):
+    (status, body), urls = replay(
+        monkeypatch,
+        [
+            RecordedResponse(status=403),
+            BOOKING_PAGE,
+            TOKEN_INFO,
+            RecordedResponse(status=403),
+        ],
+        lambda: get_json_with_public_ibooking_token("stale", lambda t: f"schedule/{t}"),
+    )
+    assert (status, body) == (403, None)
+    assert [u for u in urls if u.startswith("schedule/")] == [
+        "schedule/stale",
+        "schedule/fresh",
+    ]
+    assert auth._public_ibooking_token is None
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from rezervo.consts import WEEKDAYS
+from rezervo.providers.schedule_cache import ScheduleCache
+from rezervo.schemas.schedule import RezervoDay, RezervoSchedule
+
+FROM_DATE = datetime.combine(datetime.now(), datetime.min.time())
+
+
+def fetch_recorder(returned_days: set[int] | None = None):
+    """
+    Fetch returning empty days, except for those left out to simulate a failed or partial fetch
+    """
+    calls = []
+
+    async def fetch(from_date, days, locations):
+        calls.append((from_date, days, tuple(locations)))
+        dates = [from_date + timedelta(days=i) for i in range(days)]
+        return RezervoSchedule(
+            days=[
+                RezervoDay(
+                    day_name=WEEKDAYS[d.weekday()],
+                    date=d.date().isoformat(),
+                    classes=[],
+                )
+                for d in dates
+                if returned_days is None or (d - FROM_DATE).days in returned_days
+            ]
+        )
+
+    return fetch, calls
+
+
+def test_days_missing_from_fetch_are_not_cached():
+    cache = ScheduleCache()
+    partial_fetch, _ = fetch_recorder(returned_days={0})
+    asyncio.run(cache.get(FROM_DATE, 3, ["a"], partial_fetch))
+    assert set(cache._entries.keys()) == {("a", FROM_DATE.date())}
+    fetch, calls = fetch_recorder()
+    asyncio.run(cache.get(FROM_DATE, 3, ["a"], fetch))
+    assert calls == [(FROM_DATE + timedelta(days=1), 2, ("a",))]
+
+
+def test_generations_are_dropped_when_no_fetch_is_in_flight():
+    cache = ScheduleCache()
+    fetch, _ = fetch_recorder()
+    asyncio.run(cache.get(FROM_DATE, 7, ["a", "b"], fetch))
+    for _ in range(3):
+        cache.invalidate()
+    assert cache._generations == {}
+
+
+def test_invalidation_discards_fetch_in_flight():
+    cache = ScheduleCache()
+    fetch, _ = fetch_recorder()
+
+    async def invalidating_fetch(from_date, days, locations):
+        cache.invalidate()
+        return await fetch(from_date, days, locations)
+
+    asyncio.run(cache.get(FROM_DATE, 2, ["a"], invalidating_fetch))
+    assert cache._entries == {}
+    assert cache._generations == {}
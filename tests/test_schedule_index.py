@@ -0,0 +1,177 @@
+import random
+import time
+from datetime import UTC, datetime, timedelta
+
+import pytest
+import pytz
+
+from rezervo.consts import WEEKDAYS
+from rezervo.errors import BookingError
+from rezervo.providers.schedule import ScheduleIndex, find_class_in_schedule_by_config
+from rezervo.providers.sessions import get_user_planned_sessions_from_schedule
+from rezervo.schemas.config.user import ChainConfig, Class, ClassTime
+from rezervo.schemas.schedule import (
+    RezervoActivity,
+    RezervoClass,
+    RezervoDay,
+    RezervoLocation,
+    RezervoSchedule,
+)
+from rezervo.utils.logging_utils import log
+
+TZ = pytz.timezone("Europe/Oslo")
+LOCATIONS = [f"location-{i}" for i in range(8)]
+ACTIVITIES = [f"activity-{i}" for i in range(20)]
+START_HOURS = range(6, 22)
+
+
+def build_schedule(weeks: int, seed: int = 0) -> RezervoSchedule:
+    """
+    Schedule with a class starting every hour of the day at each location
+    """
+    rng = random.Random(seed)
+    first_day = datetime.combine(datetime.now(), datetime.min.time())
+    days = []
+    for i in range(weeks * 7):
+        day = first_day + timedelta(days=i)
+        classes = []
+        for location in LOCATIONS:
+            for hour in START_HOURS:
+                start_time = TZ.localize(
+                    day.replace(hour=hour, minute=rng.choice((0, 30)))
+                )
+                classes.append(
+                    RezervoClass(
+                        id=f"{location}-{start_time.isoformat()}",
+                        start_time=start_time,
+                        end_time=start_time + timedelta(hours=1),
+                        location=RezervoLocation(id=location, studio=location),
+                        activity=RezervoActivity(
+                            id=rng.choice(ACTIVITIES),
+                            name="Activity",
+                            category="Other",
+                            color="#000",
+                        ),
+                        instructors=[],
+                        is_bookable=True,
+                        is_cancelled=False,
+                        booking_opens_at=start_time - timedelta(days=2),
+                    )
+                )
+        days.append(
+            RezervoDay(
+                day_name=WEEKDAYS[day.weekday()],
+                date=day.date().isoformat(),
+                classes=sorted(classes, key=lambda c: c.start_time),
+            )
+        )
+    return RezervoSchedule(days=days)
+
+
+def build_chain_configs(users: int, bookings: int, seed: int = 0) -> list[ChainConfig]:
+    rng = random.Random(seed)
+    return [
+        ChainConfig(
+            chain="chain",
+            recurring_bookings=[
+                Class(
+                    activity_id=rng.choice(ACTIVITIES),
+                    weekday=rng.randrange(7),
+                    location_id=rng.choice(LOCATIONS),
+                    start_time=ClassTime(
+                        hour=rng.choice(START_HOURS), minute=rng.choice((0, 30))
+                    ),
+                )
+                for _ in range(bookings)
+            ],
+        )
+        for _ in range(users)
+    ]
+
+
+def scan_planned_sessions(
+    chain_config: ChainConfig, schedule: RezervoSchedule
+) -> list[RezervoClass]:
+    """
+    Reference matcher, scanning the whole schedule for each recurring booking
+    """
+    classes = []
+    for d in schedule.days:
+        for c in d.classes:
+            for cc in chain_config.recurring_bookings:
+                if c.location.id != cc.location_id:
+                    continue
+                if d.day_name != WEEKDAYS[cc.weekday]:
+                    continue
+                if c.activity.id != cc.activity_id:
+                    continue
+                localized_start_time = c.start_time.astimezone(TZ)
+                if (
+                    localized_start_time.hour != cc.start_time.hour
+                    or localized_start_time.minute != cc.start_time.minute
+                ):
+                    continue
+                if c.booking_opens_at < datetime.now(UTC):
+                    continue
+                classes.append(c)
+    return classes
+
+
+def test_index_matches_like_a_schedule_scan():
+    schedule = build_schedule(weeks=2)
+    index = ScheduleIndex(schedule)
+    for chain_config in build_chain_configs(users=50, bookings=5):
+        assert get_user_planned_sessions_from_schedule(
+            chain_config, index
+        ) == scan_planned_sessions(chain_config, schedule)
+
+
+def test_find_class_distinguishes_incorrect_start_time():
+    schedule = build_schedule(weeks=1)
+    c = schedule.days[0].classes[0]
+    local_start_time = c.start_time.astimezone(TZ)
+    class_config = Class(
+        activity_id=c.activity.id,
+        weekday=local_start_time.weekday(),
+        location_id=c.location.id,
+        start_time=ClassTime(
+            hour=local_start_time.hour, minute=local_start_time.minute
+        ),
+    )
+    assert find_class_in_schedule_by_config(class_config, schedule) == c
+    class_config.start_time = ClassTime(hour=3, minute=15)
+    assert (
+        find_class_in_schedule_by_config(class_config, schedule)
+        is BookingError.INCORRECT_START_TIME
+    )
+    class_config.activity_id = "missing"
+    assert (
+        find_class_in_schedule_by_config(class_config, schedule)
+        is BookingError.CLASS_MISSING
+    )
+
+
+@pytest.mark.benchmark
+def test_index_outperforms_a_schedule_scan():
+    """
+    Micro-benchmark matching the recurring bookings of all users of a chain, either by scanning the schedule,
+    or by building an index once and looking them up (timings are logged, shown with 'pytest -m benchmark --log-cli-level=INFO')
+    """
+    weeks, users, bookings = 5, 100, 5
+    schedule = build_schedule(weeks)
+    chain_configs = build_chain_configs(users, bookings)
+    started_at = time.perf_counter()
+    scanned = [scan_planned_sessions(cc, schedule) for cc in chain_configs]
+    scan_seconds = time.perf_counter() - started_at
+    started_at = time.perf_counter()
+    index = ScheduleIndex(schedule)
+    indexed = [
+        get_user_planned_sessions_from_schedule(cc, index) for cc in chain_configs
+    ]
+    index_seconds = time.perf_counter() - started_at
+    classes = sum(len(d.classes) for d in schedule.days)
+    log.info(
+        f"{users} users with {bookings} recurring bookings, {classes} classes: "
+        f"scan {scan_seconds * 1000:.0f} ms, index {index_seconds * 1000:.0f} ms"
+    )
+    assert indexed == scanned